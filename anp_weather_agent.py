@@ -14,7 +14,14 @@ from dotenv import load_dotenv
 
 from utils.log_base import setup_logging, set_log_color_level
 from api_router.router import router as agents_router
-from api_router.did_auth_middleware import did_auth_middleware
+from api_router.did_auth_middleware import NONCE_STORE, did_auth_middleware
+from api_router.sqlite_nonce_store import SQLiteNonceStore
+from api_router.weather.weather_info_router import (
+    DISK_WEATHER_CACHE,
+    WEATHER_CACHE_SNAPSHOT,
+    WEATHER_PREFETCHER,
+)
+from utils.http_client import init_http_session, close_http_session
 
 # Load environment variables
 load_dotenv()
@@ -24,7 +31,42 @@ current_script_path = os.path.abspath(__file__)
 current_directory = os.path.dirname(current_script_path)
 sys.path.append(current_directory)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared upstream HTTP session (keep-alive connection pool) for this worker
+    await init_http_session()
+    # Start warm: restore cached weather before the first request is served
+    if WEATHER_CACHE_SNAPSHOT is not None:
+        try:
+            WEATHER_CACHE_SNAPSHOT.load()
+        except Exception as e:
+            logging.error(f"Failed to load weather cache snapshot: {e}")
+        WEATHER_CACHE_SNAPSHOT.start()
+    # Sweep expired rows from the shared disk cache in the background
+    if DISK_WEATHER_CACHE is not None:
+        DISK_WEATHER_CACHE.start()
+    # Keep hot cities fresh in the background
+    if WEATHER_PREFETCHER is not None:
+        WEATHER_PREFETCHER.start()
+    # Sweep expired nonces from the shared nonce store in the background
+    if isinstance(NONCE_STORE, SQLiteNonceStore):
+        NONCE_STORE.start()
+    try:
+        yield
+    finally:
+        if WEATHER_PREFETCHER is not None:
+            await WEATHER_PREFETCHER.stop()
+        if WEATHER_CACHE_SNAPSHOT is not None:
+            await WEATHER_CACHE_SNAPSHOT.stop()
+        if DISK_WEATHER_CACHE is not None:
+            await DISK_WEATHER_CACHE.stop()
+        if isinstance(NONCE_STORE, SQLiteNonceStore):
+            await NONCE_STORE.stop()
+        await close_http_session()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Register routes
 app.include_router(agents_router)
@@ -4,7 +4,7 @@ import logging
 import traceback
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple
 
 
 from agent_connect.authentication import (
@@ -12,7 +12,27 @@ from agent_connect.authentication import (
     resolve_did_wba_document,
     extract_auth_header_parts,
 )
-from api_router.jwt_config import get_jwt_private_key, get_jwt_public_key
+from api_router.jwt_config import (
+    JWT_KEYS,
+    get_jwt_signing_key,
+    get_jwt_verification_key,
+)
+from api_router.did_document_cache import DIDDocumentCache
+from api_router.token_cache import VerifiedTokenCache
+from api_router.nonce_store import NonceStore, NonceStoreError, NonceStoreFullError
+from api_router.sqlite_nonce_store import SQLiteNonceStore
+from config import (
+    DID_DOCUMENT_CACHE_TTL_SECONDS,
+    DID_DOCUMENT_CACHE_NEGATIVE_TTL_SECONDS,
+    DID_DOCUMENT_CACHE_MAX_SIZE,
+    DID_DOCUMENT_CACHE_MIN_REFRESH_SECONDS,
+    BEARER_TOKEN_CACHE_MAX_SIZE,
+    NONCE_STORE_MAX_SIZE,
+    NONCE_STORE_OVERFLOW_POLICY,
+    NONCE_STORE_BACKEND,
+    NONCE_STORE_SQLITE_PATH,
+)
+from utils.metrics import register_metrics_source
 
 # Define exempt paths
 # EXEMPT_PATHS = ["/agents/travel/weather/api/weather_info", "/agents/travel/weather/ad.json", "/agents/travel/weather/api_files/weather-info.yaml"]
@@ -28,17 +48,49 @@ EXEMPT_PATHS = [
 # Timestamp expiration time (minutes)
 TIMESTAMP_EXPIRATION_MINUTES = 5
 
-# Nonce expiration time (minutes)
-NONCE_EXPIRATION_MINUTES = 6
+# Issued token lifetime (seconds)
+TOKEN_EXPIRATION_SECONDS = 300
 
-# Add a global variable to store used nonces
-USED_NONCES: Dict[str, Dict[str, datetime]] = {}
+# Nonce expiration time (minutes); longer than the timestamp window, so a
+# header is refused by its timestamp before its nonce is forgotten
+NONCE_EXPIRATION_MINUTES = 6
 
-# Add a global variable to record the last cleanup time
-LAST_CLEANUP_TIME: datetime = datetime.now(timezone.utc)
+# Used nonces, bucketed by expiry minute so expired nonces are dropped per bucket;
+# with several workers they must be shared, or a replay may reach another worker.
+# The SQLite store runs queries off the event loop, its sweep runs in the lifespan
+if NONCE_STORE_BACKEND == "sqlite":
+    NONCE_STORE = SQLiteNonceStore(
+        NONCE_STORE_SQLITE_PATH, ttl=NONCE_EXPIRATION_MINUTES * 60
+    )
+    logging.info(f"Using SQLite nonce store at {NONCE_STORE_SQLITE_PATH}")
+elif NONCE_STORE_BACKEND == "memory":
+    NONCE_STORE = NonceStore(
+        ttl=NONCE_EXPIRATION_MINUTES * 60,
+        max_size=NONCE_STORE_MAX_SIZE,
+        overflow=NONCE_STORE_OVERFLOW_POLICY,
+    )
+else:
+    # Never fall back to per-worker replay protection on a typo
+    raise ValueError(f"Unknown nonce store backend: {NONCE_STORE_BACKEND}")
+register_metrics_source("nonce_store", NONCE_STORE.stats)
+
+# Resolved DID documents, so re-authenticating agents skip the DID host round trip
+DID_DOCUMENT_CACHE = DIDDocumentCache(
+    resolve_did_wba_document,
+    ttl=DID_DOCUMENT_CACHE_TTL_SECONDS,
+    negative_ttl=DID_DOCUMENT_CACHE_NEGATIVE_TTL_SECONDS,
+    max_size=DID_DOCUMENT_CACHE_MAX_SIZE,
+    min_refresh_interval=DID_DOCUMENT_CACHE_MIN_REFRESH_SECONDS,
+)
+register_metrics_source("did_document_cache", DID_DOCUMENT_CACHE.stats)
 
-# Cleanup interval (seconds)
-CLEANUP_INTERVAL_SECONDS = 60
+# Claims of verified bearer tokens, so repeat requests skip the signature check;
+# tokens signed with rotated-out keys must be verified again
+VERIFIED_TOKEN_CACHE = VerifiedTokenCache(
+    max_size=BEARER_TOKEN_CACHE_MAX_SIZE, max_lifetime=TOKEN_EXPIRATION_SECONDS
+)
+JWT_KEYS.add_reload_listener(VERIFIED_TOKEN_CACHE.flush)
+register_metrics_source("bearer_token_cache", VERIFIED_TOKEN_CACHE.stats)
 
 # Define list of allowed server domains
 WBA_SERVER_DOMAINS = [
@@ -111,62 +163,9 @@ def get_and_validate_domain(request: Request) -> str:
         raise HTTPException(status_code=400, detail="Invalid domain")
 
 
-async def cleanup_expired_nonces():
-    """Clean up expired nonce records"""
-    try:
-        current_time = datetime.now(timezone.utc)
-
-        # Clean up expired used nonces
-        cleaned_count = 0
-        for did in list(USED_NONCES.keys()):
-            expired_did_nonces = [
-                n
-                for n, t in USED_NONCES[did].items()
-                if current_time - t > timedelta(minutes=NONCE_EXPIRATION_MINUTES)
-            ]
-            for expired_nonce in expired_did_nonces:
-                USED_NONCES[did].pop(expired_nonce)
-                cleaned_count += 1
-
-            # If all nonces for a DID are expired, remove the entire DID entry
-            if not USED_NONCES[did]:
-                USED_NONCES.pop(did)
-
-        # Database cleanup operations (commented out)
-        """
-        cleanup_query = '''
-            DELETE FROM nonces 
-            WHERE created_at < %s
-        '''
-        execute_query(cleanup_query, expiration_time)
-        """
-
-        if cleaned_count > 0:
-            logging.info(f"Cleaned up {cleaned_count} expired nonces")
-
-        # Update last cleanup time
-        global LAST_CLEANUP_TIME
-        LAST_CLEANUP_TIME = current_time
-
-    except Exception as e:
-        logging.error(f"Error during nonce cleanup: {e}")
-        logging.error("Stack trace:")
-        traceback.print_exc()
-
-
-async def check_and_cleanup_if_needed():
-    """Check if cleanup of expired nonces is needed, and clean up if necessary"""
-    current_time = datetime.now(timezone.utc)
-    global LAST_CLEANUP_TIME
-
-    # If more time than the cleanup interval has passed since the last cleanup, perform cleanup
-    if (current_time - LAST_CLEANUP_TIME).total_seconds() > CLEANUP_INTERVAL_SECONDS:
-        await cleanup_expired_nonces()
-
-
 async def verify_and_record_nonce(did: str, nonce: str) -> bool:
     """
-    Verify if nonce is valid and record it in the local dictionary
+    Verify if nonce is valid and record it in the nonce store
 
     Args:
         did: DID identifier
@@ -179,21 +178,15 @@ async def verify_and_record_nonce(did: str, nonce: str) -> bool:
         HTTPException: When nonce is invalid or operation fails
     """
     try:
-        # Check if nonce has already been used
-        if did in USED_NONCES and nonce in USED_NONCES[did]:
+        # Check if nonce has already been used, and record it if not
+        if isinstance(NONCE_STORE, SQLiteNonceStore):
+            is_new = await NONCE_STORE.check_and_record(did, nonce)
+        else:
+            is_new = NONCE_STORE.check_and_record(did, nonce)
+        if not is_new:
             logging.error(f"Nonce {nonce} has already been used for DID {did}")
             raise HTTPException(status_code=401, detail="Nonce has already been used")
 
-        # Record new nonce
-        current_time = datetime.now(timezone.utc)
-
-        # If DID is not in the dictionary, create a new entry
-        if did not in USED_NONCES:
-            USED_NONCES[did] = {}
-
-        # Record nonce usage
-        USED_NONCES[did][nonce] = current_time
-
         # Database operations (commented out)
         """
         # Check if nonce already exists
@@ -232,6 +225,22 @@ async def verify_and_record_nonce(did: str, nonce: str) -> bool:
 
     except HTTPException as http_exc:
         raise http_exc
+    except NonceStoreFullError as e:
+        # Refuse rather than forget nonces that could still be replayed
+        logging.error(f"Cannot record nonce: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many authentication requests, please retry later",
+            headers={"Retry-After": str(int(NONCE_STORE.bucket_seconds))},
+        )
+    except NonceStoreError as e:
+        # Refuse rather than accept a nonce that could not be checked
+        logging.error(f"Cannot check nonce: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Replay protection is temporarily unavailable, please retry later",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         logging.error(f"Error verifying/recording nonce: {e}")
         logging.error("Stack trace:")
@@ -243,6 +252,9 @@ async def generate_did_auth_token(authorization: str, domain: str) -> str:
     """
     Process DID authentication and generate JWT token
 
+    The nonce is recorded only once the signature is verified, so headers
+    that fail verification never take room in the nonce store.
+
     Args:
         authorization: DID authentication header
         domain: Server domain
@@ -254,7 +266,7 @@ async def generate_did_auth_token(authorization: str, domain: str) -> str:
         HTTPException: When authentication fails
     """
     try:
-        did, _, _, _, _ = extract_auth_header_parts(authorization)
+        did, nonce, _, _, _ = extract_auth_header_parts(authorization)
 
         if not did:
             logging.error("DID not found in authorization header")
@@ -262,8 +274,9 @@ async def generate_did_auth_token(authorization: str, domain: str) -> str:
                 status_code=401, detail="DID not found in authorization"
             )
 
-        # Parse DID document
-        did_doc = await resolve_did_wba_document(did)
+        # Parse DID document (cached per DID)
+        from_cache = did in DID_DOCUMENT_CACHE
+        did_doc = await DID_DOCUMENT_CACHE.resolve(did)
 
         logging.info(f"Resolved DID document: {did_doc}")
         logging.info(f"Domain: {domain}")
@@ -271,26 +284,47 @@ async def generate_did_auth_token(authorization: str, domain: str) -> str:
 
         # Verify signature
         is_valid, message = verify_auth_header_signature(authorization, did_doc, domain)
+        if not is_valid and from_cache:
+            # The agent may have rotated its keys since the document was cached;
+            # refresh() re-resolves at most once per interval per DID and keeps
+            # the cached document if the DID host fails
+            logging.info(
+                f"Signature check failed with cached DID document, re-resolving: {did}"
+            )
+            refreshed_doc = await DID_DOCUMENT_CACHE.refresh(did)
+            if refreshed_doc is not did_doc:
+                did_doc = refreshed_doc
+                is_valid, message = verify_auth_header_signature(
+                    authorization, did_doc, domain
+                )
         if not is_valid:
             logging.error(f"Signature verification failed: {message}")
             raise HTTPException(status_code=403, detail="Authentication failed")
 
+        # Verify and record nonce
+        await verify_and_record_nonce(did, nonce)
+        logging.info("Nonce verification and recording successful")
+
         # Generate JWT token
         current_time = datetime.now(timezone.utc)
         payload = {
             "sub": did,
-            "exp": current_time
-            + timedelta(seconds=300),  # Token 5 minutes later expires
+            "exp": current_time + timedelta(seconds=TOKEN_EXPIRATION_SECONDS),
             "iat": current_time,
         }
 
-        # Use jwt_config module to get private key
-        private_key = get_jwt_private_key()
-        if not private_key:
+        # Use jwt_config module to get the signing key; its kid names it in the token
+        signing_key = get_jwt_signing_key()
+        if not signing_key:
             logging.error("JWT private key not found")
             raise HTTPException(status_code=500, detail="Server configuration error")
 
-        token = jwt.encode(payload, private_key, algorithm="RS256")
+        token = jwt.encode(
+            payload,
+            signing_key.private_key,
+            algorithm=signing_key.algorithm,
+            headers={"kid": signing_key.kid},
+        )
         logging.info(f"Generated JWT token for DID: {did}")
         return token
 
@@ -313,14 +347,23 @@ async def verify_bearer_token(token: str) -> bool:
         HTTPException: When token is invalid or expired
     """
     try:
-        # Use jwt_config module to get public key
-        public_key = get_jwt_public_key()
-        if not public_key:
-            logging.error("JWT public key not found")
-            raise HTTPException(status_code=500, detail="Server configuration error")
-
-        # Verify JWT token
-        jwt.decode(token, public_key, algorithms=["RS256"])
+        # A token verified earlier is trusted until its exp
+        claims = VERIFIED_TOKEN_CACHE.get(token)
+        if claims is None:
+            # Use jwt_config module to get the key named by the token's kid; the
+            # algorithm comes from the key ring, never from the token
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = get_jwt_verification_key(kid)
+            if not key:
+                raise jwt.InvalidKeyError(f"Unknown JWT key id: {kid}")
+
+            # Verify JWT token
+            claims = jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+            VERIFIED_TOKEN_CACHE.put(token, claims)
+
+        if VERIFIED_TOKEN_CACHE.is_revoked(token, claims):
+            logging.error(f"Token has been revoked: sub={claims.get('sub')}")
+            raise HTTPException(status_code=401, detail="Token has been revoked")
         logging.info("Bearer token verification successful")
         return True
     except jwt.ExpiredSignatureError:
@@ -392,11 +435,7 @@ async def authenticate_did_request(
                 )
             logging.info("Timestamp verification successful")
 
-            # Verify and record nonce
-            await verify_and_record_nonce(did, nonce)
-            logging.info("Nonce verification and recording successful")
-
-            # Generate token
+            # Verify signature and nonce, then generate token
             token = await generate_did_auth_token(authorization, domain)
             logging.info(f"Generated token: {token[:30]}...")
             return True, token
@@ -436,9 +475,6 @@ async def did_auth_middleware(request: Request, call_next):
     Returns:
         Response: Response object
     """
-    # Check if cleanup of expired nonces is needed
-    await check_and_cleanup_if_needed()
-
     try:
         logging.info(f"Processing request to {request.url.path}")
         is_authenticated, token = await authenticate_did_request(request)
@@ -456,6 +492,8 @@ async def did_auth_middleware(request: Request, call_next):
             # Modify response headers, add token
             logging.info(f"Adding token to response headers: {token[:30]}...")
             response.headers["Authorization"] = f"Bearer {token}"
+            # A response carrying a freshly issued token must never be cached
+            response.headers["Cache-Control"] = "no-store"
         else:
             logging.info("No token generated, not adding to response headers")
 
@@ -465,4 +503,8 @@ async def did_auth_middleware(request: Request, call_next):
         logging.error(
             f"Authentication exception: status_code={exc.status_code}, detail={exc.detail}"
         )
-        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={"detail": exc.detail},
+            headers=exc.headers,
+        )
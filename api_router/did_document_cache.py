@@ -0,0 +1,218 @@
+"""
+Cache of resolved DID documents.
+
+DIDwba authentication needs the DID document of the caller, which lives on
+the caller's own host. Agents re-authenticate all day with the same DIDs, so
+resolved documents are kept for a TTL and failed resolutions for a shorter
+negative TTL, in a bounded LRU. Concurrent resolutions of the same DID share
+one request to the DID host.
+
+A cached document is re-resolved early when a signature does not verify
+against it (the agent may have rotated its keys), but at most once per
+min_refresh_interval: anyone can send a bad signature for any DID. A failed
+re-resolution keeps the cached document.
+"""
+
+import logging
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from utils.single_flight import SingleFlight
+
+
+@dataclass
+class _ResolvedDocument:
+    """A resolved DID document, or None when resolution failed"""
+
+    document: Optional[Dict[str, Any]]
+    expires_at: float
+    # When the DID host was last asked for the document
+    checked_at: float
+
+
+class DIDDocumentCache:
+    """
+    TTL + LRU cache in front of a DID resolver.
+
+    Args:
+        resolve: Coroutine function resolving a DID to its document, or None on failure
+        ttl: Seconds a resolved document is reused (0: always resolve)
+        negative_ttl: Seconds a failed resolution is reused
+        max_size: Maximum number of DIDs kept, least recently used are evicted
+        min_refresh_interval: Minimum seconds between two resolutions of a DID
+            requested through refresh()
+    """
+
+    def __init__(
+        self,
+        resolve: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+        ttl: float,
+        negative_ttl: float,
+        max_size: int,
+        min_refresh_interval: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._resolve = resolve
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.min_refresh_interval = min_refresh_interval
+        self._clock = clock
+        self._entries: "OrderedDict[str, _ResolvedDocument]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refreshes_skipped = 0
+        self.refresh_failures = 0
+
+    def _get(self, did: str) -> Optional[_ResolvedDocument]:
+        entry = self._entries.get(did)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._clock():
+            del self._entries[did]
+            return None
+        self._entries.move_to_end(did)
+        return entry
+
+    def __contains__(self, did: str) -> bool:
+        """Whether a live resolved document (not a failure) is cached for did"""
+        entry = self._entries.get(did)
+        return (
+            entry is not None
+            and entry.document is not None
+            and entry.expires_at > self._clock()
+        )
+
+    async def resolve(self, did: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the DID document of did from cache, or resolve it
+
+        Args:
+            did: DID to resolve, e.g. did:wba:example.com:user:alice
+
+        Returns:
+            Optional[Dict[str, Any]]: The DID document, or None if it could not be resolved
+
+        Raises:
+            ValueError: When the DID is malformed (not cached)
+        """
+        entry = self._get(did)
+        if entry is not None:
+            if entry.document is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry.document
+
+        self.misses += 1
+        return await self._flights.do(did, lambda: self._load(did))
+
+    async def refresh(self, did: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve the document of did again, ahead of its TTL
+
+        Used when a signature does not verify against a cached document, as
+        the agent may have rotated its keys since it was cached. The request
+        is not authenticated, so a document checked less than
+        min_refresh_interval ago is returned as is, concurrent refreshes
+        share one resolution, and a failed resolution keeps the cached
+        document.
+
+        Args:
+            did: DID to resolve again
+
+        Returns:
+            Optional[Dict[str, Any]]: The current DID document, or None if
+            none was cached and it could not be resolved
+        """
+        entry = self._get(did)
+        if entry is None or entry.document is None:
+            # Nothing to refresh: resolve as usual, failures stay negative-cached
+            return await self.resolve(did)
+        if self._clock() - entry.checked_at < self.min_refresh_interval:
+            self.refreshes_skipped += 1
+            return entry.document
+        self.refreshes += 1
+        return await self._flights.do(did, lambda: self._reload(did, entry))
+
+    async def _reload(
+        self, did: str, previous: _ResolvedDocument
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            document = await self._resolve(did)
+        except Exception as e:
+            logging.warning(f"Re-resolving DID document failed for {did}: {e}")
+            document = None
+        if document is None:
+            # Keep serving the document that was valid until now; the next
+            # refresh waits for min_refresh_interval again
+            self.refresh_failures += 1
+            previous.checked_at = self._clock()
+            return previous.document
+        return self._store(did, document, self.ttl)
+
+    async def _load(self, did: str) -> Optional[Dict[str, Any]]:
+        document = await self._resolve(did)
+        if document is None:
+            self.failures += 1
+            return self._store(did, None, self.negative_ttl)
+        return self._store(did, document, self.ttl)
+
+    def _store(
+        self, did: str, document: Optional[Dict[str, Any]], ttl: float
+    ) -> Optional[Dict[str, Any]]:
+        if ttl > 0:
+            now = self._clock()
+            self._entries[did] = _ResolvedDocument(document, now + ttl, now)
+            self._entries.move_to_end(did)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return document
+
+    def invalidate(self, did: str) -> None:
+        """Forget the cached document or failure of did"""
+        self._entries.pop(did, None)
+
+    def clear(self) -> None:
+        """Forget every cached document and failure"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict[str, Any]: Size, TTLs, hit/miss/failure/refresh counts and
+            coalesced resolutions
+        """
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "refreshes_skipped": self.refreshes_skipped,
+            "refresh_failures": self.refresh_failures,
+            "hit_rate": (
+                round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0
+            ),
+            "resolutions": self._flights.stats(),
+        }
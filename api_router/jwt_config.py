@@ -1,11 +1,44 @@
 """
-JWT configuration module providing functions to get JWT public and private keys.
+JWT configuration module providing the JWT signing and verification keys.
+
+Keys form a key ring: one signing key (JWT_PRIVATE_KEY_PATH and its public
+key JWT_PUBLIC_KEY_PATH) plus verification-only public keys
+(JWT_VERIFY_KEY_PATHS). RSA, EC P-256/P-384/P-521 and Ed25519 keys are
+supported; the JWT algorithm follows from the key type (RS256, ES256/384/512,
+EdDSA) and each key is identified by a kid derived from its public key, which
+issued tokens carry in their header.
+
+The PEM files are read and parsed once at startup and kept in memory. Key
+rotation is picked up without a restart: at most every
+JWT_KEY_RELOAD_INTERVAL_SECONDS the file modification times are checked, and
+when they changed the ring is parsed again and swapped in as a whole. Keys
+rotated out keep verifying for JWT_RETIRED_KEY_GRACE_SECONDS, so tokens
+issued just before the rotation stay valid until they expire.
 """
 
 import os
+import time
+import base64
+import hashlib
 import logging
-from typing import Optional
-from config import JWT_PRIVATE_KEY_PATH, JWT_PUBLIC_KEY_PATH
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from cryptography.hazmat.primitives.asymmetric.types import (
+    PrivateKeyTypes,
+    PublicKeyTypes,
+)
+
+from config import (
+    JWT_PRIVATE_KEY_PATH,
+    JWT_PUBLIC_KEY_PATH,
+    JWT_VERIFY_KEY_PATHS,
+    JWT_KEY_RELOAD_INTERVAL_SECONDS,
+    JWT_RETIRED_KEY_GRACE_SECONDS,
+)
+from utils.metrics import register_metrics_source
 
 # 确保密钥文件存在
 if not os.path.exists(JWT_PRIVATE_KEY_PATH):
@@ -13,50 +46,350 @@ if not os.path.exists(JWT_PRIVATE_KEY_PATH):
 if not os.path.exists(JWT_PUBLIC_KEY_PATH):
     raise FileNotFoundError(f"JWT public key not found at: {JWT_PUBLIC_KEY_PATH}")
 
+# JWT algorithm of each supported elliptic curve
+EC_ALGORITHMS = {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}
+
+
+def load_private_key(key_path: str) -> PrivateKeyTypes:
+    """Read and parse an unencrypted PEM private key"""
+    with open(key_path, "rb") as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
+def load_public_key(key_path: str) -> PublicKeyTypes:
+    """Read and parse a PEM public key"""
+    with open(key_path, "rb") as f:
+        return serialization.load_pem_public_key(f.read())
+
+
+def public_key_bytes(key: PublicKeyTypes) -> bytes:
+    """Encode a public key as DER, for comparing keys"""
+    return key.public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
 
-def get_jwt_private_key(key_path: str = JWT_PRIVATE_KEY_PATH) -> Optional[str]:
+
+def key_id(public_key: PublicKeyTypes) -> str:
+    """Get the kid of a key: a truncated SHA-256 of its public key, stable across workers"""
+    digest = hashlib.sha256(public_key_bytes(public_key)).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode("ascii")
+
+
+def key_algorithm(public_key: PublicKeyTypes) -> str:
+    """
+    Get the JWT algorithm of a key from its type
+
+    Raises:
+        ValueError: When the key type or curve is not supported
     """
-    Get the JWT private key from a PEM file.
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        algorithm = EC_ALGORITHMS.get(public_key.curve.name)
+        if algorithm:
+            return algorithm
+        raise ValueError(f"Unsupported JWT key curve: {public_key.curve.name}")
+    raise ValueError(f"Unsupported JWT key type: {type(public_key).__name__}")
+
+
+@dataclass(frozen=True)
+class JWTSigningKey:
+    """The key new tokens are signed with"""
+
+    kid: str
+    algorithm: str
+    private_key: PrivateKeyTypes
+    public_key: PublicKeyTypes
+
+
+@dataclass(frozen=True)
+class JWTVerificationKey:
+    """A key tokens are verified with; retired keys have an expiry"""
+
+    kid: str
+    algorithm: str
+    public_key: PublicKeyTypes
+    retired_until: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class JWTKeyRing:
+    """Parsed signing and verification keys, swapped as one object"""
+
+    signing: JWTSigningKey
+    verification: Dict[str, JWTVerificationKey]
+    mtimes: Tuple[float, ...]
+    loaded_at: float
+
+    @property
+    def private_key(self) -> PrivateKeyTypes:
+        return self.signing.private_key
+
+    @property
+    def public_key(self) -> PublicKeyTypes:
+        return self.signing.public_key
+
+
+class JWTKeyStore:
+    """
+    Parsed JWT key ring, reloaded when its PEM files change.
+
+    Reload checks happen on key access, at most once per check_interval, so
+    requests never touch the files otherwise. A new ring replaces the old one
+    only once every file parses and the public key matches the private key; a
+    rotation caught half-written keeps the old ring and is retried on the next
+    check. Verification keys dropped by a reload stay in the ring for
+    retired_grace seconds.
 
     Args:
-        key_path: Path to the private key PEM file (default: from config)
+        private_key_path: Signing private key PEM file
+        public_key_path: Public key PEM file of the signing key
+        check_interval: Seconds between two file modification checks (0: never reload)
+        verify_key_paths: Public key PEM files of additional verification-only keys
+        retired_grace: Seconds a key rotated out keeps verifying
+    """
+
+    def __init__(
+        self,
+        private_key_path: str,
+        public_key_path: str,
+        check_interval: float,
+        verify_key_paths: Tuple[str, ...] = (),
+        retired_grace: float = 600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.private_key_path = private_key_path
+        self.public_key_path = public_key_path
+        self.verify_key_paths = tuple(verify_key_paths)
+        self.check_interval = check_interval
+        self.retired_grace = retired_grace
+        self._clock = clock
+        self._keys: Optional[JWTKeyRing] = None
+        self._checked_at = clock()
+        self._reload_listeners: List[Callable[[], None]] = []
+        self.reloads = 0
+        self.reload_failures = 0
+        self.reload()
+
+    def _paths(self) -> Tuple[str, ...]:
+        return (self.private_key_path, self.public_key_path) + self.verify_key_paths
+
+    def _mtimes(self) -> Tuple[float, ...]:
+        return tuple(os.stat(path).st_mtime for path in self._paths())
+
+    def _load_ring(self) -> JWTKeyRing:
+        mtimes = self._mtimes()
+        private_key = load_private_key(self.private_key_path)
+        public_key = load_public_key(self.public_key_path)
+        if public_key_bytes(private_key.public_key()) != public_key_bytes(public_key):
+            raise ValueError("public key does not match private key")
+        signing = JWTSigningKey(
+            key_id(public_key), key_algorithm(public_key), private_key, public_key
+        )
+
+        verification = {
+            signing.kid: JWTVerificationKey(signing.kid, signing.algorithm, public_key)
+        }
+        for path in self.verify_key_paths:
+            key = load_public_key(path)
+            kid = key_id(key)
+            verification.setdefault(
+                kid, JWTVerificationKey(kid, key_algorithm(key), key)
+            )
+
+        # Keys rotated out keep verifying tokens issued before the rotation
+        if self._keys is not None:
+            now = time.time()
+            for kid, key in self._keys.verification.items():
+                if kid in verification:
+                    continue
+                if key.retired_until is None:
+                    key = JWTVerificationKey(
+                        kid, key.algorithm, key.public_key, now + self.retired_grace
+                    )
+                if key.retired_until > now:
+                    verification[kid] = key
+        return JWTKeyRing(signing, verification, mtimes, time.time())
+
+    def reload(self) -> bool:
+        """
+        Parse every key file and swap the new ring in
+
+        Returns:
+            bool: Whether the new keys were loaded; the previous keys are kept otherwise
+        """
+        try:
+            ring = self._load_ring()
+        except Exception as e:
+            self.reload_failures += 1
+            logging.error(f"Error loading JWT keys: {e}")
+            return False
+
+        rotated = self._keys is not None
+        self._keys = ring
+        self.reloads += 1
+        logging.info(
+            f"Loaded JWT keys: signing kid={ring.signing.kid} "
+            f"({ring.signing.algorithm}), {len(ring.verification)} verification keys"
+        )
+        if rotated:
+            for listener in self._reload_listeners:
+                listener()
+        return True
+
+    def add_reload_listener(self, listener: Callable[[], None]) -> None:
+        """Call listener whenever rotated keys have been swapped in"""
+        self._reload_listeners.append(listener)
+
+    def keys(self) -> Optional[JWTKeyRing]:
+        """
+        Get the current key ring, reloading it first if the files changed
+
+        Returns:
+            Optional[JWTKeyRing]: The keys, or None if they never loaded
+        """
+        if self.check_interval > 0:
+            now = self._clock()
+            if now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                self._reload_if_changed()
+        return self._keys
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtimes = self._mtimes()
+        except OSError as e:
+            logging.error(f"Error checking JWT key files: {e}")
+            return
+        if self._keys is None or mtimes != self._keys.mtimes:
+            logging.info("JWT key files changed, reloading")
+            self.reload()
+
+    def signing_key(self) -> Optional[JWTSigningKey]:
+        """Get the key new tokens are signed with, or None if keys never loaded"""
+        keys = self.keys()
+        return keys.signing if keys else None
+
+    def verification_key(self, kid: Optional[str]) -> Optional[JWTVerificationKey]:
+        """
+        Get the key a token is verified with
+
+        Args:
+            kid: kid header of the token; tokens without one (issued before kids
+                were added) are verified with the signing key
+
+        Returns:
+            Optional[JWTVerificationKey]: The key, or None if kid is unknown or retired
+        """
+        keys = self.keys()
+        if keys is None:
+            return None
+        if kid is None:
+            kid = keys.signing.kid
+        key = keys.verification.get(kid)
+        if key is None or (
+            key.retired_until is not None and key.retired_until <= time.time()
+        ):
+            return None
+        return key
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get key ring state and reload counters
+
+        Returns:
+            Dict[str, Any]: Signing kid and algorithm, verification kids, reload counts
+        """
+        keys = self._keys
+        return {
+            "loaded": keys is not None,
+            "loaded_at": keys.loaded_at if keys else None,
+            "signing_kid": keys.signing.kid if keys else None,
+            "algorithm": keys.signing.algorithm if keys else None,
+            "verification_kids": sorted(keys.verification) if keys else [],
+            "check_interval": self.check_interval,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+        }
+
+
+# Keys of this process, parsed at import
+JWT_KEYS = JWTKeyStore(
+    JWT_PRIVATE_KEY_PATH,
+    JWT_PUBLIC_KEY_PATH,
+    check_interval=JWT_KEY_RELOAD_INTERVAL_SECONDS,
+    verify_key_paths=JWT_VERIFY_KEY_PATHS,
+    retired_grace=JWT_RETIRED_KEY_GRACE_SECONDS,
+)
+register_metrics_source("jwt_keys", JWT_KEYS.stats)
+
+
+def get_jwt_signing_key() -> Optional[JWTSigningKey]:
+    """
+    Get the key new JWT tokens are signed with.
 
     Returns:
-        Optional[str]: The private key content as a string, or None if the file cannot be read
+        Optional[JWTSigningKey]: kid, algorithm and key, or None if the keys cannot be loaded
     """
-    if not os.path.exists(key_path):
-        logging.error(f"Private key file not found: {key_path}")
-        return None
+    return JWT_KEYS.signing_key()
+
+
+def get_jwt_verification_key(kid: Optional[str]) -> Optional[JWTVerificationKey]:
+    """
+    Get the key a JWT token with the given kid header is verified with.
+
+    Args:
+        kid: kid header of the token, or None for tokens without one
+
+    Returns:
+        Optional[JWTVerificationKey]: algorithm and key, or None if kid is unknown
+    """
+    return JWT_KEYS.verification_key(kid)
+
+
+def get_jwt_private_key(
+    key_path: str = JWT_PRIVATE_KEY_PATH,
+) -> Optional[PrivateKeyTypes]:
+    """
+    Get the JWT private key.
+
+    Args:
+        key_path: Path to the private key PEM file (default: from config, served
+            from memory; other paths are read and parsed on every call)
+
+    Returns:
+        Optional[PrivateKeyTypes]: The parsed private key, or None if it cannot be loaded
+    """
+    if key_path == JWT_KEYS.private_key_path:
+        keys = JWT_KEYS.keys()
+        return keys.private_key if keys else None
 
     try:
-        with open(key_path, "r") as f:
-            private_key = f.read()
-        logging.info(f"Successfully read private key from {key_path}")
-        return private_key
+        return load_private_key(key_path)
     except Exception as e:
         logging.error(f"Error reading private key file: {e}")
         return None
 
 
-def get_jwt_public_key(key_path: str = JWT_PUBLIC_KEY_PATH) -> Optional[str]:
+def get_jwt_public_key(key_path: str = JWT_PUBLIC_KEY_PATH) -> Optional[PublicKeyTypes]:
     """
-    Get the JWT public key from a PEM file.
+    Get the JWT public key.
 
     Args:
-        key_path: Path to the public key PEM file (default: from config)
+        key_path: Path to the public key PEM file (default: from config, served
+            from memory; other paths are read and parsed on every call)
 
     Returns:
-        Optional[str]: The public key content as a string, or None if the file cannot be read
+        Optional[PublicKeyTypes]: The parsed public key, or None if it cannot be loaded
     """
-    if not os.path.exists(key_path):
-        logging.error(f"Public key file not found: {key_path}")
-        return None
+    if key_path == JWT_KEYS.public_key_path:
+        keys = JWT_KEYS.keys()
+        return keys.public_key if keys else None
 
     try:
-        with open(key_path, "r") as f:
-            public_key = f.read()
-        logging.info(f"Successfully read public key from {key_path}")
-        return public_key
+        return load_public_key(key_path)
     except Exception as e:
         logging.error(f"Error reading public key file: {e}")
         return None
@@ -76,13 +409,13 @@ def get_jwt_public_key(key_path: str = JWT_PUBLIC_KEY_PATH) -> Optional[str]:
 #     if private_key:
 #         print("\n=== Private Key ===")
 #         print(private_key)
-#         print(f"Size: {len(private_key)} bytes")
+#         print(f"Size: {private_key.key_size} bits")
 #     else:
 #         print("\nFailed to read private key")
 
 #     if public_key:
 #         print("\n=== Public Key ===")
 #         print(public_key)
-#         print(f"Size: {len(public_key)} bytes")
+#         print(f"Size: {public_key.key_size} bits")
 #     else:
 #         print("\nFailed to read public key")
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from utils.metrics import collect_metrics
+
+router = APIRouter()
+
+
+@router.get("/api/metrics")
+async def get_metrics():
+    """
+    Get in-process metrics (cache hit rates, limiter usage, ...) of this worker
+
+    Returns:
+        Metrics of every registered component, keyed by component name
+    """
+    return JSONResponse(content=collect_metrics())
@@ -0,0 +1,164 @@
+"""
+Replay protection for DIDwba authentication headers.
+
+Every nonce accepted for a DID is remembered until the header it came with
+can no longer pass the timestamp check. Nonces are grouped in buckets by the
+minute in which they expire, so expiry drops whole buckets at once instead of
+walking every nonce, and a lookup checks only the few live buckets.
+"""
+
+import time
+import math
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Set
+
+# What to do with a new nonce when the store is full
+OVERFLOW_REJECT = "reject"
+OVERFLOW_EVICT_OLDEST = "evict_oldest"
+OVERFLOW_POLICIES = (OVERFLOW_REJECT, OVERFLOW_EVICT_OLDEST)
+
+
+class NonceStoreError(Exception):
+    """Raised when a nonce can be neither recorded nor checked"""
+
+
+class NonceStoreFullError(NonceStoreError):
+    """Raised when a nonce cannot be recorded because the store is full"""
+
+
+def expiry_bucket(now: float, ttl: float, bucket_seconds: float) -> int:
+    """Get the bucket of a nonce recorded now: the first bucket boundary after its TTL"""
+    return math.ceil((now + ttl) / bucket_seconds)
+
+
+class NonceStore:
+    """
+    Used nonces per DID, bucketed by expiry minute, with a hard size cap.
+
+    When the store holds max_size live nonces, the overflow policy decides:
+    "reject" refuses new nonces (NonceStoreFullError) until a bucket expires,
+    so no replay is ever accepted; "evict_oldest" forgets nonces from the
+    bucket closest to expiry, keeping authentication available at the cost of
+    replay protection for those nonces.
+
+    Args:
+        ttl: Seconds a nonce is remembered (at least; up to one bucket longer)
+        max_size: Maximum number of nonces held
+        overflow: Overflow policy, "reject" or "evict_oldest"
+        bucket_seconds: Width of an expiry bucket
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int,
+        overflow: str = OVERFLOW_REJECT,
+        bucket_seconds: float = 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown nonce store overflow policy: {overflow}")
+        self.ttl = ttl
+        self.max_size = max_size
+        self.overflow = overflow
+        self.bucket_seconds = bucket_seconds
+        self._clock = clock
+        # expiry bucket -> "did nonce" keys (a DID has no spaces), oldest bucket first
+        self._buckets: "OrderedDict[int, Set[str]]" = OrderedDict()
+        self._size = 0
+        self.recorded = 0
+        self.replays = 0
+        self.expired = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    def check_and_record(self, did: str, nonce: str) -> bool:
+        """
+        Record a nonce unless it was already used for the DID
+
+        Args:
+            did: DID identifier
+            nonce: Nonce of the authentication header
+
+        Returns:
+            bool: True if the nonce is new (and is now recorded), False on a replay
+
+        Raises:
+            NonceStoreFullError: When the store is full and the policy is "reject"
+        """
+        now = self._clock()
+        self._expire(now)
+        key = f"{did} {nonce}"
+        for nonces in self._buckets.values():
+            if key in nonces:
+                self.replays += 1
+                return False
+
+        if self._size >= self.max_size:
+            if self.overflow == OVERFLOW_REJECT or not self._buckets:
+                self.rejected += 1
+                raise NonceStoreFullError(f"Nonce store is full ({self._size} nonces)")
+            self._evict_one()
+
+        bucket = expiry_bucket(now, self.ttl, self.bucket_seconds)
+        nonces = self._buckets.get(bucket)
+        if nonces is None:
+            nonces = self._buckets[bucket] = set()
+        nonces.add(key)
+        self._size += 1
+        self.recorded += 1
+        return True
+
+    def _expire(self, now: float) -> None:
+        """Drop every bucket whose expiry minute has passed"""
+        while self._buckets:
+            bucket, nonces = next(iter(self._buckets.items()))
+            if bucket * self.bucket_seconds > now:
+                break
+            del self._buckets[bucket]
+            self._size -= len(nonces)
+            self.expired += len(nonces)
+
+    def _evict_one(self) -> None:
+        """Forget one nonce from the bucket closest to expiry"""
+        bucket, nonces = next(iter(self._buckets.items()))
+        nonces.pop()
+        if not nonces:
+            del self._buckets[bucket]
+        self._size -= 1
+        self.evicted += 1
+        if self.evicted % 1000 == 1:
+            logging.warning(
+                f"Nonce store full ({self.max_size}), evicting nonces before expiry"
+            )
+
+    def clear(self) -> None:
+        """Forget every nonce"""
+        self._buckets.clear()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get store counters
+
+        Returns:
+            Dict[str, Any]: Size, bucket count, and recorded/replayed/expired/
+            evicted/rejected nonce counts
+        """
+        self._expire(self._clock())
+        return {
+            "backend": "memory",
+            "size": self._size,
+            "max_size": self.max_size,
+            "buckets": len(self._buckets),
+            "overflow": self.overflow,
+            "recorded": self.recorded,
+            "replays": self.replays,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "rejected": self.rejected,
+        }
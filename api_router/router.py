@@ -5,6 +5,7 @@ import os
 import json
 import asyncio
 from .discovery_router import router as discovery_router
+from .metrics_router import router as metrics_router
 import logging
 from .weather.ad_router import router as weather_ad_router
 from .weather.yaml_router import router as weather_yaml_router
@@ -24,6 +25,9 @@ router.include_router(weather_info_router)
 router.include_router(weather_subscription_router)
 router.include_router(weather_nl_router)
 
+# 注册运行指标路由
+router.include_router(metrics_router)
+
 current_directory = os.path.dirname(os.path.abspath(__file__))
 
 
@@ -0,0 +1,228 @@
+"""
+Nonce store shared by every worker on a host.
+
+With several uvicorn workers, a replayed DIDwba header may reach a different
+worker than the original one, so used nonces must be visible to all of them.
+They live in a SQLite database in WAL mode with a unique index on
+(did, nonce): recording a nonce is a single INSERT that either adds the row
+or finds it already there, so two workers can never both accept the same
+nonce. Rows carry the same expiry bucket as the in-process NonceStore and
+expired buckets are deleted in small batches by a periodic background sweep.
+
+Every database call runs on one dedicated thread: waiting for another
+worker's write lock, or a sweep, never stalls the event loop.
+"""
+
+import time
+import asyncio
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .nonce_store import NonceStoreError, expiry_bucket
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nonces (
+    did TEXT NOT NULL,
+    nonce TEXT NOT NULL,
+    expiry_bucket INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS nonces_did_nonce ON nonces (did, nonce);
+CREATE INDEX IF NOT EXISTS nonces_expiry_bucket ON nonces (expiry_bucket);
+"""
+
+# Adds the nonce, or revives a row whose bucket expired but was not swept yet;
+# changes nothing (rowcount 0) when the nonce is still live, i.e. on a replay
+RECORD_NONCE = """
+INSERT INTO nonces (did, nonce, expiry_bucket) VALUES (?, ?, ?)
+ON CONFLICT (did, nonce) DO UPDATE SET expiry_bucket = excluded.expiry_bucket
+WHERE nonces.expiry_bucket <= ?
+"""
+
+
+class SQLiteNonceStore:
+    """
+    SQLite-backed nonce store with atomic check-and-insert across processes.
+
+    Unlike the in-process store there is no size cap: rows live on disk and
+    are bounded by the request rate over the TTL. A database error (e.g. a
+    write lock held past busy_timeout) raises NonceStoreError, so a nonce is
+    never accepted unchecked.
+
+    Args:
+        path: Database file, created with its directory if missing
+        ttl: Seconds a nonce is remembered (at least; up to one bucket longer)
+        bucket_seconds: Width of an expiry bucket, also the sweep interval
+        sweep_batch: Maximum expired rows deleted per statement, so a sweep
+            never holds the write lock for long
+        busy_timeout: Seconds to wait for another worker's write lock
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float,
+        bucket_seconds: float = 60,
+        sweep_batch: int = 1000,
+        busy_timeout: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.bucket_seconds = bucket_seconds
+        self.sweep_batch = sweep_batch
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.replays = 0
+        self.expired = 0
+        self.errors = 0
+        # Live nonce count of all workers as of the last sweep
+        self.size = None
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # The connection is only used from the executor's single thread
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="nonce-store"
+        )
+        self._conn = sqlite3.connect(
+            path, timeout=busy_timeout, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    async def _run_in_thread(self, fn: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, fn, *args
+        )
+
+    async def check_and_record(self, did: str, nonce: str) -> bool:
+        """
+        Record a nonce unless any worker already used it for the DID
+
+        Args:
+            did: DID identifier
+            nonce: Nonce of the authentication header
+
+        Returns:
+            bool: True if the nonce is new (and is now recorded), False on a replay
+
+        Raises:
+            NonceStoreError: When the database cannot be written
+        """
+        try:
+            inserted = await self._run_in_thread(
+                self._record, did, nonce, self._clock()
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            raise NonceStoreError(f"Nonce store write failed: {e}") from e
+
+        if not inserted:
+            self.replays += 1
+            return False
+        self.recorded += 1
+        return True
+
+    def _record(self, did: str, nonce: str, now: float) -> int:
+        return self._conn.execute(
+            RECORD_NONCE,
+            (
+                did,
+                nonce,
+                expiry_bucket(now, self.ttl, self.bucket_seconds),
+                int(now // self.bucket_seconds),
+            ),
+        ).rowcount
+
+    async def sweep(self) -> int:
+        """
+        Delete the rows of expired buckets, sweep_batch rows at a time
+
+        Expired rows are ignored by check_and_record, so a failed sweep only
+        leaves them on disk until the next one.
+
+        Returns:
+            int: Number of rows deleted
+        """
+        current_bucket = int(self._clock() // self.bucket_seconds)
+        deleted = 0
+        try:
+            while True:
+                batch = await self._run_in_thread(self._sweep_batch, current_bucket)
+                deleted += batch
+                if batch < self.sweep_batch:
+                    break
+            self.size = await self._run_in_thread(self._count, current_bucket)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logging.warning(f"Nonce store sweep failed: {e}")
+        self.expired += deleted
+        return deleted
+
+    def _sweep_batch(self, current_bucket: int) -> int:
+        return self._conn.execute(
+            "DELETE FROM nonces WHERE rowid IN ("
+            "SELECT rowid FROM nonces WHERE expiry_bucket <= ? LIMIT ?)",
+            (current_bucket, self.sweep_batch),
+        ).rowcount
+
+    def _count(self, current_bucket: int) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM nonces WHERE expiry_bucket > ?", (current_bucket,)
+        ).fetchone()[0]
+
+    async def count(self) -> int:
+        """Count the live nonces of all workers (a scan of the live rows)"""
+        current_bucket = int(self._clock() // self.bucket_seconds)
+        return await self._run_in_thread(self._count, current_bucket)
+
+    async def clear(self) -> None:
+        """Forget every nonce, in every worker"""
+        await self._run_in_thread(self._conn.execute, "DELETE FROM nonces")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.bucket_seconds)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logging.error(f"Nonce store sweep failed: {e}")
+
+    def start(self) -> None:
+        """Start periodic sweeps on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Stop periodic sweeps and close the database"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._run_in_thread(self._conn.close)
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get store counters (the counts are this worker's)
+
+        Returns:
+            Dict[str, Any]: Path, live nonce count of all workers at the last
+            sweep and recorded/replayed/expired/error counts
+        """
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "size": self.size,
+            "recorded": self.recorded,
+            "replays": self.replays,
+            "expired": self.expired,
+            "errors": self.errors,
+        }
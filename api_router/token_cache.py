@@ -0,0 +1,174 @@
+"""
+Cache of verified bearer tokens.
+
+An agent sends the same bearer token with every request for the token's
+whole lifetime. Once a token's signature has been verified, its claims are
+kept under a SHA-256 hash of the token until its `exp`, so later requests
+skip the signature check. Revoked tokens and subjects are refused whether or
+not they are cached.
+"""
+
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Claims of a verified token
+Claims = Dict[str, Any]
+
+
+def token_hash(token: str) -> bytes:
+    """Get the cache key of a token, so raw tokens are not kept in memory"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class VerifiedTokenCache:
+    """
+    LRU of verified token claims, valid until each token's exp.
+
+    Args:
+        max_size: Maximum number of tokens kept (0: disabled, nothing is cached)
+        max_lifetime: Revocations of tokens without an exp are kept this long
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_lifetime: float = 300,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self._clock = clock
+        # token hash -> (claims, exp)
+        self._entries: "OrderedDict[bytes, Tuple[Claims, float]]" = OrderedDict()
+        # token hash -> exp of revoked tokens, kept until they expire anyway
+        self._revoked_tokens: Dict[bytes, float] = {}
+        # subject -> tokens issued at or before this time are revoked
+        self._revoked_subjects: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.rejected = 0
+        self.flushes = 0
+
+    def get(self, token: str) -> Optional[Claims]:
+        """
+        Get the claims of a token verified earlier
+
+        Args:
+            token: Bearer token
+
+        Returns:
+            Optional[Claims]: The claims while the token is unexpired, or None
+            (the token must then be verified in full)
+        """
+        key = token_hash(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, exp = entry
+        if exp <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def put(self, token: str, claims: Claims) -> None:
+        """
+        Remember the claims of a token whose signature was just verified
+
+        Tokens without a numeric exp are not cached.
+        """
+        exp = claims.get("exp")
+        if self.max_size <= 0 or not isinstance(exp, (int, float)):
+            return
+        key = token_hash(token)
+        self._entries[key] = (claims, float(exp))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def is_revoked(self, token: str, claims: Claims) -> bool:
+        """Whether a token was revoked, by itself or through its subject"""
+        if self._revoked_tokens and token_hash(token) in self._revoked_tokens:
+            self.rejected += 1
+            return True
+        revoked_before = self._revoked_subjects.get(claims.get("sub"))
+        if revoked_before is not None and claims.get("iat", 0) <= revoked_before:
+            self.rejected += 1
+            return True
+        return False
+
+    def revoke(self, token: str, exp: Optional[float] = None) -> None:
+        """
+        Refuse a token from now on, even though its signature is valid
+
+        Args:
+            token: Bearer token
+            exp: Expiry of the token; the revocation is dropped after it
+        """
+        key = token_hash(token)
+        entry = self._entries.pop(key, None)
+        if exp is None:
+            exp = entry[1] if entry else self._clock() + self.max_lifetime
+        self._revoked_tokens[key] = exp
+        self._prune_revocations()
+
+    def revoke_subject(self, subject: str) -> None:
+        """Refuse every token issued to subject (a DID) until now"""
+        self._revoked_subjects[subject] = self._clock()
+        self._entries = OrderedDict(
+            (key, entry)
+            for key, entry in self._entries.items()
+            if entry[0].get("sub") != subject
+        )
+        self._prune_revocations()
+
+    def _prune_revocations(self) -> None:
+        now = self._clock()
+        self._revoked_tokens = {
+            key: exp for key, exp in self._revoked_tokens.items() if exp > now
+        }
+        # Every token issued before a subject revocation has expired by now
+        self._revoked_subjects = {
+            subject: revoked_at
+            for subject, revoked_at in self._revoked_subjects.items()
+            if revoked_at + self.max_lifetime > now
+        }
+
+    def flush(self) -> None:
+        """Forget every verified token (revocations are kept), e.g. after a key rotation"""
+        self._entries.clear()
+        self.flushes += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict[str, Any]: Size, hit/miss counts, revocations and flushes
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "revoked_tokens": len(self._revoked_tokens),
+            "revoked_subjects": len(self._revoked_subjects),
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+        }
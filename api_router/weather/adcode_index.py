@@ -0,0 +1,83 @@
+"""
+City name to AMAP adcode index.
+
+The adcode mapping file is parsed once and turned into a character trie, so
+prefix lookups cost O(len(city_name)) instead of a full scan of the list.
+"""
+
+import json
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+# Path to the adcode mapping file shipped with the weather router
+ADCODE_FILE_PATH = Path(__file__).parent / "amap_adcode.json"
+
+
+class AdcodeIndex:
+    """
+    Character trie over city names answering prefix lookups.
+
+    Every node remembers the adcode of the first entry (in file order) whose
+    name passes through it, which keeps the "first entry whose cityName starts
+    with the query" semantics of the original linear scan.
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        # A node is a two-item list: [first adcode, {char: child node}]
+        self._root: list = [None, {}]
+        self._size = 0
+        for city_name, adcode in entries:
+            self._insert(city_name, adcode)
+
+    def _insert(self, city_name: str, adcode: str) -> None:
+        node = self._root
+        if node[0] is None:
+            node[0] = adcode
+        for char in city_name:
+            children = node[1]
+            child = children.get(char)
+            if child is None:
+                child = [adcode, {}]
+                children[char] = child
+            node = child
+        self._size += 1
+
+    def lookup(self, prefix: str) -> Optional[str]:
+        """
+        Get the adcode of the first city whose name starts with prefix
+
+        Args:
+            prefix: Chinese city name or name prefix
+
+        Returns:
+            The adcode, or None if no city name starts with prefix
+        """
+        node = self._root
+        for char in prefix:
+            node = node[1].get(char)
+            if node is None:
+                return None
+        return node[0]
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def from_file(cls, path: Path = ADCODE_FILE_PATH) -> "AdcodeIndex":
+        """
+        Build the index from an adcode mapping file
+
+        Args:
+            path: JSON file containing a list of {cityName, adcode} objects
+
+        Returns:
+            AdcodeIndex: The populated index
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            adcode_map = json.load(f)
+        return cls(
+            (city_info["cityName"], str(city_info["adcode"]))
+            for city_info in adcode_map
+        )
@@ -0,0 +1,221 @@
+"""
+Pool of AMAP API keys.
+
+Requests are spread over the configured keys (round robin, or the key with
+the most remaining daily quota). A key whose response carries an invalid-key
+or quota infocode is quarantined for a cool-down period; daily-quota errors
+keep the key out until AMAP resets quotas at midnight Beijing time.
+"""
+
+import time
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# AMAP resets daily quotas at midnight Beijing time
+AMAP_TIMEZONE = timezone(timedelta(hours=8))
+
+STRATEGY_ROUND_ROBIN = "round_robin"
+STRATEGY_REMAINING_QUOTA = "remaining_quota"
+
+# Infocodes meaning the key cannot be used right now (quota / frequency)
+QUOTA_INFOCODES = {
+    "10004": "ACCESS_TOO_FREQUENT",
+    "10010": "IP_QUERY_OVER_LIMIT",
+    "10014": "QPS_HAS_EXCEEDED_THE_LIMIT",
+}
+# Infocodes meaning the key's daily quota is used up
+DAILY_QUOTA_INFOCODES = {
+    "10003": "DAILY_QUERY_OVER_LIMIT",
+    "10044": "USER_DAILY_QUERY_OVER_LIMIT",
+    "10045": "USER_ABROAD_DAILY_QUERY_OVER_LIMIT",
+}
+# Infocodes meaning the key itself is invalid or not allowed
+INVALID_KEY_INFOCODES = {
+    "10001": "INVALID_USER_KEY",
+    "10005": "INVALID_USER_IP",
+    "10006": "INVALID_USER_DOMAIN",
+    "10007": "INVALID_USER_SIGNATURE",
+    "10008": "INVALID_USER_SCODE",
+    "10009": "USERKEY_PLAT_NOMATCH",
+    "10012": "INSUFFICIENT_PRIVILEGES",
+    "10013": "USER_KEY_RECYCLED",
+}
+
+
+class NoApiKeyAvailable(Exception):
+    """Raised when every key in the pool is quarantined"""
+
+
+def mask_key(key: str) -> str:
+    """Mask an API key for logs and metrics"""
+    if len(key) <= 8:
+        return key[:2] + "***"
+    return f"{key[:4]}***{key[-4:]}"
+
+
+def _quota_day(now: float) -> str:
+    return datetime.fromtimestamp(now, AMAP_TIMEZONE).strftime("%Y-%m-%d")
+
+
+def _next_quota_reset(now: float) -> float:
+    local = datetime.fromtimestamp(now, AMAP_TIMEZONE)
+    midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight + timedelta(days=1)).timestamp()
+
+
+@dataclass
+class ApiKeyState:
+    """Usage and health of one API key"""
+
+    key: str
+    requests: int = 0
+    used_today: int = 0
+    quota_day: str = ""
+    quarantined_until: float = 0.0
+    quarantines: int = 0
+    last_infocode: Optional[str] = None
+    infocodes: Dict[str, int] = field(default_factory=dict)
+
+
+class ApiKeyPool:
+    """
+    Load-balanced pool of API keys with per-key health tracking.
+
+    Args:
+        keys: API keys
+        strategy: STRATEGY_ROUND_ROBIN or STRATEGY_REMAINING_QUOTA
+        cooldown: Seconds a key is quarantined after a key/quota error
+        daily_quota: Calls allowed per key per day (0: unknown, least used wins)
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        strategy: str = STRATEGY_ROUND_ROBIN,
+        cooldown: float = 300,
+        daily_quota: int = 0,
+        clock: Callable[[], float] = time.time,
+    ):
+        if not keys:
+            raise ValueError("At least one AMAP API key is required")
+        if strategy not in (STRATEGY_ROUND_ROBIN, STRATEGY_REMAINING_QUOTA):
+            raise ValueError(f"Unknown AMAP key strategy: {strategy}")
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.daily_quota = daily_quota
+        self._clock = clock
+        self._keys = [ApiKeyState(key) for key in dict.fromkeys(keys)]
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _roll_day(self, state: ApiKeyState, now: float) -> None:
+        today = _quota_day(now)
+        if state.quota_day != today:
+            state.quota_day = today
+            state.used_today = 0
+
+    def acquire(self) -> str:
+        """
+        Pick the key for the next request
+
+        Returns:
+            str: The API key
+
+        Raises:
+            NoApiKeyAvailable: When every key is quarantined
+        """
+        now = self._clock()
+        available = [s for s in self._keys if s.quarantined_until <= now]
+        if not available:
+            soonest = min(s.quarantined_until for s in self._keys)
+            raise NoApiKeyAvailable(
+                f"all {len(self._keys)} AMAP API keys are cooling down "
+                f"for another {soonest - now:.0f}s"
+            )
+        for state in available:
+            self._roll_day(state, now)
+
+        if self.strategy == STRATEGY_REMAINING_QUOTA:
+            # Most remaining quota; without a known quota, the least used key
+            state = min(available, key=lambda s: s.used_today)
+        else:
+            state = available[self._next % len(available)]
+            self._next += 1
+
+        state.requests += 1
+        state.used_today += 1
+        return state.key
+
+    def record_result(self, key: str, infocode: Optional[str]) -> bool:
+        """
+        Record the AMAP infocode returned for a key
+
+        Args:
+            key: The key used for the request
+            infocode: The infocode of the AMAP payload
+
+        Returns:
+            bool: True if the key was quarantined because of the infocode
+        """
+        state = next((s for s in self._keys if s.key == key), None)
+        if state is None or infocode is None:
+            return False
+        state.last_infocode = infocode
+        state.infocodes[infocode] = state.infocodes.get(infocode, 0) + 1
+
+        now = self._clock()
+        if infocode in DAILY_QUOTA_INFOCODES:
+            until = max(now + self.cooldown, _next_quota_reset(now))
+            reason = DAILY_QUOTA_INFOCODES[infocode]
+        elif infocode in QUOTA_INFOCODES:
+            until = now + self.cooldown
+            reason = QUOTA_INFOCODES[infocode]
+        elif infocode in INVALID_KEY_INFOCODES:
+            until = now + self.cooldown
+            reason = INVALID_KEY_INFOCODES[infocode]
+        else:
+            return False
+
+        state.quarantined_until = until
+        state.quarantines += 1
+        logging.warning(
+            f"Quarantined AMAP key {mask_key(key)} for {until - now:.0f}s: "
+            f"{infocode} {reason}"
+        )
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-key usage and health
+
+        Returns:
+            Dict[str, Any]: Strategy and counters for every (masked) key
+        """
+        now = self._clock()
+        keys = []
+        for state in self._keys:
+            self._roll_day(state, now)
+            key_stats = {
+                "key": mask_key(state.key),
+                "requests": state.requests,
+                "used_today": state.used_today,
+                "quarantined": state.quarantined_until > now,
+                "quarantine_remaining": max(0, round(state.quarantined_until - now)),
+                "quarantines": state.quarantines,
+                "last_infocode": state.last_infocode,
+                "infocodes": dict(state.infocodes),
+            }
+            if self.daily_quota > 0:
+                key_stats["remaining_today"] = max(
+                    0, self.daily_quota - state.used_today
+                )
+            keys.append(key_stats)
+        return {
+            "strategy": self.strategy,
+            "available": sum(1 for s in self._keys if s.quarantined_until <= now),
+            "keys": keys,
+        }
@@ -0,0 +1,258 @@
+"""
+On-disk weather cache shared by every worker on a host.
+
+Entries live in a SQLite database in WAL mode, so readers in one worker do
+not block the writer in another, and survive restarts and deploys. The
+in-process WeatherCache stays in front of it: the disk tier is read after an
+in-process miss and written after every successful upstream fetch, storing
+the upstream body bytes as received. Expired
+rows are kept for a retention period (as fallback data while the upstream is
+down) and then removed by a periodic background sweep that also compacts the
+file.
+
+Every database call runs on one dedicated thread: waiting for another
+worker's write lock, or a sweep, never stalls the event loop.
+"""
+
+import time
+import asyncio
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .weather_cache import CacheEntry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weather_cache (
+    adcode TEXT NOT NULL,
+    extensions TEXT NOT NULL,
+    body BLOB NOT NULL,
+    content_type TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    report_time TEXT,
+    PRIMARY KEY (adcode, extensions)
+);
+CREATE INDEX IF NOT EXISTS weather_cache_expires_at ON weather_cache (expires_at);
+"""
+
+
+class DiskWeatherCache:
+    """
+    SQLite-backed weather cache keyed by (adcode, extensions).
+
+    Errors talking to the database are logged and treated as misses, so a
+    locked or broken cache file never fails a weather query.
+
+    Args:
+        path: Database file, created with its directory if missing
+        retention: Seconds an expired row is kept before the sweep removes it
+        sweep_interval: Seconds between two background sweeps
+        busy_timeout: Seconds to wait for another worker's write lock
+    """
+
+    def __init__(
+        self,
+        path: str,
+        retention: float,
+        sweep_interval: float,
+        busy_timeout: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.retention = retention
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.swept = 0
+        self.errors = 0
+        # Row count as of the last sweep (counting rows is a full scan)
+        self.size = None
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # The connection is only used from the executor's single thread
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="weather-disk-cache"
+        )
+        self._conn = sqlite3.connect(
+            path, timeout=busy_timeout, isolation_level=None, check_same_thread=False
+        )
+        # auto_vacuum only applies to a new database, before any table exists
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    async def _run_in_thread(self, fn: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, fn, *args
+        )
+
+    async def get(
+        self, key: Tuple[str, str], stale_grace: float = 0.0
+    ) -> Optional[CacheEntry]:
+        """
+        Get an entry that is fresh, or expired for at most stale_grace seconds
+
+        Args:
+            key: (adcode, extensions) tuple
+            stale_grace: How long past its expiry an entry may still be served
+
+        Returns:
+            The stored entry (check is_fresh), or None if missing or too old
+        """
+        entry = await self.peek(key)
+        if entry is None or entry.expires_at + stale_grace <= self._clock():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    async def peek(self, key: Tuple[str, str]) -> Optional[CacheEntry]:
+        """
+        Get an entry whatever its age, without touching counters
+
+        Args:
+            key: (adcode, extensions) tuple
+
+        Returns:
+            The stored entry, or None if missing or unreadable
+        """
+        try:
+            return await self._run_in_thread(self._read, key)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logging.warning(f"Disk weather cache read failed for {key}: {e}")
+            return None
+
+    def _read(self, key: Tuple[str, str]) -> Optional[CacheEntry]:
+        row = self._conn.execute(
+            "SELECT body, content_type, fetched_at, expires_at, report_time "
+            "FROM weather_cache WHERE adcode = ? AND extensions = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        body, content_type, fetched_at, expires_at, report_time = row
+        return CacheEntry(
+            body=body,
+            fetched_at=fetched_at,
+            expires_at=expires_at,
+            report_time=report_time,
+            content_type=content_type,
+        )
+
+    async def set(self, key: Tuple[str, str], entry: CacheEntry) -> None:
+        """
+        Store an entry, replacing any previous one for the key
+
+        Args:
+            key: (adcode, extensions) tuple
+            entry: Entry built by the in-process cache
+        """
+        try:
+            await self._run_in_thread(self._write, key, entry)
+            self.writes += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            logging.warning(f"Disk weather cache write failed for {key}: {e}")
+
+    def _write(self, key: Tuple[str, str], entry: CacheEntry) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO weather_cache "
+            "(adcode, extensions, body, content_type, fetched_at, expires_at, "
+            "report_time) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                *key,
+                entry.body,
+                entry.content_type,
+                entry.fetched_at,
+                entry.expires_at,
+                entry.report_time,
+            ),
+        )
+
+    async def sweep(self) -> int:
+        """
+        Delete rows expired for longer than the retention period and compact
+
+        Returns:
+            int: Number of rows deleted
+        """
+        try:
+            deleted = await self._run_in_thread(
+                self._sweep, self._clock() - self.retention
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logging.warning(f"Disk weather cache sweep failed: {e}")
+            return 0
+        self.swept += deleted
+        if deleted:
+            logging.info(f"Swept {deleted} expired entries from disk weather cache")
+        return deleted
+
+    def _sweep(self, expired_before: float) -> int:
+        deleted = self._conn.execute(
+            "DELETE FROM weather_cache WHERE expires_at < ?", (expired_before,)
+        ).rowcount
+        # Give freed pages back to the filesystem and reset the WAL file
+        self._conn.execute("PRAGMA incremental_vacuum")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.size = self._count()
+        return deleted
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM weather_cache").fetchone()[0]
+
+    async def count(self) -> int:
+        """Count the rows in the database (a full scan)"""
+        return await self._run_in_thread(self._count)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logging.error(f"Disk weather cache sweep failed: {e}")
+
+    def start(self) -> None:
+        """Start periodic sweeps on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Stop periodic sweeps and close the database"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._run_in_thread(self._conn.close)
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get disk cache counters
+
+        Returns:
+            Dict[str, Any]: Path, row count at the last sweep and
+            hit/miss/write/sweep/error counts
+        """
+        return {
+            "path": self.path,
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "swept": self.swept,
+            "errors": self.errors,
+        }
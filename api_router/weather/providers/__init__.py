@@ -0,0 +1,68 @@
+"""
+Weather providers the weather router can fetch from.
+"""
+
+from config import (
+    WEATHER_PROVIDER,
+    AMAP_WEATHER_API_URL,
+    AMAP_API_KEYS,
+    AMAP_KEY_STRATEGY,
+    AMAP_KEY_COOLDOWN_SECONDS,
+    AMAP_KEY_DAILY_QUOTA,
+    MOCK_WEATHER_LATENCY_SECONDS,
+    MOCK_WEATHER_LATENCY_JITTER_SECONDS,
+    MOCK_WEATHER_ERROR_RATE,
+    MOCK_WEATHER_FORECAST_DAYS,
+    MOCK_WEATHER_SEED,
+)
+from ..amap_key_pool import ApiKeyPool
+from .base import (
+    ProviderUnavailable,
+    UpstreamHTTPError,
+    UpstreamWeather,
+    WeatherProvider,
+)
+from .amap import AmapWeatherProvider
+from .mock import MockWeatherProvider
+
+__all__ = [
+    "WeatherProvider",
+    "UpstreamWeather",
+    "UpstreamHTTPError",
+    "ProviderUnavailable",
+    "AmapWeatherProvider",
+    "MockWeatherProvider",
+    "create_weather_provider",
+]
+
+
+def create_weather_provider(name: str = WEATHER_PROVIDER) -> WeatherProvider:
+    """
+    Create the configured weather provider
+
+    Args:
+        name: "amap" or "mock"
+
+    Returns:
+        WeatherProvider: The provider
+
+    Raises:
+        ValueError: When the provider name is unknown
+    """
+    if name == AmapWeatherProvider.name:
+        key_pool = ApiKeyPool(
+            AMAP_API_KEYS,
+            strategy=AMAP_KEY_STRATEGY,
+            cooldown=AMAP_KEY_COOLDOWN_SECONDS,
+            daily_quota=AMAP_KEY_DAILY_QUOTA,
+        )
+        return AmapWeatherProvider(AMAP_WEATHER_API_URL, key_pool)
+    if name == MockWeatherProvider.name:
+        return MockWeatherProvider(
+            latency=MOCK_WEATHER_LATENCY_SECONDS,
+            latency_jitter=MOCK_WEATHER_LATENCY_JITTER_SECONDS,
+            error_rate=MOCK_WEATHER_ERROR_RATE,
+            forecast_days=MOCK_WEATHER_FORECAST_DAYS,
+            seed=MOCK_WEATHER_SEED,
+        )
+    raise ValueError(f"Unknown weather provider: {name}")
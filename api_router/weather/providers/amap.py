@@ -0,0 +1,70 @@
+"""
+AMAP Weather API provider.
+"""
+
+import json
+from typing import Any, Dict
+
+from utils.http_client import get_http_session
+from ..amap_key_pool import ApiKeyPool, NoApiKeyAvailable
+from ..weather_cache import JSON_CONTENT_TYPE
+from .base import (
+    ProviderUnavailable,
+    UpstreamHTTPError,
+    UpstreamWeather,
+    WeatherProvider,
+)
+
+
+class AmapWeatherProvider(WeatherProvider):
+    """
+    Weather provider backed by the AMAP Weather API.
+
+    Args:
+        url: AMAP weather endpoint
+        key_pool: Pool of AMAP keys requests are spread over
+    """
+
+    name = "amap"
+
+    def __init__(self, url: str, key_pool: ApiKeyPool):
+        self.url = url
+        self.key_pool = key_pool
+
+    async def fetch(self, adcode: str, extensions: str) -> UpstreamWeather:
+        """
+        Send a request to the AMAP Weather API with a key from the key pool
+
+        When AMAP rejects the key (invalid key or quota infocode) the key is
+        quarantined and the request is retried once per remaining key.
+
+        Args:
+            adcode: City adcode
+            extensions: AMAP extensions parameter
+
+        Returns:
+            UpstreamWeather: The AMAP payload and the response body it came from
+
+        Raises:
+            UpstreamHTTPError: When AMAP answers with a non-200 status
+            ProviderUnavailable: When every key is quarantined
+        """
+        session = get_http_session()
+        for _ in range(len(self.key_pool)):
+            try:
+                key = self.key_pool.acquire()
+            except NoApiKeyAvailable as e:
+                raise ProviderUnavailable(str(e)) from e
+            params = {"city": adcode, "key": key, "extensions": extensions}
+            async with session.get(self.url, params=params) as response:
+                if response.status != 200:
+                    raise UpstreamHTTPError(response.status, await response.text())
+                body = await response.read()
+                content_type = response.headers.get("Content-Type", JSON_CONTENT_TYPE)
+            weather_data = json.loads(body)
+            if not self.key_pool.record_result(key, weather_data.get("infocode")):
+                break
+        return UpstreamWeather(weather_data, body, content_type)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "keys": self.key_pool.stats()}
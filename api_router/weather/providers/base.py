@@ -0,0 +1,73 @@
+"""
+Weather provider interface.
+
+A provider performs one upstream weather request for an adcode and returns
+an AMAP-shaped payload together with the body bytes it was decoded from.
+Caching, single flight, rate limiting, circuit breaking and hedging stay in
+the router and wrap whichever provider is configured.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from ..weather_cache import JSON_CONTENT_TYPE
+
+
+@dataclass
+class UpstreamWeather:
+    """Weather response of a provider"""
+
+    payload: Dict[str, Any]
+    body: bytes
+    content_type: str = JSON_CONTENT_TYPE
+
+
+class UpstreamHTTPError(Exception):
+    """Raised when the weather provider answers with a non-200 status"""
+
+    def __init__(self, status: int, text: str):
+        super().__init__(f"Weather API request failed: {status}")
+        self.status = status
+        self.text = text
+
+
+class ProviderUnavailable(Exception):
+    """Raised when the provider cannot take requests right now (e.g. no quota)"""
+
+
+class WeatherProvider(ABC):
+    """
+    Source of weather payloads.
+
+    Payloads use the AMAP schema (status, count, info, infocode and
+    forecasts or lives) so the API response does not depend on the provider.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def fetch(self, adcode: str, extensions: str) -> UpstreamWeather:
+        """
+        Fetch weather information for an adcode
+
+        Args:
+            adcode: City adcode
+            extensions: "all" for forecasts, "base" for live weather
+
+        Returns:
+            UpstreamWeather: The AMAP-shaped payload and its body bytes
+
+        Raises:
+            UpstreamHTTPError: When the upstream answers with an error status
+            ProviderUnavailable: When the provider cannot serve requests now
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get provider counters
+
+        Returns:
+            Dict[str, Any]: Provider name and provider-specific counters
+        """
+        return {"name": self.name}
@@ -0,0 +1,150 @@
+"""
+In-process mock weather provider for offline load testing.
+
+Answers without any network I/O after a simulated latency. Latency jitter
+and injected errors come from a seeded random generator, so a given seed
+and request sequence always behave the same way.
+"""
+
+import json
+import random
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from ..weather_cache import AMAP_TIMEZONE, AMAP_REPORTTIME_FORMAT
+from .base import UpstreamHTTPError, UpstreamWeather, WeatherProvider
+
+
+class MockWeatherProvider(WeatherProvider):
+    """
+    Deterministic local weather provider.
+
+    Args:
+        latency: Base seconds each request takes
+        latency_jitter: Extra random latency, uniform in [0, latency_jitter]
+        error_rate: Fraction of requests failing with an HTTP 503 (0 to 1)
+        forecast_days: Number of forecast days per payload (payload size)
+        seed: Seed of the random generator
+    """
+
+    name = "mock"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        forecast_days: int = 4,
+        seed: Optional[int] = 0,
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.forecast_days = max(1, forecast_days)
+        self.seed = seed
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    async def fetch(self, adcode: str, extensions: str) -> UpstreamWeather:
+        """
+        Build a mock payload for an adcode after the simulated latency
+
+        Args:
+            adcode: City adcode
+            extensions: "all" for forecasts, "base" for live weather
+
+        Returns:
+            UpstreamWeather: An AMAP-shaped payload and its encoded body
+
+        Raises:
+            UpstreamHTTPError: For the injected share of failed requests
+        """
+        self.requests += 1
+        # Draw both values up front so the sequence does not depend on timing
+        latency = self.latency + self._random.uniform(0, self.latency_jitter)
+        failed = self._random.random() < self.error_rate
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if failed:
+            self.errors += 1
+            raise UpstreamHTTPError(503, "mock upstream error")
+        payload = self.build_payload(adcode, extensions)
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        return UpstreamWeather(payload, body.encode("utf-8"))
+
+    def build_payload(self, adcode: str, extensions: str) -> Dict[str, Any]:
+        """Build the payload for adcode, reported at the start of this hour"""
+        now = datetime.now(AMAP_TIMEZONE).replace(minute=0, second=0, microsecond=0)
+        report_time = now.strftime(AMAP_REPORTTIME_FORMAT)
+        city = f"模拟市{adcode}"
+
+        if extensions == "base":
+            return {
+                "status": "1",
+                "count": "1",
+                "info": "OK",
+                "infocode": "10000",
+                "lives": [
+                    {
+                        "province": "模拟省",
+                        "city": city,
+                        "adcode": adcode,
+                        "weather": "晴",
+                        "temperature": str(15 + int(adcode) % 15),
+                        "winddirection": "东北",
+                        "windpower": "≤3",
+                        "humidity": str(30 + int(adcode) % 50),
+                        "reporttime": report_time,
+                    }
+                ],
+            }
+
+        return {
+            "status": "1",
+            "count": "1",
+            "info": "OK",
+            "infocode": "10000",
+            "forecasts": [
+                {
+                    "city": city,
+                    "adcode": adcode,
+                    "province": "模拟省",
+                    "reporttime": report_time,
+                    "casts": self._build_casts(adcode, now),
+                }
+            ],
+        }
+
+    def _build_casts(self, adcode: str, start: datetime) -> List[Dict[str, str]]:
+        base_temp = 15 + int(adcode) % 15
+        casts = []
+        for offset in range(self.forecast_days):
+            day = start + timedelta(days=offset)
+            casts.append(
+                {
+                    "date": day.strftime("%Y-%m-%d"),
+                    "week": str(day.isoweekday()),
+                    "dayweather": "晴",
+                    "nightweather": "多云",
+                    "daytemp": str(base_temp + 8 + offset % 3),
+                    "nighttemp": str(base_temp + offset % 3),
+                    "daywind": "东北",
+                    "nightwind": "东北",
+                    "daypower": "1-3",
+                    "nightpower": "1-3",
+                }
+            )
+        return casts
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency": self.latency,
+            "latency_jitter": self.latency_jitter,
+            "error_rate": self.error_rate,
+            "forecast_days": self.forecast_days,
+        }
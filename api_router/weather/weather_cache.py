@@ -0,0 +1,279 @@
+"""
+In-process weather cache.
+
+Entries are keyed by (adcode, extensions) and bounded in number with LRU
+eviction. AMAP only republishes weather a few times a day, so an entry's
+expiry is derived from the `reporttime` of the payload plus a max age.
+
+Entries keep the upstream body bytes as received, so a cache hit can be
+answered without any JSON decoding or encoding.
+"""
+
+import json
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# AMAP report times are local Beijing time without an offset
+AMAP_TIMEZONE = timezone(timedelta(hours=8))
+AMAP_REPORTTIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+JSON_CONTENT_TYPE = "application/json;charset=UTF-8"
+# Alternative encodings (projections) memoized per cache entry
+MAX_ENTRY_VARIANTS = 16
+
+
+def get_report_time(weather_data: Dict[str, Any]) -> Optional[str]:
+    """
+    Get the reporttime of an AMAP weather payload
+
+    Args:
+        weather_data: AMAP response for extensions=all (forecasts) or base (lives)
+
+    Returns:
+        The reporttime string, or None if the payload has none
+    """
+    for section in ("forecasts", "lives"):
+        items = weather_data.get(section)
+        if items and isinstance(items[0], dict) and items[0].get("reporttime"):
+            return items[0]["reporttime"]
+    return None
+
+
+def parse_report_time(report_time: Optional[str]) -> Optional[float]:
+    """
+    Convert an AMAP reporttime string into a Unix timestamp
+
+    Args:
+        report_time: Time string such as "2025-05-13 11:03:03"
+
+    Returns:
+        Unix timestamp, or None if the string cannot be parsed
+    """
+    if not report_time:
+        return None
+    try:
+        parsed = datetime.strptime(report_time, AMAP_REPORTTIME_FORMAT)
+    except ValueError:
+        logging.warning(f"Unparseable AMAP reporttime: {report_time}")
+        return None
+    return parsed.replace(tzinfo=AMAP_TIMEZONE).timestamp()
+
+
+@dataclass
+class CacheEntry:
+    """Cached upstream weather response"""
+
+    body: bytes
+    fetched_at: float
+    expires_at: float
+    report_time: Optional[str] = None
+    content_type: str = JSON_CONTENT_TYPE
+    _payload: Optional[Dict[str, Any]] = field(default=None, repr=False)
+    _variants: Dict[Hashable, bytes] = field(default_factory=dict, repr=False)
+
+    @property
+    def payload(self) -> Dict[str, Any]:
+        """The decoded body, parsed on first use"""
+        if self._payload is None:
+            self._payload = json.loads(self.body)
+        return self._payload
+
+    def is_fresh(self, now: float) -> bool:
+        """Whether the entry has not expired yet at now"""
+        return self.expires_at > now
+
+    def variant(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        """
+        Get an alternative encoding of the entry, built and memoized on first use
+
+        Args:
+            key: Identifies the encoding, e.g. a projection selector
+            build: Builds the body bytes from the entry
+
+        Returns:
+            bytes: The encoded body
+        """
+        body = self._variants.get(key)
+        if body is None:
+            body = build()
+            if len(self._variants) < MAX_ENTRY_VARIANTS:
+                self._variants[key] = body
+        return body
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Expiry settings of a kind of payload (see WeatherCache.compute_expiry)"""
+
+    max_age: float
+    min_ttl: float
+
+
+class WeatherCache:
+    """
+    Bounded LRU cache of AMAP weather payloads with reporttime-aware expiry.
+
+    An entry expires max_age seconds after its reporttime, but never sooner
+    than min_ttl seconds after it was fetched, so an old forecast that AMAP
+    has not republished yet is not refetched on every request.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_age: float,
+        min_ttl: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.min_ttl = min_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def compute_expiry(
+        self,
+        report_time: Optional[str],
+        now: float,
+        policy: Optional[CachePolicy] = None,
+    ) -> float:
+        """Get the expiry timestamp of a payload fetched at now"""
+        max_age = policy.max_age if policy else self.max_age
+        min_ttl = policy.min_ttl if policy else self.min_ttl
+        latest = now + max_age
+        report_ts = parse_report_time(report_time)
+        if report_ts is None:
+            return latest
+        return min(latest, max(report_ts + max_age, now + min_ttl))
+
+    def get(self, key: Hashable, stale_grace: float = 0.0) -> Optional[CacheEntry]:
+        """
+        Get an entry that is fresh, or expired for at most stale_grace seconds
+
+        Args:
+            key: (adcode, extensions) tuple
+            stale_grace: How long past its expiry an entry may still be served
+
+        Returns:
+            The cached entry (check is_fresh), or None if missing or too old
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        now = self._clock()
+        if not entry.is_fresh(now):
+            if entry.expires_at + stale_grace <= now:
+                self.misses += 1
+                self.expirations += 1
+                return None
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Get an entry whatever its age, without touching LRU order or counters
+
+        Args:
+            key: (adcode, extensions) tuple
+
+        Returns:
+            The cached entry, or None if missing
+        """
+        return self._entries.get(key)
+
+    def set(
+        self,
+        key: Hashable,
+        payload: Dict[str, Any],
+        body: bytes,
+        content_type: str = JSON_CONTENT_TYPE,
+        policy: Optional[CachePolicy] = None,
+    ) -> CacheEntry:
+        """
+        Store an upstream response, evicting least recently used entries
+
+        Args:
+            key: (adcode, extensions) tuple
+            payload: Successful AMAP response, already decoded
+            body: The response body bytes payload was decoded from
+            content_type: Content type of the upstream response
+            policy: Expiry settings for this kind of payload (default: the cache's)
+
+        Returns:
+            CacheEntry: The stored entry
+        """
+        now = self._clock()
+        report_time = get_report_time(payload)
+        entry = CacheEntry(
+            body=body,
+            fetched_at=now,
+            expires_at=self.compute_expiry(report_time, now, policy),
+            report_time=report_time,
+            content_type=content_type,
+            _payload=payload,
+        )
+        self.put(key, entry)
+        return entry
+
+    def put(self, key: Hashable, entry: CacheEntry) -> None:
+        """
+        Store an existing entry as is, e.g. one loaded from another cache tier
+
+        Args:
+            key: (adcode, extensions) tuple
+            entry: The entry, keeping its fetch and expiry times
+        """
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def items(self) -> List[Tuple[Hashable, CacheEntry]]:
+        """
+        Get all entries, any age, least recently used first
+
+        Returns:
+            List[Tuple[Hashable, CacheEntry]]: (key, entry) pairs
+        """
+        return list(self._entries.items())
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict[str, Any]: Size, capacity, hit/stale/miss/expiration/eviction counts
+        """
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "hit_rate": (
+                round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+            ),
+        }
@@ -1,12 +1,72 @@
-from typing import Optional
-from fastapi import APIRouter, Query
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple, Union
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import aiohttp
+import asyncio
 import json
+import time
 import traceback
 import logging
-from pathlib import Path
-from config import AMAP_WEATHER_API_URL, AMAP_API_KEY
+from config import (
+    AMAP_RATE_LIMIT_QPS,
+    AMAP_RATE_LIMIT_BURST,
+    AMAP_RATE_LIMIT_MAX_QUEUE,
+    AMAP_RATE_LIMIT_MAX_WAIT_SECONDS,
+    AMAP_DAILY_QUOTA,
+    AMAP_CIRCUIT_FAILURE_THRESHOLD,
+    AMAP_CIRCUIT_RECOVERY_SECONDS,
+    AMAP_CIRCUIT_HALF_OPEN_MAX_CALLS,
+    AMAP_HEDGE_ENABLED,
+    AMAP_HEDGE_DEFAULT_DELAY_SECONDS,
+    AMAP_HEDGE_MIN_DELAY_SECONDS,
+    WEATHER_CACHE_MAX_SIZE,
+    WEATHER_CACHE_MAX_AGE_SECONDS,
+    WEATHER_CACHE_MIN_TTL_SECONDS,
+    WEATHER_LIVE_CACHE_MAX_AGE_SECONDS,
+    WEATHER_LIVE_CACHE_MIN_TTL_SECONDS,
+    WEATHER_CACHE_SERVE_STALE,
+    WEATHER_CACHE_STALE_GRACE_SECONDS,
+    WEATHER_DISK_CACHE_ENABLED,
+    WEATHER_DISK_CACHE_PATH,
+    WEATHER_DISK_CACHE_RETENTION_SECONDS,
+    WEATHER_DISK_CACHE_SWEEP_INTERVAL_SECONDS,
+    WEATHER_SNAPSHOT_ENABLED,
+    WEATHER_SNAPSHOT_PATH,
+    WEATHER_SNAPSHOT_INTERVAL_SECONDS,
+    WEATHER_SNAPSHOT_MAX_STALE_SECONDS,
+    WEATHER_PREFETCH_ENABLED,
+    WEATHER_PREFETCH_TOP_N,
+    WEATHER_PREFETCH_INTERVAL_SECONDS,
+    WEATHER_PREFETCH_LEAD_SECONDS,
+    WEATHER_PREFETCH_HALF_LIFE_SECONDS,
+    WEATHER_PREFETCH_MIN_SCORE,
+    WEATHER_PREFETCH_QUOTA_SHARE,
+    WEATHER_BATCH_MAX_CITIES,
+    WEATHER_BATCH_CONCURRENCY,
+)
+from utils.metrics import register_metrics_source
+from utils.single_flight import SingleFlight
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.decaying_counter import DecayingCounter
+from utils.hedging import Hedger
+from utils.rate_limiter import (
+    TokenBucketRateLimiter,
+    RateLimitExceeded,
+    PRIORITY_FOREGROUND,
+    PRIORITY_BACKGROUND,
+)
+from .adcode_index import AdcodeIndex
+from .weather_cache import CacheEntry, CachePolicy, WeatherCache
+from .disk_weather_cache import DiskWeatherCache
+from .weather_projection import WeatherSelector, parse_selector, render_weather
+from .weather_prefetch import WeatherPrefetcher
+from .weather_snapshot import WeatherCacheSnapshot
+from .providers import (
+    ProviderUnavailable,
+    UpstreamHTTPError,
+    UpstreamWeather,
+    create_weather_provider,
+)
 
 # Modified route prefix, removed agents/travel/weather
 router = APIRouter()
@@ -14,6 +74,130 @@ router = APIRouter()
 # AMAP Weather API parameters
 AMAP_EXTENSIONS = "all"
 
+# Query modes and the AMAP extensions they fetch: forecasts, live conditions or both
+MODE_EXTENSIONS = {"all": ("all",), "base": ("base",), "both": ("all", "base")}
+
+# City name -> adcode index, built once when the router is loaded at startup
+ADCODE_INDEX = AdcodeIndex.from_file()
+logging.info(f"Loaded adcode index with {len(ADCODE_INDEX)} cities")
+
+# Successful AMAP responses (body bytes) keyed by (adcode, extensions)
+WEATHER_CACHE = WeatherCache(
+    max_size=WEATHER_CACHE_MAX_SIZE,
+    max_age=WEATHER_CACHE_MAX_AGE_SECONDS,
+    min_ttl=WEATHER_CACHE_MIN_TTL_SECONDS,
+)
+register_metrics_source("weather_cache", WEATHER_CACHE.stats)
+
+# Live conditions are republished hourly, forecasts a few times a day
+WEATHER_CACHE_POLICIES = {
+    "all": CachePolicy(WEATHER_CACHE_MAX_AGE_SECONDS, WEATHER_CACHE_MIN_TTL_SECONDS),
+    "base": CachePolicy(
+        WEATHER_LIVE_CACHE_MAX_AGE_SECONDS, WEATHER_LIVE_CACHE_MIN_TTL_SECONDS
+    ),
+}
+
+# Optional second tier on disk, shared by the workers of this host; its
+# periodic sweep is started in the application lifespan
+DISK_WEATHER_CACHE: Optional[DiskWeatherCache] = None
+if WEATHER_DISK_CACHE_ENABLED:
+    DISK_WEATHER_CACHE = DiskWeatherCache(
+        WEATHER_DISK_CACHE_PATH,
+        retention=WEATHER_DISK_CACHE_RETENTION_SECONDS,
+        sweep_interval=WEATHER_DISK_CACHE_SWEEP_INTERVAL_SECONDS,
+    )
+    logging.info(f"Using disk weather cache at {WEATHER_DISK_CACHE_PATH}")
+    register_metrics_source("weather_disk_cache", DISK_WEATHER_CACHE.stats)
+
+# Concurrent upstream fetches for the same (adcode, extensions) share one call
+UPSTREAM_FLIGHTS = SingleFlight()
+register_metrics_source("weather_upstream_flights", UPSTREAM_FLIGHTS.stats)
+
+# Process-wide limiter in front of every AMAP call
+AMAP_RATE_LIMITER = TokenBucketRateLimiter(
+    rate=AMAP_RATE_LIMIT_QPS,
+    burst=AMAP_RATE_LIMIT_BURST,
+    max_queue=AMAP_RATE_LIMIT_MAX_QUEUE,
+    max_wait=AMAP_RATE_LIMIT_MAX_WAIT_SECONDS,
+    daily_quota=AMAP_DAILY_QUOTA,
+)
+register_metrics_source("amap_rate_limiter", AMAP_RATE_LIMITER.stats)
+
+# Upstream weather source (AMAP, or the in-process mock for load testing)
+WEATHER_PROVIDER = create_weather_provider()
+logging.info(f"Using weather provider: {WEATHER_PROVIDER.name}")
+register_metrics_source("weather_provider", WEATHER_PROVIDER.stats)
+
+# Fail fast (or serve cached data) while AMAP keeps failing
+AMAP_CIRCUIT_BREAKER = CircuitBreaker(
+    "amap",
+    failure_threshold=AMAP_CIRCUIT_FAILURE_THRESHOLD,
+    recovery_timeout=AMAP_CIRCUIT_RECOVERY_SECONDS,
+    half_open_max_calls=AMAP_CIRCUIT_HALF_OPEN_MAX_CALLS,
+)
+register_metrics_source("amap_circuit_breaker", AMAP_CIRCUIT_BREAKER.stats)
+
+# Optional second AMAP request when the first is slower than recent p95
+AMAP_HEDGER = Hedger(
+    enabled=AMAP_HEDGE_ENABLED,
+    default_delay=AMAP_HEDGE_DEFAULT_DELAY_SECONDS,
+    min_delay=AMAP_HEDGE_MIN_DELAY_SECONDS,
+)
+register_metrics_source("amap_hedging", AMAP_HEDGER.stats)
+
+# Cache snapshot, loaded and saved periodically in the application lifespan
+WEATHER_CACHE_SNAPSHOT: Optional[WeatherCacheSnapshot] = None
+if WEATHER_SNAPSHOT_ENABLED:
+    WEATHER_CACHE_SNAPSHOT = WeatherCacheSnapshot(
+        WEATHER_CACHE,
+        path=WEATHER_SNAPSHOT_PATH,
+        interval=WEATHER_SNAPSHOT_INTERVAL_SECONDS,
+        max_stale=WEATHER_SNAPSHOT_MAX_STALE_SECONDS,
+    )
+    register_metrics_source("weather_snapshot", WEATHER_CACHE_SNAPSHOT.stats)
+
+# Hot-city prefetch, started in the application lifespan when enabled
+WEATHER_PREFETCHER: Optional[WeatherPrefetcher] = None
+if WEATHER_PREFETCH_ENABLED:
+    if AMAP_RATE_LIMIT_QPS > 0:
+        prefetch_cycle_calls = AMAP_RATE_LIMIT_QPS * WEATHER_PREFETCH_INTERVAL_SECONDS
+    else:
+        prefetch_cycle_calls = WEATHER_PREFETCH_TOP_N
+    WEATHER_PREFETCHER = WeatherPrefetcher(
+        DecayingCounter(half_life=WEATHER_PREFETCH_HALF_LIFE_SECONDS),
+        peek=lambda key: latest_cached_weather(key),
+        refresh=lambda key: refresh_weather(*key),
+        top_n=WEATHER_PREFETCH_TOP_N,
+        interval=WEATHER_PREFETCH_INTERVAL_SECONDS,
+        lead_time=WEATHER_PREFETCH_LEAD_SECONDS,
+        min_score=WEATHER_PREFETCH_MIN_SCORE,
+        cycle_budget=max(1, int(WEATHER_PREFETCH_QUOTA_SHARE * prefetch_cycle_calls)),
+        daily_budget=int(WEATHER_PREFETCH_QUOTA_SHARE * AMAP_DAILY_QUOTA),
+    )
+    register_metrics_source("weather_prefetch", WEATHER_PREFETCHER.stats)
+
+# Weather served from cache of any age because upstream could not answer
+# ("served"), and lookups that failed because nothing was cached ("unavailable")
+DEGRADED_STATS = {"served": 0, "unavailable": 0}
+register_metrics_source(
+    "weather_degraded",
+    lambda: {**DEGRADED_STATS, "circuit": AMAP_CIRCUIT_BREAKER.state},
+)
+
+# Response header telling whether weather data was fresh, stale or revalidated
+WEATHER_CACHE_HEADER = "X-Weather-Cache"
+# Cache-Control directives of weather responses, max-age is appended per entry.
+# Weather routes require DID authentication: "private" lets the calling agent
+# cache a response but keeps shared caches from serving it to unauthenticated
+# callers (RFC 9111 section 3.5)
+WEATHER_CACHE_CONTROL = "private"
+
+# Background refresh tasks, referenced here so they are not garbage collected
+_refresh_tasks: Set[asyncio.Task] = set()
+
+# Weather lookup result: a cache entry holding the upstream body, or an error payload
+WeatherResult = Union[CacheEntry, Dict[str, Any]]
+
 
 # Data models
 class WeatherInfoRequest(BaseModel):
@@ -22,6 +206,12 @@ class WeatherInfoRequest(BaseModel):
     cityName: str
 
 
+class WeatherBatchRequest(BaseModel):
+    """Batch weather query request model"""
+
+    cityNames: List[str]
+
+
 class WeatherInfoResponse(BaseModel):
     """Weather query response model"""
 
@@ -38,73 +228,664 @@ async def get_weather_info(
         ...,
         description="Chinese city name, used to query weather information for the corresponding city",
     ),
+    mode: str = Query(
+        "all",
+        description='"all" forecasts, "base" live conditions, or "both" (fetched concurrently)',
+    ),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated forecast fields to return, e.g. date,dayweather,daytemp,nighttemp",
+    ),
+    days: Optional[int] = Query(
+        None, description="Number of forecast days to return, starting today"
+    ),
+    response_format: str = Query(
+        "full",
+        alias="format",
+        description='"full" (AMAP shape) or "compact" (field names once, casts as arrays)',
+    ),
+    if_none_match: Optional[str] = Header(
+        None,
+        description="ETag of a previous response; 304 is returned when it is still current",
+    ),
 ):
     """
     Get city weather information
 
-    This endpoint queries weather information based on city name by calling the AMAP Weather API
+    This endpoint queries weather information based on city name by calling the AMAP Weather API.
+    Weather data is answered with the upstream body bytes as cached, without re-encoding,
+    along with a strong ETag (adcode + reporttime) and a Cache-Control max-age covering the
+    remaining cache lifetime. mode selects forecasts, live conditions or both, and
+    fields/days/format select a smaller projection of the cached forecasts.
+    When AMAP cannot answer, the last known weather is served whatever its age,
+    marked with "stale": true, its age in seconds and an Age header.
     """
     try:
         # Log request data
         logging.info(f"Received weather query parameters: cityName={cityName}")
 
-        # Validate city name length
-        if len(cityName) <= 1:
-            return {
-                "status": "0",
-                "count": "0",
-                "info": "City name too short",
-                "infocode": "10003",
-                "forecasts": [],
-            }
+        if mode not in MODE_EXTENSIONS:
+            return weather_error(
+                f"Invalid mode, expected one of: {', '.join(MODE_EXTENSIONS)}", "10003"
+            )
+        try:
+            selector = parse_selector(fields, days, response_format)
+        except ValueError as e:
+            return weather_error(str(e), "10003")
 
         # Get the adcode corresponding to the city
-        adcode = await get_city_adcode(cityName)
-        if not adcode:
-            return {
-                "status": "0",
-                "count": "0",
-                "info": "Invalid city name",
-                "infocode": "10003",
-                "forecasts": [],
-            }
-
-        # Call AMAP Weather API
-        params = {"city": adcode, "key": AMAP_API_KEY, "extensions": AMAP_EXTENSIONS}
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(AMAP_WEATHER_API_URL, params=params) as response:
-                if response.status == 200:
-                    weather_data = await response.json()
-                    logging.info(
-                        f"Retrieved weather data: {json.dumps(weather_data, indent=2)}"
-                    )
-                    return weather_data
-                else:
-                    error_text = await response.text()
-                    logging.error(
-                        f"Weather API request failed: {response.status}, {error_text}"
-                    )
-                    return {
-                        "status": "0",
-                        "count": "0",
-                        "info": f"Weather API request failed: {response.status}",
-                        "infocode": "10002",
-                        "forecasts": [],
-                    }
+        adcode, error = await resolve_city(cityName)
+        if error:
+            return error
+
+        extensions = MODE_EXTENSIONS[mode]
+        if len(extensions) == 1:
+            lookups = [await get_adcode_weather(adcode, extensions[0])]
+        else:
+            lookups = await asyncio.gather(
+                *(get_adcode_weather(adcode, ext) for ext in extensions)
+            )
+        for weather, _ in lookups:
+            if not isinstance(weather, CacheEntry):
+                return weather
+        entries = [weather for weather, _ in lookups]
+
+        etag = weather_etag(adcode, mode, entries, selector)
+        cache_state = combine_cache_states([state for _, state in lookups])
+        headers = {
+            WEATHER_CACHE_HEADER: cache_state,
+            "ETag": etag,
+            "Cache-Control": weather_cache_control(entries),
+        }
+        stale = cache_state == "stale"
+        if stale:
+            # The body carries a changing age, so only the data version is tagged
+            age = weather_age(entries)
+            headers["ETag"] = f"W/{etag}"
+            headers["Age"] = str(age)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        body = render_entries(entries, selector)
+        return Response(
+            content=mark_stale(body, age) if stale else body,
+            media_type=entries[0].content_type,
+            headers=headers,
+        )
 
     except Exception as e:
         error_msg = (
             f"Error getting weather information: {str(e)}\n{traceback.format_exc()}"
         )
         logging.error(error_msg)
-        return {
-            "status": "0",
-            "count": "0",
-            "info": f"Error getting weather information: {str(e)}",
-            "infocode": "10001",
-            "forecasts": [],
-        }
+        return weather_error(f"Error getting weather information: {str(e)}", "10001")
+
+
+@router.post("/api/weather_info/batch")
+async def get_weather_info_batch(batch_request: WeatherBatchRequest):
+    """
+    Get weather information for multiple cities
+
+    City names are resolved to adcodes and deduplicated, then fetched with at
+    most WEATHER_BATCH_CONCURRENCY concurrent upstream calls. Each result has
+    the same schema as /api/weather_info plus the requested cityName.
+    """
+    city_names = batch_request.cityNames
+    logging.info(f"Received batch weather query for {len(city_names)} cities")
+
+    error = validate_batch(city_names)
+    if error:
+        return error
+
+    # Resolve every name first so duplicate cities share one lookup
+    resolved = [await resolve_city(city_name) for city_name in city_names]
+    adcodes = {adcode for adcode, error in resolved if not error}
+
+    upstream_limit = asyncio.Semaphore(WEATHER_BATCH_CONCURRENCY)
+    adcode_results = dict(
+        zip(
+            adcodes,
+            await asyncio.gather(
+                *(get_batch_item_weather(adcode, upstream_limit) for adcode in adcodes)
+            ),
+        )
+    )
+
+    results = [
+        {"cityName": city_name, **(error or adcode_results[adcode])}
+        for city_name, (adcode, error) in zip(city_names, resolved)
+    ]
+    return {
+        "status": "1",
+        "count": str(len(results)),
+        "info": "OK",
+        "infocode": "10000",
+        "results": results,
+    }
+
+
+@router.post("/api/weather_info/batch/stream")
+async def stream_weather_info_batch(batch_request: WeatherBatchRequest):
+    """
+    Get weather information for multiple cities as a stream
+
+    Same lookup as /api/weather_info/batch, but each city's result is sent as
+    one NDJSON line as soon as it is ready (completion order), tagged with the
+    index of the city in the request.
+    """
+    city_names = batch_request.cityNames
+    logging.info(f"Received streaming batch weather query for {len(city_names)} cities")
+
+    error = validate_batch(city_names)
+    if error:
+        return error
+
+    return StreamingResponse(
+        stream_batch_results(city_names), media_type="application/x-ndjson"
+    )
+
+
+async def stream_batch_results(city_names: List[str]):
+    """Yield one NDJSON line per city in completion order"""
+    resolved = [await resolve_city(city_name) for city_name in city_names]
+
+    # Unresolvable names are answered right away
+    for index, (city_name, (_, error)) in enumerate(zip(city_names, resolved)):
+        if error:
+            yield encode_batch_line(index, city_name, error)
+
+    # One upstream fetch per unique adcode, shared by every index that needs it
+    upstream_limit = asyncio.Semaphore(WEATHER_BATCH_CONCURRENCY)
+    adcode_tasks = {
+        adcode: asyncio.ensure_future(get_batch_item_weather(adcode, upstream_limit))
+        for adcode in dict.fromkeys(adcode for adcode, error in resolved if not error)
+    }
+
+    async def indexed_result(index: int, city_name: str, adcode: str):
+        return index, city_name, await adcode_tasks[adcode]
+
+    try:
+        pending = [
+            indexed_result(index, city_name, adcode)
+            for index, (city_name, (adcode, error)) in enumerate(
+                zip(city_names, resolved)
+            )
+            if not error
+        ]
+        for next_result in asyncio.as_completed(pending):
+            index, city_name, weather_data = await next_result
+            yield encode_batch_line(index, city_name, weather_data)
+    finally:
+        # Stop remaining fetches if the client went away mid-stream
+        for task in adcode_tasks.values():
+            task.cancel()
+
+
+def encode_batch_line(index: int, city_name: str, weather_data: Dict[str, Any]) -> str:
+    """Encode one streamed batch result as an NDJSON line"""
+    item = {"index": index, "cityName": city_name, **weather_data}
+    return json.dumps(item, ensure_ascii=False) + "\n"
+
+
+def weather_etag(
+    adcode: str,
+    mode: str,
+    entries: List[CacheEntry],
+    selector: WeatherSelector = WeatherSelector(),
+) -> str:
+    """
+    Build the strong ETag of a cached weather response
+
+    AMAP publishes a new body with a new reporttime, so adcode, mode and the
+    reporttime of every served entry identify the representation (fetch time
+    if there is no reporttime). Projections get a suffix derived from their selector.
+
+    Args:
+        adcode: City adcode
+        mode: Query mode ("all", "base" or "both")
+        entries: Cache entries being served
+        selector: Projection being served
+
+    Returns:
+        str: The quoted ETag, e.g. "110000-all-20250513110303"
+    """
+    versions = []
+    for entry in entries:
+        if entry.report_time:
+            versions.append("".join(c for c in entry.report_time if c.isdigit()))
+        else:
+            versions.append(f"f{int(entry.fetched_at)}")
+    if not selector.is_default:
+        versions.append(selector.etag_suffix())
+    version = "-".join(versions)
+    return f'"{adcode}-{mode}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as in RFC 9110)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def weather_cache_control(entries: List[CacheEntry]) -> str:
+    """Build the Cache-Control header from the shortest remaining entry lifetime"""
+    expires_at = min(entry.expires_at for entry in entries)
+    max_age = max(0, int(expires_at - time.time()))
+    return f"{WEATHER_CACHE_CONTROL}, max-age={max_age}"
+
+
+def weather_age(entries: List[CacheEntry]) -> int:
+    """Get the age in seconds of the oldest served entry"""
+    fetched_at = min(entry.fetched_at for entry in entries)
+    return max(0, int(time.time() - fetched_at))
+
+
+def mark_stale(body: bytes, age: int) -> bytes:
+    """
+    Add "stale": true and the age in seconds to a JSON object body
+
+    The fields are spliced in front of the cached bytes, so the body is not
+    decoded and re-encoded on every degraded response.
+    """
+    body = body.lstrip()
+    if not body.startswith(b"{"):
+        return body
+    rest = body[1:].lstrip()
+    separator = b"" if rest.startswith(b"}") else b","
+    return f'{{"stale":true,"age":{age}'.encode("utf-8") + separator + rest
+
+
+def combine_cache_states(states: List[str]) -> str:
+    """Get the cache header value of a response built from several entries"""
+    for state in ("stale", "revalidated"):
+        if state in states:
+            return state
+    return "fresh"
+
+
+def render_entries(entries: List[CacheEntry], selector: WeatherSelector) -> bytes:
+    """
+    Get the response body for the served entries
+
+    A single entry is served as cached (or as a memoized projection); in
+    "both" mode the live conditions are added to the forecast payload and the
+    result is memoized on the forecast entry for that live entry.
+
+    Args:
+        entries: The forecast and/or live entry, in MODE_EXTENSIONS order
+        selector: Projection of the forecasts
+
+    Returns:
+        bytes: The body
+    """
+    if len(entries) == 1:
+        entry = entries[0]
+        if selector.is_default:
+            return entry.body
+        return entry.variant(selector, lambda: render_weather(entry.payload, selector))
+
+    forecast, live = entries
+
+    def render_both() -> bytes:
+        payload = dict(forecast.payload)
+        payload["lives"] = live.payload.get("lives", [])
+        return render_weather(payload, selector)
+
+    return forecast.variant(("lives", live.fetched_at, selector), render_both)
+
+
+def validate_batch(city_names: List[str]) -> Optional[Dict[str, Any]]:
+    """Get the error payload for an empty or oversized batch, if any"""
+    if not city_names:
+        return weather_batch_error("No city names provided", "10003")
+    if len(city_names) > WEATHER_BATCH_MAX_CITIES:
+        return weather_batch_error(
+            f"Too many city names, at most {WEATHER_BATCH_MAX_CITIES} are allowed",
+            "10003",
+        )
+    return None
+
+
+def weather_error(info: str, infocode: str) -> Dict[str, Any]:
+    """Build a failed weather query payload"""
+    return {
+        "status": "0",
+        "count": "0",
+        "info": info,
+        "infocode": infocode,
+        "forecasts": [],
+    }
+
+
+def weather_batch_error(info: str, infocode: str) -> Dict[str, Any]:
+    """Build a failed batch weather query payload"""
+    return {
+        "status": "0",
+        "count": "0",
+        "info": info,
+        "infocode": infocode,
+        "results": [],
+    }
+
+
+async def resolve_city(city_name: str) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Validate a city name and resolve its adcode
+
+    Args:
+        city_name: Chinese city name
+
+    Returns:
+        Tuple[Optional[str], Optional[Dict]]: (adcode, None) on success, or
+        (None, error payload) when the name is too short or unknown
+    """
+    # Validate city name length
+    if len(city_name) <= 1:
+        return None, weather_error("City name too short", "10003")
+
+    adcode = await get_city_adcode(city_name)
+    if not adcode:
+        return None, weather_error("Invalid city name", "10003")
+    return adcode, None
+
+
+async def get_adcode_weather(
+    adcode: str,
+    extensions: str,
+    upstream_limit: Optional[asyncio.Semaphore] = None,
+) -> Tuple[WeatherResult, Optional[str]]:
+    """
+    Get weather information for an adcode from cache or upstream
+
+    Args:
+        adcode: City adcode
+        extensions: AMAP extensions parameter
+        upstream_limit: Optional semaphore bounding concurrent upstream calls
+
+    Returns:
+        Tuple[WeatherResult, Optional[str]]: The cache entry (or an error
+        payload) and how it was served ("fresh", "stale", "revalidated"; None
+        if no weather data was served)
+    """
+    # Serve from cache while the forecast is still current; in serve-stale
+    # mode recently expired entries are served too and refreshed behind
+    cache_key = (adcode, extensions)
+    if WEATHER_PREFETCHER is not None:
+        WEATHER_PREFETCHER.record(cache_key)
+    stale_grace = WEATHER_CACHE_STALE_GRACE_SECONDS if WEATHER_CACHE_SERVE_STALE else 0
+    cached = await get_cached_weather(cache_key, stale_grace)
+    if cached is not None:
+        if cached.is_fresh(time.time()):
+            logging.info(f"Weather cache hit: adcode={adcode}")
+            return cached, "fresh"
+        logging.info(f"Serving stale weather: adcode={adcode}")
+        schedule_refresh(adcode, extensions)
+        return cached, "stale"
+
+    # Call the weather provider, joining an identical call already in flight;
+    # if it cannot answer, fall back to the last known weather of any age
+    try:
+        if upstream_limit is None:
+            weather = await UPSTREAM_FLIGHTS.do(
+                cache_key, lambda: load_weather(adcode, extensions)
+            )
+        else:
+            async with upstream_limit:
+                weather = await UPSTREAM_FLIGHTS.do(
+                    cache_key, lambda: load_weather(adcode, extensions)
+                )
+    except CircuitOpenError:
+        # AMAP is known to be down: no upstream call was made
+        return await serve_degraded(
+            cache_key,
+            weather_error("Weather API temporarily unavailable", "10002"),
+            "circuit open",
+        )
+    except Exception as e:
+        # Timeouts, connection errors and the like
+        logging.error(f"Error fetching weather for adcode {adcode}: {e}")
+        return await serve_degraded(
+            cache_key,
+            weather_error(f"Error getting weather information: {str(e)}", "10001"),
+            f"{type(e).__name__}: {e}",
+        )
+    if not isinstance(weather, CacheEntry):
+        return await serve_degraded(
+            cache_key, weather, f"infocode {weather.get('infocode')}"
+        )
+    return weather, "revalidated"
+
+
+async def serve_degraded(
+    cache_key: Tuple[str, str], error: Dict[str, Any], reason: str
+) -> Tuple[WeatherResult, Optional[str]]:
+    """
+    Serve the last known weather of any age when upstream could not answer
+
+    Args:
+        cache_key: (adcode, extensions) tuple
+        error: Payload returned when nothing is cached
+        reason: Why upstream could not answer, for the logs
+
+    Returns:
+        Tuple[WeatherResult, Optional[str]]: (newest entry, "stale"), or
+        (error, None) if no cache tier has the key
+    """
+    fallback = await latest_cached_weather(cache_key)
+    if fallback is None:
+        DEGRADED_STATS["unavailable"] += 1
+        logging.warning(
+            f"Weather upstream unavailable ({reason}), no cached weather: {cache_key}"
+        )
+        return error, None
+    DEGRADED_STATS["served"] += 1
+    logging.warning(
+        f"Weather upstream unavailable ({reason}), serving cached weather: {cache_key}"
+    )
+    return fallback, "stale"
+
+
+async def get_cached_weather(
+    cache_key: Tuple[str, str], stale_grace: float
+) -> Optional[CacheEntry]:
+    """
+    Get a cache entry from the in-process cache, then the disk cache
+
+    Entries found on disk are copied into the in-process cache with their
+    original expiry, so the next lookup does not touch the disk.
+
+    Args:
+        cache_key: (adcode, extensions) tuple
+        stale_grace: How long past its expiry an entry may still be served
+
+    Returns:
+        The cached entry (check is_fresh), or None on a miss in every tier
+    """
+    cached = WEATHER_CACHE.get(cache_key, stale_grace=stale_grace)
+    if cached is None and DISK_WEATHER_CACHE is not None:
+        cached = await DISK_WEATHER_CACHE.get(cache_key, stale_grace=stale_grace)
+        if cached is not None:
+            WEATHER_CACHE.put(cache_key, cached)
+    return cached
+
+
+async def latest_cached_weather(cache_key: Tuple[str, str]) -> Optional[CacheEntry]:
+    """
+    Get the newest cache entry of any age across the cache tiers
+
+    Another worker may have refreshed the disk cache already; a newer disk
+    entry replaces the in-process one so it is not fetched again.
+
+    Args:
+        cache_key: (adcode, extensions) tuple
+
+    Returns:
+        The newest entry, or None if no tier has one
+    """
+    cached = WEATHER_CACHE.peek(cache_key)
+    if DISK_WEATHER_CACHE is not None:
+        stored = await DISK_WEATHER_CACHE.peek(cache_key)
+        if stored is not None and (
+            cached is None or stored.expires_at > cached.expires_at
+        ):
+            WEATHER_CACHE.put(cache_key, stored)
+            cached = stored
+    return cached
+
+
+async def get_batch_item_weather(
+    adcode: str, upstream_limit: asyncio.Semaphore
+) -> Dict[str, Any]:
+    """Get weather for one batch item, turning failures into an error payload"""
+    try:
+        weather, state = await get_adcode_weather(
+            adcode, AMAP_EXTENSIONS, upstream_limit
+        )
+        if not isinstance(weather, CacheEntry):
+            return weather
+        if state == "stale":
+            return {"stale": True, "age": weather_age([weather]), **weather.payload}
+        return weather.payload
+    except Exception as e:
+        logging.error(f"Error getting weather information for adcode {adcode}: {e}")
+        return weather_error(f"Error getting weather information: {str(e)}", "10001")
+
+
+def schedule_refresh(adcode: str, extensions: str) -> None:
+    """
+    Refresh a cache entry in the background unless a fetch is already running
+
+    Args:
+        adcode: City adcode
+        extensions: AMAP extensions parameter
+    """
+    cache_key: Hashable = (adcode, extensions)
+    # Nothing to refresh from while AMAP is down; the circuit probes on its own
+    if cache_key in UPSTREAM_FLIGHTS or AMAP_CIRCUIT_BREAKER.is_open():
+        return
+
+    task = asyncio.ensure_future(refresh_weather(adcode, extensions))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_on_refresh_done)
+
+
+async def refresh_weather(adcode: str, extensions: str) -> bool:
+    """
+    Refresh a cache entry from upstream with background priority
+
+    Args:
+        adcode: City adcode
+        extensions: AMAP extensions parameter
+
+    Returns:
+        bool: Whether fresh weather data was cached
+    """
+    try:
+        weather = await UPSTREAM_FLIGHTS.do(
+            (adcode, extensions),
+            lambda: load_weather(adcode, extensions, priority=PRIORITY_BACKGROUND),
+        )
+    except CircuitOpenError:
+        return False
+    return isinstance(weather, CacheEntry)
+
+
+def _on_refresh_done(task: asyncio.Task) -> None:
+    _refresh_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"Background weather refresh failed: {task.exception()}")
+
+
+async def load_weather(
+    adcode: str, extensions: str, priority: int = PRIORITY_FOREGROUND
+) -> WeatherResult:
+    """
+    Fetch weather information from upstream and cache it if successful
+
+    Args:
+        adcode: City adcode
+        extensions: AMAP extensions parameter
+        priority: Rate limiter priority of the upstream call
+
+    Returns:
+        WeatherResult: The new cache entry, or an error payload if the request failed
+    """
+    upstream = await fetch_weather_from_provider(adcode, extensions, priority)
+    if not isinstance(upstream, UpstreamWeather):
+        return upstream
+    if upstream.payload.get("status") != "1":
+        return upstream.payload
+
+    entry = WEATHER_CACHE.set(
+        (adcode, extensions),
+        upstream.payload,
+        upstream.body,
+        upstream.content_type,
+        policy=WEATHER_CACHE_POLICIES.get(extensions),
+    )
+    if DISK_WEATHER_CACHE is not None:
+        await DISK_WEATHER_CACHE.set((adcode, extensions), entry)
+    return entry
+
+
+async def fetch_weather_from_provider(
+    adcode: str, extensions: str, priority: int = PRIORITY_FOREGROUND
+) -> Union[UpstreamWeather, Dict[str, Any]]:
+    """
+    Fetch weather information for an adcode from the configured provider
+
+    Args:
+        adcode: City adcode
+        extensions: AMAP extensions parameter ("all" forecasts, "base" live)
+        priority: Rate limiter priority, background refreshes yield to users
+
+    Returns:
+        The upstream response, or an error payload if the request failed
+
+    Raises:
+        CircuitOpenError: When AMAP is failing and the circuit is open
+    """
+    # Fail fast while AMAP is known to be down (reserves a probe slot if half-open)
+    AMAP_CIRCUIT_BREAKER.check()
+
+    try:
+        await AMAP_RATE_LIMITER.acquire(priority)
+        upstream = await AMAP_HEDGER.call(
+            lambda: WEATHER_PROVIDER.fetch(adcode, extensions),
+            can_hedge=lambda: AMAP_RATE_LIMITER.try_acquire(PRIORITY_BACKGROUND),
+        )
+    except RateLimitExceeded as e:
+        AMAP_CIRCUIT_BREAKER.release()
+        logging.warning(f"AMAP rate limit exceeded for adcode {adcode}: {e}")
+        return weather_error(
+            f"Weather API rate limit exceeded, please retry later: {e}", "10004"
+        )
+    except ProviderUnavailable as e:
+        AMAP_CIRCUIT_BREAKER.release()
+        logging.error(f"Weather provider unavailable for adcode {adcode}: {e}")
+        return weather_error(
+            f"Weather API quota exhausted, please retry later: {e}", "10004"
+        )
+    except UpstreamHTTPError as e:
+        AMAP_CIRCUIT_BREAKER.record_failure()
+        logging.error(f"Weather API request failed: {e.status}, {e.text}")
+        return weather_error(f"Weather API request failed: {e.status}", "10002")
+    except asyncio.CancelledError:
+        AMAP_CIRCUIT_BREAKER.release()
+        raise
+    except Exception:
+        AMAP_CIRCUIT_BREAKER.record_failure()
+        raise
+
+    AMAP_CIRCUIT_BREAKER.record_success()
+    logging.info(
+        f"Retrieved weather data for adcode {adcode}: {len(upstream.body)} bytes"
+    )
+    return upstream
 
 
 async def get_city_adcode(city_name: str) -> Optional[str]:
@@ -117,21 +898,5 @@ async def get_city_adcode(city_name: str) -> Optional[str]:
     Returns:
         The city's adcode, or None if not found
     """
-    try:
-        # Get the path to the adcode mapping file
-        current_dir = Path(__file__).parent
-        adcode_file_path = current_dir / "amap_adcode.json"
-
-        # Read the adcode mapping file
-        with open(adcode_file_path, "r", encoding="utf-8") as f:
-            adcode_map = json.load(f)
-
-        # Find the adcode corresponding to the city
-        # In the new JSON format, adcode_map is a list, with each element containing cityName and adcode fields
-        for city_info in adcode_map:
-            if city_info["cityName"].startswith(city_name):
-                return str(city_info["adcode"])
-        return None
-    except Exception as e:
-        logging.error(f"Error getting city adcode: {str(e)}\n{traceback.format_exc()}")
-        return None
+    # Returns the first entry (in file order) whose cityName starts with city_name
+    return ADCODE_INDEX.lookup(city_name)
@@ -0,0 +1,186 @@
+"""
+Background prefetching of hot cities.
+
+Every weather lookup is recorded in a decaying frequency counter. A periodic
+task started in the application lifespan takes the hottest (adcode,
+extensions) keys and refreshes those whose cache entry is missing or about
+to expire, so popular cities are served from a fresh cache instead of
+waiting on AMAP. Prefetch calls are limited to a share of the AMAP rate and
+daily quota and use background priority in the rate limiter.
+"""
+
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from utils.decaying_counter import DecayingCounter
+from utils.rate_limiter import QUOTA_TIMEZONE
+from .weather_cache import CacheEntry
+
+
+class WeatherPrefetcher:
+    """
+    Periodic refresher of the most requested cache keys.
+
+    Args:
+        counter: Decaying request counter per cache key
+        peek: Coroutine function getting the current cache entry of a key (any age), or None
+        refresh: Fetches a key from upstream and caches it; returns True on success
+        top_n: Number of hottest keys considered per cycle
+        interval: Seconds between two cycles
+        lead_time: Refresh entries expiring within this many seconds
+        min_score: Keys with a lower decayed score are not prefetched
+        cycle_budget: Upstream calls allowed per cycle
+        daily_budget: Upstream calls allowed per day (0: unlimited)
+        concurrency: Prefetch calls running at once
+    """
+
+    def __init__(
+        self,
+        counter: DecayingCounter,
+        peek: Callable[[Hashable], Awaitable[Optional[CacheEntry]]],
+        refresh: Callable[[Hashable], Awaitable[bool]],
+        top_n: int,
+        interval: float,
+        lead_time: float,
+        min_score: float,
+        cycle_budget: int,
+        daily_budget: int = 0,
+        concurrency: int = 5,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.counter = counter
+        self.top_n = top_n
+        self.interval = interval
+        self.lead_time = lead_time
+        self.min_score = min_score
+        self.cycle_budget = cycle_budget
+        self.daily_budget = daily_budget
+        self.concurrency = concurrency
+        self._peek = peek
+        self._refresh = refresh
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+        self._quota_day = ""
+        self.used_today = 0
+        self.cycles = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.skipped_budget = 0
+
+    def record(self, key: Hashable) -> None:
+        """Record one request for a cache key"""
+        self.counter.record(key)
+
+    async def due(self) -> List[Hashable]:
+        """
+        Get the hot keys whose entry is missing or expires within the lead time
+
+        Returns:
+            List[Hashable]: Keys, hottest first
+        """
+        refresh_before = self._clock() + self.lead_time
+        keys = []
+        for key, score in self.counter.top(self.top_n):
+            if score < self.min_score:
+                break
+            entry = await self._peek(key)
+            if entry is None or entry.expires_at <= refresh_before:
+                keys.append(key)
+        return keys
+
+    def _remaining_budget(self) -> int:
+        today = datetime.now(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+        if today != self._quota_day:
+            self._quota_day = today
+            self.used_today = 0
+        if self.daily_budget <= 0:
+            return self.cycle_budget
+        return max(0, min(self.cycle_budget, self.daily_budget - self.used_today))
+
+    async def run_once(self) -> int:
+        """
+        Run one prefetch cycle
+
+        Returns:
+            int: Number of keys refreshed successfully
+        """
+        self.cycles += 1
+        keys = await self.due()
+        budget = self._remaining_budget()
+        if len(keys) > budget:
+            self.skipped_budget += len(keys) - budget
+            keys = keys[:budget]
+        if not keys:
+            return 0
+
+        self.used_today += len(keys)
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(key: Hashable) -> bool:
+            async with limit:
+                return await self._refresh(key)
+
+        results = await asyncio.gather(
+            *(refresh(key) for key in keys), return_exceptions=True
+        )
+        refreshed = sum(1 for result in results if result is True)
+        self.refreshed += refreshed
+        self.failed += len(results) - refreshed
+        # Forget keys that have cooled down so the counter stays small
+        self.counter.prune(self.min_score / 10)
+        logging.info(f"Prefetched {refreshed}/{len(keys)} hot weather entries")
+        return refreshed
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.error(f"Weather prefetch cycle failed: {e}")
+
+    def start(self) -> None:
+        """Start the periodic prefetch task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+            logging.info(
+                f"Weather prefetch started: top {self.top_n} every {self.interval}s, "
+                f"at most {self.cycle_budget} calls per cycle"
+            )
+
+    async def stop(self) -> None:
+        """Stop the periodic prefetch task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get prefetch counters
+
+        Returns:
+            Dict[str, Any]: Configuration, budget use and refresh counts
+        """
+        stats = {
+            "running": self._task is not None and not self._task.done(),
+            "top_n": self.top_n,
+            "interval": self.interval,
+            "cycle_budget": self.cycle_budget,
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "skipped_budget": self.skipped_budget,
+            "used_today": self.used_today,
+            "counter": self.counter.stats(),
+        }
+        if self.daily_budget > 0:
+            stats["daily_budget"] = self.daily_budget
+        return stats
@@ -0,0 +1,142 @@
+"""
+Field projection and compact encoding of weather payloads.
+
+Callers can ask for a subset of the forecast cast fields, only the first N
+days, and a compact shape where each forecast lists its field names once and
+every cast as an array of values:
+
+    {"fields": ["date", "daytemp"], "casts": [["2025-05-13", "25"], ...]}
+
+Projections are computed from the cached upstream payload and the encoded
+bytes are memoized on the cache entry, so repeated queries with the same
+selector cost no more than a plain cache hit.
+"""
+
+import json
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Fields of an AMAP forecast cast, in upstream order
+CAST_FIELDS = (
+    "date",
+    "week",
+    "dayweather",
+    "nightweather",
+    "daytemp",
+    "nighttemp",
+    "daywind",
+    "nightwind",
+    "daypower",
+    "nightpower",
+    "daytemp_float",
+    "nighttemp_float",
+)
+
+FORMAT_FULL = "full"
+FORMAT_COMPACT = "compact"
+FORMATS = (FORMAT_FULL, FORMAT_COMPACT)
+
+
+@dataclass(frozen=True)
+class WeatherSelector:
+    """Which cast fields and days to return, and in which shape"""
+
+    fields: Optional[Tuple[str, ...]] = None
+    days: Optional[int] = None
+    compact: bool = False
+
+    @property
+    def is_default(self) -> bool:
+        """Whether the selector asks for the unmodified upstream payload"""
+        return self.fields is None and self.days is None and not self.compact
+
+    def etag_suffix(self) -> str:
+        """Short tag distinguishing this representation in ETags"""
+        spec = f"{','.join(self.fields or ())};{self.days or ''};{int(self.compact)}"
+        return f"{zlib.crc32(spec.encode('utf-8')):08x}"
+
+
+def parse_selector(
+    fields: Optional[str], days: Optional[int], response_format: str
+) -> WeatherSelector:
+    """
+    Validate the fields/days/format query parameters
+
+    Args:
+        fields: Comma-separated cast field names, or None for all fields
+        days: Number of forecast days to return, or None for all days
+        response_format: "full" (AMAP shape) or "compact" (arrays of values)
+
+    Returns:
+        WeatherSelector: The normalized selector
+
+    Raises:
+        ValueError: When a field, the day count or the format is invalid
+    """
+    if response_format not in FORMATS:
+        raise ValueError(f"Invalid format, expected one of: {', '.join(FORMATS)}")
+    if days is not None and days < 1:
+        raise ValueError("Invalid days, must be at least 1")
+
+    selected = None
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in CAST_FIELDS]
+        if unknown:
+            raise ValueError(f"Invalid fields: {', '.join(unknown)}")
+        # Keep upstream order and drop duplicates so equal selections share a cache
+        selected = tuple(name for name in CAST_FIELDS if name in names)
+
+    return WeatherSelector(
+        fields=selected, days=days, compact=response_format == FORMAT_COMPACT
+    )
+
+
+def project_casts(
+    casts: List[Dict[str, Any]], selector: WeatherSelector
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Get the selected field names and the casts of the selected days"""
+    casts = casts[: selector.days] if selector.days else casts
+    if selector.fields is not None:
+        names = list(selector.fields)
+    else:
+        names = [name for name in CAST_FIELDS if casts and name in casts[0]]
+    return names, casts
+
+
+def project_forecast(
+    forecast: Dict[str, Any], selector: WeatherSelector
+) -> Dict[str, Any]:
+    """Project one AMAP forecast item (city, reporttime and casts)"""
+    names, casts = project_casts(forecast.get("casts", []), selector)
+    projected = {key: value for key, value in forecast.items() if key != "casts"}
+    if selector.compact:
+        projected["fields"] = names
+        projected["casts"] = [[cast.get(name) for name in names] for cast in casts]
+    else:
+        projected["casts"] = [
+            {name: cast[name] for name in names if name in cast} for cast in casts
+        ]
+    return projected
+
+
+def render_weather(payload: Dict[str, Any], selector: WeatherSelector) -> bytes:
+    """
+    Encode a weather payload with the selector applied
+
+    Args:
+        payload: AMAP weather payload
+        selector: Fields, days and shape to return
+
+    Returns:
+        bytes: The UTF-8 JSON body
+    """
+    projected = dict(payload)
+    if "forecasts" in payload:
+        projected["forecasts"] = [
+            project_forecast(forecast, selector) for forecast in payload["forecasts"]
+        ]
+    return json.dumps(projected, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
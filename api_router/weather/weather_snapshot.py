@@ -0,0 +1,212 @@
+"""
+Periodic snapshots of the in-process weather cache.
+
+The cache is written to a JSON Lines file at a fixed interval and when the
+application shuts down, and loaded back in the application lifespan before
+the first request is served, so a restarted worker starts warm instead of
+sending every city to AMAP again. Snapshots are written to a temporary file
+and renamed into place, so a crash mid-write never leaves a truncated file.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .weather_cache import CacheEntry, WeatherCache
+
+
+def encode_entry(key: Hashable, entry: CacheEntry) -> str:
+    """Encode one cache entry as a JSON line"""
+    return json.dumps(
+        {
+            "key": list(key),
+            "body": entry.body.decode("utf-8"),
+            "content_type": entry.content_type,
+            "fetched_at": entry.fetched_at,
+            "expires_at": entry.expires_at,
+            "report_time": entry.report_time,
+        },
+        ensure_ascii=False,
+    )
+
+
+def decode_entry(line: str) -> Tuple[Hashable, CacheEntry]:
+    """
+    Decode one JSON line written by encode_entry
+
+    Raises:
+        ValueError: When the line is not a valid snapshot entry
+    """
+    try:
+        item = json.loads(line)
+        entry = CacheEntry(
+            body=item["body"].encode("utf-8"),
+            fetched_at=float(item["fetched_at"]),
+            expires_at=float(item["expires_at"]),
+            report_time=item.get("report_time"),
+            content_type=item["content_type"],
+        )
+        return tuple(item["key"]), entry
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"invalid snapshot entry: {e}") from e
+
+
+class WeatherCacheSnapshot:
+    """
+    Saves and restores the entries of a WeatherCache.
+
+    Args:
+        cache: The cache to snapshot
+        path: Snapshot file, created with its directory if missing
+        interval: Seconds between two periodic snapshots
+        max_stale: Entries expired for longer than this are not restored
+    """
+
+    def __init__(
+        self,
+        cache: WeatherCache,
+        path: str,
+        interval: float,
+        max_stale: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.cache = cache
+        self.path = path
+        self.interval = interval
+        self.max_stale = max_stale
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+        self.saves = 0
+        self.last_saved_entries = 0
+        self.last_save_ms = 0.0
+        self.loaded_entries = 0
+        self.load_ms = 0.0
+
+    def load(self) -> int:
+        """
+        Restore entries from the snapshot file into the cache
+
+        Entries already in the cache are kept, expired entries are restored as
+        stale (servable within the stale grace, or while the circuit is open)
+        unless they expired more than max_stale seconds ago.
+
+        Returns:
+            int: Number of entries restored
+        """
+        if not os.path.exists(self.path):
+            logging.info(f"No weather cache snapshot at {self.path}")
+            return 0
+
+        start = time.perf_counter()
+        now = self._clock()
+        fresh = stale = skipped = invalid = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    key, entry = decode_entry(line)
+                except ValueError:
+                    invalid += 1
+                    continue
+                if entry.expires_at + self.max_stale <= now:
+                    skipped += 1
+                    continue
+                if self.cache.peek(key) is not None:
+                    continue
+                self.cache.put(key, entry)
+                if entry.is_fresh(now):
+                    fresh += 1
+                else:
+                    stale += 1
+
+        self.loaded_entries = fresh + stale
+        self.load_ms = (time.perf_counter() - start) * 1000
+        logging.info(
+            f"Loaded {self.loaded_entries} weather cache entries from snapshot in "
+            f"{self.load_ms:.1f} ms ({fresh} fresh, {stale} stale, "
+            f"{skipped} too old, {invalid} invalid)"
+        )
+        return self.loaded_entries
+
+    def _write(self, items: List[Tuple[Hashable, CacheEntry]]) -> None:
+        directory = Path(self.path).parent
+        directory.mkdir(parents=True, exist_ok=True)
+        # A unique temp file per write: a cancelled save may still be running
+        # in its thread, and other workers may share the snapshot path
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for key, entry in items:
+                    f.write(encode_entry(key, entry) + "\n")
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def save(self) -> int:
+        """
+        Write every cache entry to the snapshot file
+
+        Returns:
+            int: Number of entries written
+        """
+        # Take the entry list on the event loop, encode and write in a thread
+        items = self.cache.items()
+        start = time.perf_counter()
+        await asyncio.to_thread(self._write, items)
+        self.saves += 1
+        self.last_saved_entries = len(items)
+        self.last_save_ms = (time.perf_counter() - start) * 1000
+        logging.info(
+            f"Saved {len(items)} weather cache entries to snapshot in "
+            f"{self.last_save_ms:.1f} ms"
+        )
+        return len(items)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except Exception as e:
+                logging.error(f"Weather cache snapshot failed: {e}")
+
+    def start(self) -> None:
+        """Start periodic snapshots on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Stop periodic snapshots and write a final snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.save()
+        except Exception as e:
+            logging.error(f"Final weather cache snapshot failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get snapshot counters
+
+        Returns:
+            Dict[str, Any]: Path, entries and timings of the last load and save
+        """
+        return {
+            "path": self.path,
+            "interval": self.interval,
+            "loaded_entries": self.loaded_entries,
+            "load_ms": round(self.load_ms, 1),
+            "saves": self.saves,
+            "last_saved_entries": self.last_saved_entries,
+            "last_save_ms": round(self.last_save_ms, 1),
+        }
@@ -17,10 +17,163 @@ AGENT_DESCRIPTION_JSON_DOMAIN = os.getenv(
 )
 
 # Weather service settings
+# Weather provider: "amap" or "mock" (in-process mock for offline load testing)
+WEATHER_PROVIDER = os.getenv("WEATHER_PROVIDER", "amap")
 AMAP_WEATHER_API_URL = os.getenv(
     "AMAP_WEATHER_API_URL", "https://restapi.amap.com/v3/weather/weatherInfo"
 )
 AMAP_API_KEY = os.getenv("AMAP_API_KEY", "apikey-test")
+# Comma-separated list of AMAP keys to spread requests over (default: AMAP_API_KEY)
+AMAP_API_KEYS = [
+    key.strip()
+    for key in os.getenv("AMAP_API_KEYS", AMAP_API_KEY).split(",")
+    if key.strip()
+]
+# Key selection: "round_robin" or "remaining_quota"
+AMAP_KEY_STRATEGY = os.getenv("AMAP_KEY_STRATEGY", "round_robin")
+# Seconds a key is quarantined after an invalid-key or quota infocode
+AMAP_KEY_COOLDOWN_SECONDS = float(os.getenv("AMAP_KEY_COOLDOWN_SECONDS", "300"))
+# Daily call quota of each key, used for remaining-quota reporting (0: unknown)
+AMAP_KEY_DAILY_QUOTA = int(os.getenv("AMAP_KEY_DAILY_QUOTA", "0"))
+
+# AMAP upstream rate limiting (token bucket; QPS 0 disables limiting)
+AMAP_RATE_LIMIT_QPS = float(os.getenv("AMAP_RATE_LIMIT_QPS", "50"))
+AMAP_RATE_LIMIT_BURST = int(os.getenv("AMAP_RATE_LIMIT_BURST", "50"))
+AMAP_RATE_LIMIT_MAX_QUEUE = int(os.getenv("AMAP_RATE_LIMIT_MAX_QUEUE", "200"))
+AMAP_RATE_LIMIT_MAX_WAIT_SECONDS = float(
+    os.getenv("AMAP_RATE_LIMIT_MAX_WAIT_SECONDS", "2")
+)
+# AMAP circuit breaker: open after consecutive failures, probe after recovery time
+AMAP_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AMAP_CIRCUIT_FAILURE_THRESHOLD", "5"))
+AMAP_CIRCUIT_RECOVERY_SECONDS = float(os.getenv("AMAP_CIRCUIT_RECOVERY_SECONDS", "30"))
+AMAP_CIRCUIT_HALF_OPEN_MAX_CALLS = int(
+    os.getenv("AMAP_CIRCUIT_HALF_OPEN_MAX_CALLS", "1")
+)
+# AMAP hedged requests: second attempt after the p95 latency (or default delay)
+AMAP_HEDGE_ENABLED = os.getenv("AMAP_HEDGE_ENABLED", "false").lower() == "true"
+AMAP_HEDGE_DEFAULT_DELAY_SECONDS = float(
+    os.getenv("AMAP_HEDGE_DEFAULT_DELAY_SECONDS", "1")
+)
+AMAP_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("AMAP_HEDGE_MIN_DELAY_SECONDS", "0.05"))
+# Daily AMAP call quota, used to report remaining quota (0: not reported)
+AMAP_DAILY_QUOTA = int(os.getenv("AMAP_DAILY_QUOTA", "0"))
+
+# Mock weather provider: latency (base + uniform jitter), error rate, forecast days
+MOCK_WEATHER_LATENCY_SECONDS = float(os.getenv("MOCK_WEATHER_LATENCY_SECONDS", "0.02"))
+MOCK_WEATHER_LATENCY_JITTER_SECONDS = float(
+    os.getenv("MOCK_WEATHER_LATENCY_JITTER_SECONDS", "0")
+)
+MOCK_WEATHER_ERROR_RATE = float(os.getenv("MOCK_WEATHER_ERROR_RATE", "0"))
+MOCK_WEATHER_FORECAST_DAYS = int(os.getenv("MOCK_WEATHER_FORECAST_DAYS", "4"))
+MOCK_WEATHER_SEED = int(os.getenv("MOCK_WEATHER_SEED", "0"))
+
+# Upstream HTTP client settings (shared keep-alive connection pool)
+UPSTREAM_HTTP_POOL_SIZE = int(os.getenv("UPSTREAM_HTTP_POOL_SIZE", "100"))
+UPSTREAM_HTTP_POOL_PER_HOST = int(os.getenv("UPSTREAM_HTTP_POOL_PER_HOST", "50"))
+UPSTREAM_HTTP_DNS_CACHE_TTL = int(os.getenv("UPSTREAM_HTTP_DNS_CACHE_TTL", "300"))
+UPSTREAM_HTTP_KEEPALIVE_TIMEOUT = float(
+    os.getenv("UPSTREAM_HTTP_KEEPALIVE_TIMEOUT", "30")
+)
+UPSTREAM_HTTP_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_HTTP_CONNECT_TIMEOUT", "3"))
+UPSTREAM_HTTP_READ_TIMEOUT = float(os.getenv("UPSTREAM_HTTP_READ_TIMEOUT", "5"))
+
+# Weather cache settings (expiry = AMAP reporttime + max age, at least min TTL)
+WEATHER_CACHE_MAX_SIZE = int(os.getenv("WEATHER_CACHE_MAX_SIZE", "4096"))
+WEATHER_CACHE_MAX_AGE_SECONDS = float(
+    os.getenv("WEATHER_CACHE_MAX_AGE_SECONDS", "3600")
+)
+WEATHER_CACHE_MIN_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_MIN_TTL_SECONDS", "60"))
+# Live conditions (extensions=base) are republished hourly and expire sooner
+WEATHER_LIVE_CACHE_MAX_AGE_SECONDS = float(
+    os.getenv("WEATHER_LIVE_CACHE_MAX_AGE_SECONDS", "1800")
+)
+WEATHER_LIVE_CACHE_MIN_TTL_SECONDS = float(
+    os.getenv("WEATHER_LIVE_CACHE_MIN_TTL_SECONDS", "60")
+)
+# Serve expired entries for up to the grace window while refreshing in background
+WEATHER_CACHE_SERVE_STALE = (
+    os.getenv("WEATHER_CACHE_SERVE_STALE", "true").lower() == "true"
+)
+WEATHER_CACHE_STALE_GRACE_SECONDS = float(
+    os.getenv("WEATHER_CACHE_STALE_GRACE_SECONDS", "600")
+)
+
+# Optional SQLite weather cache shared by all workers on a host and kept across
+# restarts; expired rows are kept for the retention period, then swept
+WEATHER_DISK_CACHE_ENABLED = (
+    os.getenv("WEATHER_DISK_CACHE_ENABLED", "false").lower() == "true"
+)
+WEATHER_DISK_CACHE_PATH = os.getenv(
+    "WEATHER_DISK_CACHE_PATH", str(BASE_DIR / "data" / "weather_cache.sqlite3")
+)
+WEATHER_DISK_CACHE_RETENTION_SECONDS = float(
+    os.getenv("WEATHER_DISK_CACHE_RETENTION_SECONDS", "86400")
+)
+WEATHER_DISK_CACHE_SWEEP_INTERVAL_SECONDS = float(
+    os.getenv("WEATHER_DISK_CACHE_SWEEP_INTERVAL_SECONDS", "600")
+)
+
+# Periodic snapshot of the in-process weather cache, loaded at startup so a
+# restarted worker serves warm; entries expired longer than max stale are dropped
+WEATHER_SNAPSHOT_ENABLED = (
+    os.getenv("WEATHER_SNAPSHOT_ENABLED", "false").lower() == "true"
+)
+WEATHER_SNAPSHOT_PATH = os.getenv(
+    "WEATHER_SNAPSHOT_PATH", str(BASE_DIR / "data" / "weather_snapshot.jsonl")
+)
+WEATHER_SNAPSHOT_INTERVAL_SECONDS = float(
+    os.getenv("WEATHER_SNAPSHOT_INTERVAL_SECONDS", "300")
+)
+WEATHER_SNAPSHOT_MAX_STALE_SECONDS = float(
+    os.getenv("WEATHER_SNAPSHOT_MAX_STALE_SECONDS", "86400")
+)
+
+# Hot-city prefetch: refresh the most requested cities before their cache
+# entries expire, using at most a share of the AMAP rate limit and daily quota
+WEATHER_PREFETCH_ENABLED = (
+    os.getenv("WEATHER_PREFETCH_ENABLED", "false").lower() == "true"
+)
+WEATHER_PREFETCH_TOP_N = int(os.getenv("WEATHER_PREFETCH_TOP_N", "50"))
+WEATHER_PREFETCH_INTERVAL_SECONDS = float(
+    os.getenv("WEATHER_PREFETCH_INTERVAL_SECONDS", "60")
+)
+WEATHER_PREFETCH_LEAD_SECONDS = float(os.getenv("WEATHER_PREFETCH_LEAD_SECONDS", "300"))
+WEATHER_PREFETCH_HALF_LIFE_SECONDS = float(
+    os.getenv("WEATHER_PREFETCH_HALF_LIFE_SECONDS", "1800")
+)
+WEATHER_PREFETCH_MIN_SCORE = float(os.getenv("WEATHER_PREFETCH_MIN_SCORE", "2"))
+WEATHER_PREFETCH_QUOTA_SHARE = float(os.getenv("WEATHER_PREFETCH_QUOTA_SHARE", "0.1"))
+
+# Batch weather query settings
+WEATHER_BATCH_MAX_CITIES = int(os.getenv("WEATHER_BATCH_MAX_CITIES", "200"))
+WEATHER_BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "10"))
+
+# Resolved DID documents are reused for the TTL, failed resolutions for the
+# negative TTL (0 disables either); the cache holds at most MAX_SIZE DIDs
+DID_DOCUMENT_CACHE_TTL_SECONDS = float(
+    os.getenv("DID_DOCUMENT_CACHE_TTL_SECONDS", "300")
+)
+DID_DOCUMENT_CACHE_NEGATIVE_TTL_SECONDS = float(
+    os.getenv("DID_DOCUMENT_CACHE_NEGATIVE_TTL_SECONDS", "30")
+)
+DID_DOCUMENT_CACHE_MAX_SIZE = int(os.getenv("DID_DOCUMENT_CACHE_MAX_SIZE", "1000"))
+# A failed signature check re-resolves a cached document at most this often per DID
+DID_DOCUMENT_CACHE_MIN_REFRESH_SECONDS = float(
+    os.getenv("DID_DOCUMENT_CACHE_MIN_REFRESH_SECONDS", "30")
+)
+
+# Replay protection: used DIDwba nonces held at most (a hard memory cap), and
+# what happens when it is reached: "reject" refuses new authentications until
+# nonces expire, "evict_oldest" forgets the nonces closest to expiry
+NONCE_STORE_MAX_SIZE = int(os.getenv("NONCE_STORE_MAX_SIZE", "100000"))
+NONCE_STORE_OVERFLOW_POLICY = os.getenv("NONCE_STORE_OVERFLOW_POLICY", "reject").lower()
+# Where used nonces are kept: "memory" (this process only) or "sqlite", shared
+# by all workers on a host; required when running more than one worker (any
+# other value is refused at startup)
+NONCE_STORE_BACKEND = os.getenv("NONCE_STORE_BACKEND", "memory").lower()
+NONCE_STORE_SQLITE_PATH = os.getenv(
+    "NONCE_STORE_SQLITE_PATH", str(BASE_DIR / "data" / "nonces.sqlite3")
+)
 
 # JWT settings
 JWT_PRIVATE_KEY_PATH = os.getenv(
@@ -29,3 +182,18 @@ JWT_PRIVATE_KEY_PATH = os.getenv(
 JWT_PUBLIC_KEY_PATH = os.getenv(
     "JWT_PUBLIC_KEY_PATH", str(BASE_DIR / "doc" / "test_jwt_key" / "public_key.pem")
 )
+# Public keys of retired or other hosts' signing keys that tokens may still be
+# verified with (comma-separated PEM paths); RSA, EC and Ed25519 keys are supported
+JWT_VERIFY_KEY_PATHS = tuple(
+    path.strip()
+    for path in os.getenv("JWT_VERIFY_KEY_PATHS", "").split(",")
+    if path.strip()
+)
+# Seconds a signing key replaced by a reload keeps verifying tokens it issued
+JWT_RETIRED_KEY_GRACE_SECONDS = float(os.getenv("JWT_RETIRED_KEY_GRACE_SECONDS", "600"))
+# Verified bearer tokens kept in memory until they expire (0: verify every request)
+BEARER_TOKEN_CACHE_MAX_SIZE = int(os.getenv("BEARER_TOKEN_CACHE_MAX_SIZE", "10000"))
+# Seconds between checks of the key files for rotation (0: load once at startup)
+JWT_KEY_RELOAD_INTERVAL_SECONDS = float(
+    os.getenv("JWT_KEY_RELOAD_INTERVAL_SECONDS", "10")
+)
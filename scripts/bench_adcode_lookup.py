@@ -0,0 +1,104 @@
+"""
+Microbenchmark for city name -> adcode resolution.
+
+Compares the original per-request implementation (read + parse the mapping
+file, then scan it linearly) with the load-once AdcodeIndex trie, and checks
+that both return the same adcode for every query.
+"""
+
+import sys
+import json
+import time
+import random
+import logging
+from pathlib import Path
+from typing import Callable, List, Optional
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+from api_router.weather.adcode_index import AdcodeIndex, ADCODE_FILE_PATH
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Number of lookups per implementation
+QUERY_COUNT = 2000
+
+
+def legacy_lookup(city_name: str) -> Optional[str]:
+    """Original implementation: load the whole file and scan it for every call"""
+    with open(ADCODE_FILE_PATH, "r", encoding="utf-8") as f:
+        adcode_map = json.load(f)
+    for city_info in adcode_map:
+        if city_info["cityName"].startswith(city_name):
+            return str(city_info["adcode"])
+    return None
+
+
+def build_queries(count: int) -> List[str]:
+    """Build a reproducible mix of full names, prefixes and unknown names"""
+    with open(ADCODE_FILE_PATH, "r", encoding="utf-8") as f:
+        names = [city_info["cityName"] for city_info in json.load(f)]
+
+    rng = random.Random(42)
+    queries = []
+    for _ in range(count):
+        name = rng.choice(names)
+        kind = rng.random()
+        if kind < 0.6:
+            queries.append(name)
+        elif kind < 0.9:
+            queries.append(name[: max(2, len(name) - 1)])
+        else:
+            queries.append(name + "不存在")
+    return queries
+
+
+def measure(name: str, lookup: Callable[[str], Optional[str]], queries: List[str]):
+    """Run all queries through lookup and report lookups per second"""
+    start = time.perf_counter()
+    results = [lookup(query) for query in queries]
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"{name:<16} {len(queries)} lookups in {elapsed:.4f}s "
+        f"-> {len(queries) / elapsed:,.0f} lookups/s"
+    )
+    return results, elapsed
+
+
+def main():
+    queries = build_queries(QUERY_COUNT)
+
+    start = time.perf_counter()
+    index = AdcodeIndex.from_file()
+    logger.info(
+        f"Built index over {len(index)} cities in "
+        f"{(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+
+    legacy_results, legacy_elapsed = measure(
+        "legacy (per call)", legacy_lookup, queries
+    )
+    index_results, index_elapsed = measure("AdcodeIndex", index.lookup, queries)
+
+    if legacy_results != index_results:
+        mismatches = [
+            (query, old, new)
+            for query, old, new in zip(queries, legacy_results, index_results)
+            if old != new
+        ]
+        logger.error(f"Result mismatch for {len(mismatches)} queries: {mismatches[:5]}")
+        sys.exit(1)
+
+    logger.info(f"Results identical, speedup: {legacy_elapsed / index_elapsed:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
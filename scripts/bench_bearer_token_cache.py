@@ -0,0 +1,119 @@
+"""
+Benchmarks bearer token verification with and without the verified token cache.
+
+Runs verify_bearer_token from the DID auth middleware on a mix of agent
+tokens, first with the cache disabled (RS256 signature check on every
+request), then enabled, and checks that expiry, revocation by token and by
+subject, and flushes on key rotation behave the same with the cache on.
+"""
+
+import sys
+import time
+import asyncio
+import logging
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+
+import jwt
+from fastapi import HTTPException
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+from api_router.jwt_config import JWT_KEYS, get_jwt_private_key
+from api_router.did_auth_middleware import VERIFIED_TOKEN_CACHE, verify_bearer_token
+
+# Configure logging (keep the middleware's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.CRITICAL)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+AGENTS = 100
+REQUESTS = 20000
+
+
+def issue_token(did: str, lifetime: float = 300) -> str:
+    """Issue a token the way generate_did_auth_token does"""
+    now = datetime.now(timezone.utc)
+    payload = {"sub": did, "exp": now + timedelta(seconds=lifetime), "iat": now}
+    return jwt.encode(payload, get_jwt_private_key(), algorithm="RS256")
+
+
+async def expect_status(token: str, status_code: int) -> None:
+    try:
+        await verify_bearer_token(token)
+    except HTTPException as e:
+        assert e.status_code == status_code, (e.status_code, e.detail)
+        return
+    raise AssertionError(f"token accepted, expected {status_code}")
+
+
+async def bench(tokens) -> float:
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        assert await verify_bearer_token(tokens[i % len(tokens)])
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+async def main():
+    tokens = [issue_token(f"did:wba:localhost:user:agent{i}") for i in range(AGENTS)]
+
+    max_size = VERIFIED_TOKEN_CACHE.max_size
+    VERIFIED_TOKEN_CACHE.max_size = 0
+    uncached_us = await bench(tokens)
+    logger.info(f"cache off: {uncached_us:8.1f} us per bearer request")
+
+    VERIFIED_TOKEN_CACHE.max_size = max_size
+    VERIFIED_TOKEN_CACHE.flush()
+    cached_us = await bench(tokens)
+    logger.info(
+        f"cache on:  {cached_us:8.1f} us per bearer request "
+        f"({uncached_us / cached_us:.0f}x), {VERIFIED_TOKEN_CACHE.stats()}"
+    )
+    assert VERIFIED_TOKEN_CACHE.hits == REQUESTS - AGENTS
+
+    # Cached tokens still expire at their exp
+    short = issue_token("did:wba:localhost:user:short", lifetime=1)
+    assert await verify_bearer_token(short)
+    await asyncio.sleep(1.1)
+    await expect_status(short, 401)
+    logger.info("expiry: cached token refused after exp")
+
+    # Revoking a token refuses it, other tokens keep working
+    alice = [
+        issue_token("did:wba:localhost:user:alice", lifetime) for lifetime in (300, 600)
+    ]
+    for token in alice:
+        assert await verify_bearer_token(token)
+    VERIFIED_TOKEN_CACHE.revoke(tokens[0])
+    await expect_status(tokens[0], 401)
+    assert await verify_bearer_token(tokens[1])
+
+    # Revoking a subject refuses every token issued to it so far
+    VERIFIED_TOKEN_CACHE.revoke_subject("did:wba:localhost:user:alice")
+    for token in alice:
+        await expect_status(token, 401)
+    await asyncio.sleep(1)
+    assert await verify_bearer_token(issue_token("did:wba:localhost:user:alice"))
+    logger.info("revocation: revoked token and subject refused, new token accepted")
+
+    # Key rotation flushes the cache (revocations are kept)
+    flushes = VERIFIED_TOKEN_CACHE.flushes
+    assert JWT_KEYS.reload()
+    assert (
+        VERIFIED_TOKEN_CACHE.flushes == flushes + 1 and len(VERIFIED_TOKEN_CACHE) == 0
+    )
+    await expect_status(tokens[0], 401)
+    logger.info("flush: key reload emptied the cache, revocations kept")
+
+    logger.info("All bearer token cache checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,184 @@
+"""
+Benchmarks JWT signing and verification per key ring algorithm.
+
+- Signs and verifies session tokens the way the DID auth middleware does
+  (kid header, key picked from the ring by kid) with RSA-2048 (RS256),
+  EC P-256 (ES256) and Ed25519 (EdDSA) signing keys
+- Rotates a key ring from RSA to Ed25519: tokens of the old key keep
+  verifying by kid until the grace period ends, unknown kids are refused
+- Checks verify_bearer_token accepts kid tokens and legacy tokens without kid
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+import jwt
+from fastapi import HTTPException
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+from api_router.jwt_config import JWTKeyStore, get_jwt_private_key, get_jwt_signing_key
+from api_router.did_auth_middleware import VERIFIED_TOKEN_CACHE, verify_bearer_token
+
+# Configure logging (keep the middleware's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.CRITICAL)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ROUNDS = 2000
+PAYLOAD = {
+    "sub": "did:wba:localhost:user:alice",
+    "exp": int(time.time()) + 300,
+    "iat": int(time.time()),
+}
+KEY_TYPES = {
+    "RSA-2048": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "EC P-256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "Ed25519": ed25519.Ed25519PrivateKey.generate,
+}
+
+
+def write_keys(directory: str, private_key) -> Tuple[str, str]:
+    """Write a key pair as PEM files and return their paths"""
+    private_path = os.path.join(directory, "private_key.pem")
+    public_path = os.path.join(directory, "public_key.pem")
+    with open(private_path, "wb") as f:
+        f.write(
+            private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+    with open(public_path, "wb") as f:
+        f.write(
+            private_key.public_key().public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+        )
+    return private_path, public_path
+
+
+def sign(store: JWTKeyStore) -> str:
+    key = store.signing_key()
+    return jwt.encode(
+        PAYLOAD, key.private_key, algorithm=key.algorithm, headers={"kid": key.kid}
+    )
+
+
+def verify(store: JWTKeyStore, token: str):
+    key = store.verification_key(jwt.get_unverified_header(token).get("kid"))
+    if key is None:
+        raise jwt.InvalidKeyError("unknown kid")
+    return jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+
+
+def per_second(fn) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return ROUNDS / (time.perf_counter() - start)
+
+
+def benchmark(directory: str) -> None:
+    logger.info(f"{'key':<10} {'alg':<6} {'sign/s':>9} {'verify/s':>9} {'token':>6}")
+    for name, generate in KEY_TYPES.items():
+        store = JWTKeyStore(*write_keys(directory, generate()), check_interval=0)
+        token = sign(store)
+        assert verify(store, token)["sub"] == PAYLOAD["sub"]
+        signs = per_second(lambda: sign(store))
+        verifies = per_second(lambda: verify(store, token))
+        logger.info(
+            f"{name:<10} {store.signing_key().algorithm:<6} {signs:9,.0f} "
+            f"{verifies:9,.0f} {len(token):5}B"
+        )
+
+
+def test_rotation(directory: str) -> None:
+    store = JWTKeyStore(
+        *write_keys(directory, KEY_TYPES["RSA-2048"]()),
+        check_interval=0,
+        retired_grace=0.5,
+    )
+    rsa_token = sign(store)
+    rsa_kid = store.signing_key().kid
+
+    # Rotate to Ed25519: new tokens use the new key, old tokens verify by kid
+    write_keys(directory, KEY_TYPES["Ed25519"]())
+    assert store.reload()
+    ed_token = sign(store)
+    assert jwt.get_unverified_header(ed_token)["alg"] == "EdDSA"
+    assert verify(store, ed_token) and verify(store, rsa_token)
+    assert rsa_kid in store.stats()["verification_kids"]
+
+    # An unknown kid is refused without trying other keys
+    forged = jwt.encode(
+        PAYLOAD,
+        KEY_TYPES["EC P-256"](),
+        algorithm="ES256",
+        headers={"kid": "unknown"},
+    )
+    try:
+        verify(store, forged)
+        raise AssertionError("token with unknown kid accepted")
+    except jwt.InvalidKeyError:
+        pass
+
+    # After the grace period the retired key no longer verifies
+    time.sleep(0.5)
+    assert store.verification_key(rsa_kid) is None
+    assert store.reload()
+    assert rsa_kid not in store.stats()["verification_kids"]
+    logger.info("rotation: RSA -> Ed25519, old tokens verified during grace only")
+
+
+async def test_middleware() -> None:
+    VERIFIED_TOKEN_CACHE.max_size = 0
+    key = get_jwt_signing_key()
+    token = jwt.encode(
+        PAYLOAD, key.private_key, algorithm=key.algorithm, headers={"kid": key.kid}
+    )
+    assert await verify_bearer_token(token)
+
+    # Tokens issued before kid headers verify with the signing key
+    legacy = jwt.encode(PAYLOAD, get_jwt_private_key(), algorithm="RS256")
+    assert "kid" not in jwt.get_unverified_header(legacy)
+    assert await verify_bearer_token(legacy)
+
+    # A token naming an unknown key is refused
+    forged = jwt.encode(
+        PAYLOAD, get_jwt_private_key(), algorithm="RS256", headers={"kid": "nope"}
+    )
+    try:
+        await verify_bearer_token(forged)
+        raise AssertionError("token with unknown kid accepted")
+    except HTTPException as e:
+        assert e.status_code == 403
+    logger.info(
+        f"middleware: kid {key.kid} ({key.algorithm}) and legacy tokens accepted"
+    )
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory(prefix="jwt_keys_") as directory:
+        benchmark(directory)
+        test_rotation(directory)
+    asyncio.run(test_middleware())
+    logger.info("All JWT key ring checks passed")
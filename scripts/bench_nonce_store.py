@@ -0,0 +1,224 @@
+"""
+Benchmarks the bucketed nonce store against the previous per-DID nonce dict.
+
+- Records nonces at a steady rate through 20 simulated minutes, with the
+  previous dict-of-dicts store (full sweep every 60s on the request path) and
+  with NonceStore, and compares mean and worst per-request cost
+- Checks replays are refused until expiry, the memory cap holds under both
+  overflow policies, and the middleware answers 401 on replays and 503 with
+  Retry-After when the store is full
+- Checks headers with forged signatures are refused before their nonce is
+  recorded, so they cannot fill the store and lock out real agents
+"""
+
+import sys
+import time
+import asyncio
+import logging
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+
+from fastapi import HTTPException
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from agent_connect.authentication import create_did_wba_document, generate_auth_header
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+from api_router.nonce_store import NonceStore, NonceStoreFullError
+from api_router import did_auth_middleware
+from api_router.did_auth_middleware import (
+    NONCE_EXPIRATION_MINUTES,
+    generate_did_auth_token,
+    verify_and_record_nonce,
+)
+
+# Configure logging (keep the middleware's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.CRITICAL)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+AGENTS = 1000
+RATE = 1000  # nonces per simulated second
+MINUTES = 20
+TTL = NONCE_EXPIRATION_MINUTES * 60
+
+
+class LegacyNonces:
+    """The previous USED_NONCES dict with its 60s inline cleanup"""
+
+    def __init__(self, now: datetime):
+        self.used = {}
+        self.last_cleanup = now
+
+    def check_and_record(self, did: str, nonce: str, now: datetime) -> bool:
+        if (now - self.last_cleanup).total_seconds() > 60:
+            for d in list(self.used.keys()):
+                expired = [
+                    n
+                    for n, t in self.used[d].items()
+                    if now - t > timedelta(minutes=NONCE_EXPIRATION_MINUTES)
+                ]
+                for n in expired:
+                    self.used[d].pop(n)
+                if not self.used[d]:
+                    self.used.pop(d)
+            self.last_cleanup = now
+        if d_nonces := self.used.get(did):
+            if nonce in d_nonces:
+                return False
+        self.used.setdefault(did, {})[nonce] = now
+        return True
+
+
+def simulate(name: str, record) -> None:
+    """Feed RATE nonces per simulated second, timing every call"""
+    worst = total = 0.0
+    requests = RATE * 60 * MINUTES
+    for i in range(requests):
+        now = i / RATE
+        start = time.perf_counter()
+        assert record(f"did:wba:localhost:user:agent{i % AGENTS}", f"n{i}", now)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        worst = max(worst, elapsed)
+    logger.info(
+        f"{name:<22} mean {total / requests * 1e6:6.2f} us, "
+        f"worst {worst * 1000:8.2f} ms per request"
+    )
+
+
+def benchmark() -> None:
+    epoch = datetime.now(timezone.utc)
+    legacy = LegacyNonces(epoch)
+    simulate(
+        "dict + 60s sweep",
+        lambda did, nonce, now: legacy.check_and_record(
+            did, nonce, epoch + timedelta(seconds=now)
+        ),
+    )
+
+    clock = [0.0]
+    store = NonceStore(ttl=TTL, max_size=RATE * (TTL + 120), clock=lambda: clock[0])
+
+    def record(did, nonce, now):
+        clock[0] = now
+        return store.check_and_record(did, nonce)
+
+    simulate("bucketed NonceStore", record)
+    logger.info(f"NonceStore after {MINUTES} minutes: {store.stats()}")
+    assert store.stats()["buckets"] <= NONCE_EXPIRATION_MINUTES + 2
+
+
+def test_expiry_and_cap() -> None:
+    clock = [0.0]
+    store = NonceStore(ttl=TTL, max_size=3, clock=lambda: clock[0])
+    assert store.check_and_record("did:a", "1")
+    assert not store.check_and_record("did:a", "1")
+    assert store.check_and_record("did:b", "1")
+
+    # Remembered for at least the TTL, forgotten once its bucket expires
+    clock[0] = TTL - 1
+    assert not store.check_and_record("did:a", "1")
+    clock[0] = TTL + 60
+    assert store.check_and_record("did:a", "1") and len(store) == 1
+
+    # "reject": a full store refuses new nonces and keeps every old one
+    store.check_and_record("did:a", "2")
+    store.check_and_record("did:a", "3")
+    try:
+        store.check_and_record("did:a", "4")
+        raise AssertionError("nonce recorded beyond max_size")
+    except NonceStoreFullError:
+        pass
+    assert len(store) == 3 and not store.check_and_record("did:a", "3")
+
+    # "evict_oldest": the nonce closest to expiry makes room
+    store = NonceStore(
+        ttl=TTL, max_size=3, overflow="evict_oldest", clock=lambda: clock[0]
+    )
+    store.check_and_record("did:a", "old")
+    clock[0] += 60
+    for nonce in ("1", "2", "3"):
+        assert store.check_and_record("did:a", nonce)
+    stats = store.stats()
+    assert stats["size"] == 3 and stats["evicted"] == 1, stats
+    assert store.check_and_record("did:a", "old")
+    logger.info(f"expiry and cap: {stats}")
+
+
+async def test_middleware() -> None:
+    async def status_of(did: str, nonce: str) -> int:
+        try:
+            await verify_and_record_nonce(did, nonce)
+            return 200
+        except HTTPException as e:
+            if e.status_code == 503:
+                assert e.headers["Retry-After"] == "60"
+            return e.status_code
+
+    store = did_auth_middleware.NONCE_STORE
+    assert await status_of("did:wba:localhost:user:alice", "abc") == 200
+    assert await status_of("did:wba:localhost:user:alice", "abc") == 401
+    assert await status_of("did:wba:localhost:user:bob", "abc") == 200
+
+    max_size, store.max_size = store.max_size, len(store)
+    assert await status_of("did:wba:localhost:user:carol", "abc") == 503
+    store.max_size = max_size
+    assert await status_of("did:wba:localhost:user:carol", "abc") == 200
+    logger.info(f"middleware: replay 401, full store 503, {store.stats()}")
+
+
+async def test_forged_signatures() -> None:
+    """Forged headers are refused without taking room in the nonce store"""
+    document, keys = create_did_wba_document(
+        "localhost", path_segments=["user", "mallory"]
+    )
+    private_key = serialization.load_pem_private_key(keys["key-1"][0], None)
+    forged_key = ec.generate_private_key(private_key.curve)
+
+    async def resolve(did: str):
+        return document if did == document["id"] else None
+
+    did_auth_middleware.DID_DOCUMENT_CACHE._resolve = resolve
+
+    def auth_header(key) -> str:
+        return generate_auth_header(
+            document,
+            "localhost",
+            lambda content, _: key.sign(content, ec.ECDSA(hashes.SHA256())),
+        )
+
+    async def status_of(authorization: str) -> int:
+        try:
+            assert await generate_did_auth_token(authorization, "localhost")
+            return 200
+        except HTTPException as e:
+            return e.status_code
+
+    # Room for a single nonce: forged headers must leave it to the real agent
+    store = did_auth_middleware.NONCE_STORE
+    size = len(store)
+    max_size, store.max_size = store.max_size, size + 1
+    forged = [await status_of(auth_header(forged_key)) for _ in range(200)]
+    assert set(forged) == {403} and len(store) == size, store.stats()
+    authorization = auth_header(private_key)
+    assert await status_of(authorization) == 200
+    assert await status_of(authorization) == 401
+    store.max_size = max_size
+    logger.info(f"forged signatures: 200 refused with 403, {store.stats()}")
+
+
+if __name__ == "__main__":
+    benchmark()
+    test_expiry_and_cap()
+    asyncio.run(test_middleware())
+    asyncio.run(test_forged_signatures())
+    logger.info("All nonce store checks passed")
@@ -0,0 +1,80 @@
+"""
+Microbenchmark for answering a cached weather query.
+
+Compares the CPU cost of the previous cache-hit path (return the payload
+dict, which FastAPI runs through jsonable_encoder and JSONResponse) with the
+raw path (return the cached upstream body bytes in a plain Response), and
+checks that both produce the same JSON document.
+"""
+
+import sys
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Callable
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(CURRENT_DIR))
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fake_amap_server import build_weather_payload
+from api_router.weather.weather_cache import WeatherCache
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Number of responses built per implementation
+RESPONSE_COUNT = 20000
+
+
+def measure(name: str, respond: Callable[[], Response]) -> float:
+    """Build RESPONSE_COUNT responses and report CPU time per response"""
+    start = time.process_time()
+    for _ in range(RESPONSE_COUNT):
+        respond()
+    elapsed = time.process_time() - start
+    logger.info(
+        f"{name:<12} {elapsed / RESPONSE_COUNT * 1e6:.2f} us CPU per response "
+        f"-> {RESPONSE_COUNT / elapsed:,.0f} responses/s"
+    )
+    return elapsed
+
+
+def main():
+    payload = build_weather_payload("110000", "all")
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    cache = WeatherCache(max_size=16, max_age=3600, min_ttl=60)
+    cache.set(("110000", "all"), payload, body)
+    key = ("110000", "all")
+
+    def dict_response() -> Response:
+        # What FastAPI does with a returned dict and no response_model
+        return JSONResponse(jsonable_encoder(cache.get(key).payload))
+
+    def raw_response() -> Response:
+        entry = cache.get(key)
+        return Response(content=entry.body, media_type=entry.content_type)
+
+    if json.loads(dict_response().body) != json.loads(raw_response().body):
+        logger.error("Raw and re-encoded responses differ")
+        sys.exit(1)
+
+    dict_elapsed = measure("dict + JSON", dict_response)
+    raw_elapsed = measure("raw bytes", raw_response)
+    logger.info(
+        f"Responses identical, CPU reduction: {dict_elapsed / raw_elapsed:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
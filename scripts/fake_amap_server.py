@@ -0,0 +1,204 @@
+"""
+Local stand-in for the AMAP Weather API, used by the load test scripts.
+
+Serves AMAP-shaped payloads for any adcode and can inject latency (fixed, or
+a slow outlier every N requests), HTTP errors and per-key infocode errors. Run it standalone and point
+AMAP_WEATHER_API_URL at it:
+
+    python scripts/fake_amap_server.py --port 18080 --latency 0.2
+    AMAP_WEATHER_API_URL=http://127.0.0.1:18080/v3/weather/weatherInfo
+"""
+
+import json
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from typing import Dict, Optional
+
+from aiohttp import web
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Path served by the fake server, same as the real AMAP endpoint
+WEATHER_PATH = "/v3/weather/weatherInfo"
+REPORT_TIME = "2025-05-13 11:03:03"
+
+
+def build_weather_payload(adcode: str, extensions: str) -> Dict:
+    """Build an AMAP-shaped payload for adcode"""
+    if extensions == "base":
+        return {
+            "status": "1",
+            "count": "1",
+            "info": "OK",
+            "infocode": "10000",
+            "lives": [
+                {
+                    "province": "测试省",
+                    "city": f"测试市{adcode}",
+                    "adcode": adcode,
+                    "weather": "晴",
+                    "temperature": "20",
+                    "winddirection": "东北",
+                    "windpower": "≤3",
+                    "humidity": "45",
+                    "reporttime": REPORT_TIME,
+                }
+            ],
+        }
+    casts = [
+        {
+            "date": f"2025-05-{13 + day}",
+            "week": str(2 + day),
+            "dayweather": "晴",
+            "nightweather": "多云",
+            "daytemp": str(25 + day),
+            "nighttemp": str(15 + day),
+            "daywind": "东北",
+            "nightwind": "东北",
+            "daypower": "1-3",
+            "nightpower": "1-3",
+        }
+        for day in range(4)
+    ]
+    return {
+        "status": "1",
+        "count": "1",
+        "info": "OK",
+        "infocode": "10000",
+        "forecasts": [
+            {
+                "city": f"测试市{adcode}",
+                "adcode": adcode,
+                "province": "测试省",
+                "reporttime": REPORT_TIME,
+                "casts": casts,
+            }
+        ],
+    }
+
+
+class FakeAmapServer:
+    """
+    In-process fake AMAP server.
+
+    Attributes:
+        latency: Seconds to sleep before answering each request
+        slow_every: Every N-th request sleeps slow_latency instead (0: never)
+        slow_latency: Latency of the slow outlier requests
+        status_code: HTTP status to answer with (200 serves a payload)
+        key_infocodes: Error infocode to answer requests made with a key
+        hits: Number of requests received per adcode
+        key_hits: Number of requests received per key
+        max_in_flight: Most requests being answered at the same time
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        status_code: int = 200,
+        slow_every: int = 0,
+        slow_latency: float = 0.0,
+    ):
+        self.port = port
+        self.latency = latency
+        self.status_code = status_code
+        self.slow_every = slow_every
+        self.slow_latency = slow_latency
+        self.key_infocodes: Dict[str, str] = {}
+        self.requests = 0
+        self.hits: Counter = Counter()
+        self.key_hits: Counter = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}{WEATHER_PATH}"
+
+    @property
+    def total_hits(self) -> int:
+        return sum(self.hits.values())
+
+    async def handle_weather(self, request: web.Request) -> web.Response:
+        adcode = request.query.get("city", "")
+        extensions = request.query.get("extensions", "base")
+        key = request.query.get("key", "")
+        self.hits[adcode] += 1
+        self.key_hits[key] += 1
+        self.requests += 1
+        latency = self.latency
+        if self.slow_every and self.requests % self.slow_every == 0:
+            latency = self.slow_latency
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if latency:
+                await asyncio.sleep(latency)
+        finally:
+            self.in_flight -= 1
+        if self.status_code != 200:
+            return web.Response(status=self.status_code, text="fake upstream error")
+        if key in self.key_infocodes:
+            payload = {
+                "status": "0",
+                "info": "fake key error",
+                "infocode": self.key_infocodes[key],
+            }
+        else:
+            payload = build_weather_payload(adcode, extensions)
+        return web.Response(
+            text=json.dumps(payload, ensure_ascii=False),
+            content_type="application/json",
+        )
+
+    async def start(self) -> "FakeAmapServer":
+        app = web.Application()
+        app.router.add_get(WEATHER_PATH, self.handle_weather)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        await site.start()
+        # Resolve the port when an ephemeral one (0) was requested
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake AMAP server listening on {self.url}")
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fake AMAP Weather API server")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--status-code", type=int, default=200)
+    parser.add_argument("--slow-every", type=int, default=0)
+    parser.add_argument("--slow-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeAmapServer(
+        args.port,
+        args.latency,
+        args.status_code,
+        args.slow_every,
+        args.slow_latency,
+    )
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+Offline load test of the weather stack using the in-process mock provider.
+
+Drives the weather_info_router handler with many concurrent queries while
+the upstream is replaced by MockWeatherProvider, so no network or AMAP quota
+is involved. Reports requests per second and latency percentiles for a
+cache-miss phase (every request goes to the provider) and a cache-hit phase.
+
+    python scripts/load_test_mock_provider.py --requests 20000 --concurrency 200
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+from fastapi import Response
+
+# Select the mock provider and lift the AMAP rate limit before the router loads
+os.environ["WEATHER_PROVIDER"] = "mock"
+os.environ.setdefault("AMAP_RATE_LIMIT_QPS", "0")
+os.environ.setdefault("MOCK_WEATHER_LATENCY_SECONDS", "0.02")
+
+from api_router.weather import weather_info_router
+from api_router.weather.adcode_index import ADCODE_FILE_PATH
+from weather_query import get_weather
+
+# Configure logging (keep the handler's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def percentile(ordered, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_phase(name: str, cities, total_requests: int, concurrency: int) -> None:
+    """Send total_requests queries over cities with bounded concurrency"""
+    latencies = []
+    failures = 0
+    queries = [cities[i % len(cities)] for i in range(total_requests)]
+    next_query = iter(queries)
+
+    async def worker():
+        nonlocal failures
+        for city in next_query:
+            start = time.perf_counter()
+            result = await get_weather(city)
+            latencies.append(time.perf_counter() - start)
+            # Weather data is answered as a raw Response, errors as a dict
+            if not isinstance(result, Response):
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    logger.info(
+        f"{name}: {total_requests} requests in {elapsed:.2f}s = "
+        f"{total_requests / elapsed:.0f} req/s, "
+        f"p50 {percentile(latencies, 0.5) * 1000:.2f}ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.2f}ms, "
+        f"failures {failures}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline weather load test")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--cities", type=int, default=2000)
+    args = parser.parse_args()
+
+    # City names that resolve to distinct adcodes, in adcode file order
+    with open(ADCODE_FILE_PATH, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    adcode_cities = {}
+    for entry in entries:
+        city_name = entry["cityName"]
+        adcode = weather_info_router.ADCODE_INDEX.lookup(city_name)
+        if len(city_name) > 1 and adcode == str(entry["adcode"]):
+            adcode_cities.setdefault(adcode, city_name)
+    cities = list(adcode_cities.values())[: args.cities]
+
+    provider = weather_info_router.WEATHER_PROVIDER
+    logger.info(f"Provider: {provider.stats()}, {len(cities)} cities")
+
+    # Every city is requested once per pass: the first pass misses the cache
+    weather_info_router.WEATHER_CACHE.clear()
+    await run_phase("cache miss", cities, len(cities), args.concurrency)
+    await run_phase("cache hit", cities, args.requests, args.concurrency)
+    logger.info(f"Provider: {provider.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+Concurrent load test for single-flight coalescing of upstream weather fetches.
+
+Starts a local fake AMAP server with injected latency, fires many concurrent
+weather queries through the weather_info_router handler and checks that each
+adcode reaches the upstream exactly once, that cancelled callers do not
+cancel the shared fetch, and that upstream errors reach every waiter.
+"""
+
+import os
+import sys
+import asyncio
+import logging
+from pathlib import Path
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(CURRENT_DIR))
+
+from fake_amap_server import FakeAmapServer
+from weather_query import query_weather
+
+# Point the weather router at the fake server before it reads the config
+FAKE_AMAP_PORT = int(os.environ.get("FAKE_AMAP_PORT", "18081"))
+os.environ["AMAP_WEATHER_API_URL"] = (
+    f"http://127.0.0.1:{FAKE_AMAP_PORT}/v3/weather/weatherInfo"
+)
+
+from api_router.weather import weather_info_router
+from utils.http_client import close_http_session
+from utils.single_flight import SingleFlight
+
+# Configure logging (keep the handler's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CITIES = ["北京市", "上海市", "广州市", "深圳市", "杭州市"]
+REQUESTS_PER_CITY = 200
+UPSTREAM_LATENCY = 0.2
+
+
+def reset_state(server: FakeAmapServer) -> None:
+    weather_info_router.WEATHER_CACHE.clear()
+    server.hits.clear()
+
+
+async def test_coalescing(server: FakeAmapServer) -> None:
+    """Every adcode must reach the upstream once under concurrent load"""
+    reset_state(server)
+    queries = [city for city in CITIES for _ in range(REQUESTS_PER_CITY)]
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    results = await asyncio.gather(*(query_weather(city) for city in queries))
+    elapsed = loop.time() - start
+
+    assert all(
+        weather_data["status"] == "1" for weather_data, _ in results
+    ), "failed responses"
+    assert server.total_hits == len(CITIES), f"upstream hits: {dict(server.hits)}"
+    assert all(count == 1 for count in server.hits.values()), dict(server.hits)
+    logger.info(
+        f"coalescing: {len(queries)} concurrent requests, "
+        f"{server.total_hits} upstream calls, {elapsed:.3f}s"
+    )
+
+
+async def test_cancellation(server: FakeAmapServer) -> None:
+    """Cancelling some waiters must not cancel the shared fetch"""
+    reset_state(server)
+    tasks = [asyncio.ensure_future(query_weather("北京市")) for _ in range(100)]
+    await asyncio.sleep(UPSTREAM_LATENCY / 4)
+    for task in tasks[:50]:
+        task.cancel()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    cancelled = [r for r in results if isinstance(r, asyncio.CancelledError)]
+    completed = [r[0] for r in results if isinstance(r, tuple)]
+
+    assert len(cancelled) == 50, f"cancelled: {len(cancelled)}"
+    assert len(completed) == 50, f"completed: {len(completed)}"
+    assert all(result["status"] == "1" for result in completed)
+    assert server.total_hits == 1, f"upstream hits: {dict(server.hits)}"
+    assert weather_info_router.WEATHER_CACHE.get(("110000", "all")) is not None
+    logger.info("cancellation: 50 cancelled, 50 served by one upstream call")
+
+
+async def test_error_propagation() -> None:
+    """An upstream exception must reach every waiter and release the key"""
+    flights = SingleFlight()
+    calls = 0
+
+    async def failing_fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise ConnectionError("upstream unreachable")
+
+    results = await asyncio.gather(
+        *(flights.do("key", failing_fetch) for _ in range(50)),
+        return_exceptions=True,
+    )
+    assert calls == 1, f"calls: {calls}"
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert flights.in_flight() == 0
+
+    # The next call after a failure starts a fresh fetch
+    await asyncio.gather(flights.do("key", failing_fetch), return_exceptions=True)
+    assert calls == 2, f"calls: {calls}"
+    logger.info("error propagation: 50 waiters received the shared exception")
+
+
+async def main():
+    server = FakeAmapServer(port=FAKE_AMAP_PORT, latency=UPSTREAM_LATENCY)
+    await server.start()
+    try:
+        await test_coalescing(server)
+        await test_cancellation(server)
+        await test_error_propagation()
+        logger.info(
+            f"single flight stats: {weather_info_router.UPSTREAM_FLIGHTS.stats()}"
+        )
+    finally:
+        await close_http_session()
+        await server.stop()
+    logger.info("All single-flight tests passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
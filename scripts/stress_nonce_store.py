@@ -0,0 +1,241 @@
+"""
+Multi-process replay stress test for the nonce stores.
+
+Starts several worker processes, each importing the DID auth middleware as a
+uvicorn worker would, and has all of them submit the same set of DIDwba
+nonces (in a different order each) through verify_and_record_nonce at full
+speed. Every nonce must be accepted exactly once across all workers:
+
+- with the in-process "memory" backend each worker accepts every nonce once,
+  which shows the replays multi-worker deployments let through
+- with the shared "sqlite" backend there must be zero duplicate acceptances
+
+It also checks SQLite expiry (expired rows are reusable before and after the
+batched sweep), that a locked database refuses nonces instead of accepting
+them unchecked without stalling the event loop, and that an unknown backend
+name stops the worker at startup.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+import sqlite3
+import tempfile
+import subprocess
+import multiprocessing
+from pathlib import Path
+from collections import Counter
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def worker(worker_id, backend, path, nonces, barrier, results) -> None:
+    """Submit every nonce once, in a worker-specific order"""
+    # Environment must be set before the middleware reads the config
+    os.environ["NONCE_STORE_BACKEND"] = backend
+    os.environ["NONCE_STORE_SQLITE_PATH"] = path
+    os.environ["NONCE_STORE_MAX_SIZE"] = str(len(nonces) * 2)
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    from fastapi import HTTPException
+    from api_router.did_auth_middleware import verify_and_record_nonce
+
+    order = list(nonces)
+    random.Random(worker_id).shuffle(order)
+
+    async def run():
+        accepted, statuses = [], Counter()
+        for did, nonce in order:
+            try:
+                await verify_and_record_nonce(did, nonce)
+                accepted.append(f"{did} {nonce}")
+                statuses[200] += 1
+            except HTTPException as e:
+                statuses[e.status_code] += 1
+        return accepted, statuses
+
+    barrier.wait()
+    start = time.perf_counter()
+    accepted, statuses = asyncio.run(run())
+    results.put((worker_id, accepted, dict(statuses), time.perf_counter() - start))
+
+
+def stress(backend: str, workers: int, nonces_count: int, dids: int) -> int:
+    """
+    Run the workers against one backend
+
+    Returns:
+        int: Number of duplicate acceptances
+    """
+    nonces = [
+        (f"did:wba:localhost:user:agent{i % dids}", f"nonce-{i:08d}")
+        for i in range(nonces_count)
+    ]
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+
+    with tempfile.TemporaryDirectory(prefix="nonce_store_") as directory:
+        path = os.path.join(directory, "nonces.sqlite3")
+        processes = [
+            ctx.Process(
+                target=worker, args=(i, backend, path, nonces, barrier, results)
+            )
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        start = time.perf_counter()
+        outcomes = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+
+    accepted = Counter()
+    statuses = Counter()
+    for _, worker_accepted, worker_statuses, _ in outcomes:
+        accepted.update(worker_accepted)
+        statuses.update(worker_statuses)
+    duplicates = sum(count - 1 for count in accepted.values())
+    attempts = workers * nonces_count
+    logger.info(
+        f"{backend:<6} {workers} workers, {attempts} attempts in {elapsed:.2f}s "
+        f"({attempts / elapsed:,.0f}/s): {len(accepted)} nonces accepted, "
+        f"{duplicates} duplicate acceptances, statuses {dict(statuses)}"
+    )
+    assert len(accepted) == nonces_count, "some nonces were never accepted"
+    return duplicates
+
+
+async def test_expiry_and_lock() -> None:
+    from api_router.nonce_store import NonceStoreError
+    from api_router.sqlite_nonce_store import SQLiteNonceStore
+
+    with tempfile.TemporaryDirectory(prefix="nonce_store_") as directory:
+        path = os.path.join(directory, "nonces.sqlite3")
+        clock = [0.0]
+        store = SQLiteNonceStore(path, ttl=360, sweep_batch=2, clock=lambda: clock[0])
+        for nonce in ("1", "2", "3", "4", "5"):
+            assert await store.check_and_record("did:a", nonce)
+        assert not await store.check_and_record("did:a", "1")
+
+        # Expired but not yet swept rows do not count as replays; the sweep
+        # then deletes the other expired rows in batches of sweep_batch
+        clock[0] = 359
+        assert not await store.check_and_record("did:a", "2")
+        clock[0] = 360
+        assert await store.check_and_record("did:a", "2")
+        assert await store.sweep() == 4
+        stats = store.stats()
+        assert stats["size"] == 1 and stats["expired"] == 4, stats
+        await store.stop()
+
+        # A write lock held past busy_timeout refuses the nonce, and the
+        # event loop keeps running while the store waits for the lock
+        store = SQLiteNonceStore(path, ttl=360, busy_timeout=1.0)
+        locker = sqlite3.connect(path, isolation_level=None)
+        locker.execute("BEGIN EXCLUSIVE")
+        ticks = []
+
+        async def heartbeat():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(heartbeat())
+        start = time.perf_counter()
+        try:
+            await store.check_and_record("did:a", "6")
+            raise AssertionError("nonce accepted while the database was locked")
+        except NonceStoreError:
+            pass
+        waited = time.perf_counter() - start
+        ticker.cancel()
+        locker.execute("ROLLBACK")
+        assert await store.check_and_record("did:a", "6")
+        locker.close()
+        await store.stop()
+
+    worst_gap = max(b - a for a, b in zip(ticks, ticks[1:]))
+    assert waited >= 0.9, f"refused after {waited:.2f}s"
+    assert worst_gap < 0.1, "the event loop stalled on the database lock"
+    logger.info(
+        f"sqlite: expiry and batched sweep checked, locked database refused the "
+        f"nonce after {waited * 1000:.0f} ms, worst event loop gap "
+        f"{worst_gap * 1000:.1f} ms"
+    )
+
+
+async def check_middleware_errors() -> None:
+    """A locked database answers 503 "unavailable"; unknown backends do not start"""
+    with tempfile.TemporaryDirectory(prefix="nonce_store_") as directory:
+        path = os.path.join(directory, "nonces.sqlite3")
+        os.environ["NONCE_STORE_BACKEND"] = "sqlite"
+        os.environ["NONCE_STORE_SQLITE_PATH"] = path
+        logging.getLogger().setLevel(logging.CRITICAL)
+        logger.setLevel(logging.INFO)
+
+        from fastapi import HTTPException
+        from api_router import did_auth_middleware
+
+        await did_auth_middleware.NONCE_STORE._run_in_thread(
+            did_auth_middleware.NONCE_STORE._conn.execute, "PRAGMA busy_timeout=100"
+        )
+        locker = sqlite3.connect(path, isolation_level=None)
+        locker.execute("BEGIN EXCLUSIVE")
+        try:
+            await did_auth_middleware.verify_and_record_nonce("did:a", "1")
+            raise AssertionError("nonce accepted while the database was locked")
+        except HTTPException as e:
+            assert e.status_code == 503 and "unavailable" in e.detail, e.detail
+            assert e.headers["Retry-After"] == "1"
+        locker.execute("ROLLBACK")
+        locker.close()
+        await did_auth_middleware.NONCE_STORE.stop()
+
+    result = subprocess.run(
+        [sys.executable, "-c", "import api_router.did_auth_middleware"],
+        cwd=BASE_DIR,
+        env={**os.environ, "NONCE_STORE_BACKEND": "shared"},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode != 0
+    assert "Unknown nonce store backend: shared" in result.stderr, result.stderr
+    logger.info("middleware: locked database 503, unknown backend refused")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--nonces", type=int, default=20000)
+    parser.add_argument("--dids", type=int, default=100)
+    args = parser.parse_args()
+
+    asyncio.run(test_expiry_and_lock())
+    asyncio.run(check_middleware_errors())
+
+    memory_duplicates = stress("memory", args.workers, args.nonces, args.dids)
+    assert memory_duplicates == (args.workers - 1) * args.nonces
+    sqlite_duplicates = stress("sqlite", args.workers, args.nonces, args.dids)
+    assert sqlite_duplicates == 0, f"{sqlite_duplicates} replays accepted"
+    logger.info("All nonce store stress checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Resilience test for the AMAP circuit breaker and hedged requests.
+
+Runs the weather_info_router upstream path against a local fake AMAP server
+that injects latency outliers and HTTP errors, and checks that:
+- hedging sends a second request after the p95 delay and returns early
+- when the upstream slows down, the p95 counts the slow primaries a hedge
+  cut short, so hedges settle to a small fraction of calls
+- the circuit opens after consecutive failures, fails fast without reaching
+  the upstream, serves cached data while open and closes after recovery
+"""
+
+import os
+import sys
+import asyncio
+import logging
+from pathlib import Path
+from typing import Tuple
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(CURRENT_DIR))
+
+from fake_amap_server import FakeAmapServer
+from weather_query import query_weather
+
+# Point the weather router at the fake server before it reads the config
+FAKE_AMAP_PORT = int(os.environ.get("FAKE_AMAP_PORT", "18082"))
+os.environ["AMAP_WEATHER_API_URL"] = (
+    f"http://127.0.0.1:{FAKE_AMAP_PORT}/v3/weather/weatherInfo"
+)
+
+from api_router.weather import weather_info_router
+from utils.circuit_breaker import STATE_CLOSED, STATE_OPEN
+from utils.hedging import LatencyTracker
+from utils.http_client import close_http_session
+
+# Configure logging (keep the handler's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+FAST_LATENCY = 0.02
+SLOW_LATENCY = 1.0
+
+
+async def test_hedging(server: FakeAmapServer) -> None:
+    """A slow outlier must be cut short by the hedge request"""
+    hedger = weather_info_router.AMAP_HEDGER
+    hedger.enabled = True
+    server.latency = FAST_LATENCY
+
+    # Warm up the latency window with fast calls
+    for i in range(hedger.latencies.min_samples):
+        await weather_info_router.fetch_weather_from_provider(str(100000 + i), "all")
+    delay = hedger.hedge_delay()
+
+    # The next request is the slow outlier; the hedge should answer first
+    server.slow_every = 1
+    server.slow_latency = SLOW_LATENCY
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    fetch = asyncio.ensure_future(
+        weather_info_router.fetch_weather_from_provider("110000", "all")
+    )
+    # Only the first attempt is slow, the hedge sent after the delay is not
+    await asyncio.sleep(delay / 2)
+    server.slow_every = 0
+    upstream = await fetch
+    elapsed = loop.time() - start
+
+    assert upstream.payload["status"] == "1", upstream
+    assert hedger.hedges_sent == 1, hedger.stats()
+    assert hedger.hedge_wins == 1, hedger.stats()
+    assert elapsed < SLOW_LATENCY / 2, f"hedged fetch took {elapsed:.3f}s"
+    logger.info(
+        f"hedging: hedge delay {delay * 1000:.1f} ms, "
+        f"slow outlier answered in {elapsed * 1000:.1f} ms"
+    )
+    hedger.enabled = False
+
+
+async def test_hedge_rate(server: FakeAmapServer) -> None:
+    """After the upstream slows down, hedges must settle to a small fraction"""
+    hedger = weather_info_router.AMAP_HEDGER
+    hedger.enabled = True
+    hedger.latencies = LatencyTracker()
+    min_delay, hedger.min_delay = hedger.min_delay, 0.001
+    limiter = weather_info_router.AMAP_RATE_LIMITER
+    rate, limiter.rate = limiter.rate, 0
+
+    async def fetch_many(count: int) -> Tuple[int, int]:
+        calls, hedges_sent = hedger.calls, hedger.hedges_sent
+        for i in range(count):
+            await weather_info_router.fetch_weather_from_provider(
+                str(100000 + i), "all"
+            )
+        return hedger.calls - calls, hedger.hedges_sent - hedges_sent
+
+    # A healthy upstream fills the 200-sample window with fast calls, then one
+    # request in seven turns slow: the slow primaries a hedge cuts short must
+    # still raise the p95 to the slow latency
+    server.latency = 0.005
+    await fetch_many(200)
+    server.slow_every = 7
+    server.slow_latency = 0.06
+    await fetch_many(400)
+    calls, hedges_sent = await fetch_many(300)
+
+    hedge_rate = hedges_sent / calls
+    assert hedger.hedge_delay() >= 0.05, hedger.stats()
+    assert hedge_rate <= 0.05, f"{hedges_sent} hedges for {calls} calls"
+    logger.info(
+        f"hedge rate: {hedges_sent} hedges for {calls} calls ({hedge_rate:.1%}) "
+        f"once settled, hedge delay {hedger.hedge_delay() * 1000:.1f} ms"
+    )
+    server.latency = FAST_LATENCY
+    server.slow_every = 0
+    limiter.rate = rate
+    hedger.min_delay = min_delay
+    hedger.enabled = False
+
+
+async def test_circuit_breaker(server: FakeAmapServer) -> None:
+    """The circuit must open, fail fast, serve cache and recover"""
+    breaker = weather_info_router.AMAP_CIRCUIT_BREAKER
+    breaker.recovery_timeout = 0.5
+    cache = weather_info_router.WEATHER_CACHE
+    cache.clear()
+
+    # Cache Beijing while the upstream is healthy
+    weather_data, _ = await query_weather("北京市")
+    assert weather_data["status"] == "1"
+    # Make the cached entry too old to be served normally
+    cache.peek(("110000", "all")).expires_at = 0
+
+    # Upstream starts failing
+    server.status_code = 500
+    for _ in range(breaker.failure_threshold):
+        result = await weather_info_router.fetch_weather_from_provider("310000", "all")
+        assert result["infocode"] == "10002", result
+    assert breaker.state == STATE_OPEN, breaker.stats()
+
+    # While open: no upstream traffic, cached city still served, others fail fast
+    hits_before = server.total_hits
+    cached, cache_state = await query_weather("北京市")
+    uncached, _ = await query_weather("上海市")
+    assert cached["status"] == "1", cached
+    assert cache_state == "stale"
+    assert uncached["status"] == "0", uncached
+    assert server.total_hits == hits_before, "open circuit reached the upstream"
+    logger.info("circuit breaker: opened, served cache and failed fast")
+
+    # After the recovery timeout one probe goes through and closes the circuit
+    server.status_code = 200
+    await asyncio.sleep(breaker.recovery_timeout)
+    result, _ = await query_weather("上海市")
+    assert result["status"] == "1", result
+    assert breaker.state == STATE_CLOSED, breaker.stats()
+    logger.info(f"circuit breaker: recovered, stats {breaker.stats()}")
+
+
+async def main():
+    server = FakeAmapServer(port=FAKE_AMAP_PORT)
+    await server.start()
+    try:
+        await test_hedging(server)
+        await test_hedge_rate(server)
+        await test_circuit_breaker(server)
+    finally:
+        await close_http_session()
+        await server.stop()
+    logger.info("All circuit breaker and hedging tests passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,271 @@
+"""
+Checks the DID document cache against a local stand-in DID host.
+
+Serves DIDwba documents over HTTPS from 127.0.0.1 with a self-signed
+certificate for "localhost" (trusted through SSL_CERT_FILE), so the real
+agent_connect resolver and the middleware's generate_did_auth_token run
+unchanged, and checks that:
+- repeated authentications of a DID resolve its document once per TTL
+- concurrent resolutions of one DID are coalesced into one request
+- failed resolutions are cached for the negative TTL
+- a signature made with rotated keys triggers one re-resolution
+- forged signatures re-resolve a cached document at most once per refresh
+  interval, and a failing DID host keeps the cached document
+- the cache never holds more than its maximum size
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import datetime
+import tempfile
+import ipaddress
+from pathlib import Path
+from typing import Any, Dict
+
+from fastapi import HTTPException
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+CERT_DIR = tempfile.mkdtemp(prefix="did_host_")
+CERT_PATH = os.path.join(CERT_DIR, "cert.pem")
+KEY_PATH = os.path.join(CERT_DIR, "key.pem")
+HOST_LATENCY = 0.05
+
+
+def write_self_signed_cert() -> None:
+    """Write a self-signed certificate for localhost / 127.0.0.1"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName(
+                [
+                    x509.DNSName("localhost"),
+                    x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+                ]
+            ),
+            critical=False,
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    with open(CERT_PATH, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(KEY_PATH, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+
+
+# The resolver verifies TLS with the default trust store: trust the stand-in
+# host's certificate before aiohttp builds its default SSL context
+write_self_signed_cert()
+os.environ["SSL_CERT_FILE"] = CERT_PATH
+os.environ["DID_DOCUMENT_CACHE_TTL_SECONDS"] = "300"
+os.environ["DID_DOCUMENT_CACHE_NEGATIVE_TTL_SECONDS"] = "30"
+
+import ssl
+from aiohttp import web
+from collections import Counter
+from agent_connect.authentication import create_did_wba_document, generate_auth_header
+
+from api_router.did_auth_middleware import DID_DOCUMENT_CACHE, generate_did_auth_token
+
+# Configure logging (keep the middleware's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.CRITICAL)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SERVICE_DOMAIN = "localhost"
+
+
+class StandInDIDHost:
+    """HTTPS host serving /<path>/did.json documents, counting requests per path"""
+
+    def __init__(self):
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.hits: Counter = Counter()
+        self.port = 0
+        self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.hits[request.path] += 1
+        await asyncio.sleep(HOST_LATENCY)
+        document = self.documents.get(request.path)
+        if document is None:
+            return web.Response(status=404, text="not found")
+        return web.json_response(document)
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(CERT_PATH, KEY_PATH)
+        site = web.TCPSite(self._runner, "127.0.0.1", 0, ssl_context=context)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+    def create_agent(self, name: str):
+        """Publish a new DID document for name, returning it and its signer"""
+        document, keys = create_did_wba_document(
+            SERVICE_DOMAIN, port=self.port, path_segments=["user", name]
+        )
+        self.documents[f"/user/{name}/did.json"] = document
+        private_key = serialization.load_pem_private_key(keys["key-1"][0], None)
+
+        def auth_header() -> str:
+            return generate_auth_header(
+                document,
+                SERVICE_DOMAIN,
+                lambda content, _: private_key.sign(content, ec.ECDSA(hashes.SHA256())),
+            )
+
+        return document["id"], auth_header
+
+    @property
+    def total_hits(self) -> int:
+        return sum(self.hits.values())
+
+
+async def expect_forbidden(authorization: str) -> None:
+    try:
+        await generate_did_auth_token(authorization, SERVICE_DOMAIN)
+    except HTTPException as e:
+        assert e.status_code == 403, e.detail
+        return
+    raise AssertionError("forged signature accepted")
+
+
+async def main():
+    host = StandInDIDHost()
+    await host.start()
+    try:
+        did, auth_header = host.create_agent("alice")
+
+        # Repeated authentications resolve the document once
+        start = time.perf_counter()
+        assert await generate_did_auth_token(auth_header(), SERVICE_DOMAIN)
+        cold_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for _ in range(20):
+            assert await generate_did_auth_token(auth_header(), SERVICE_DOMAIN)
+        warm_ms = (time.perf_counter() - start) * 1000 / 20
+        assert host.total_hits == 1, host.hits
+        logger.info(
+            f"cache: 21 authentications, 1 DID host request; "
+            f"{cold_ms:.1f} ms cold, {warm_ms:.1f} ms cached per token"
+        )
+
+        # Concurrent resolutions of one DID share a single request
+        DID_DOCUMENT_CACHE.clear()
+        documents = await asyncio.gather(
+            *(DID_DOCUMENT_CACHE.resolve(did) for _ in range(100))
+        )
+        assert all(document["id"] == did for document in documents)
+        assert host.total_hits == 2, host.hits
+        logger.info("single flight: 100 concurrent resolutions, 1 DID host request")
+
+        # Failed resolutions are cached for the negative TTL
+        missing = did.replace("alice", "nobody")
+        DID_DOCUMENT_CACHE.negative_ttl = 0.3
+        for _ in range(10):
+            assert await DID_DOCUMENT_CACHE.resolve(missing) is None
+        assert host.hits["/user/nobody/did.json"] == 1, host.hits
+        await asyncio.sleep(0.3)
+        assert await DID_DOCUMENT_CACHE.resolve(missing) is None
+        assert host.hits["/user/nobody/did.json"] == 2, host.hits
+        assert missing not in DID_DOCUMENT_CACHE
+        logger.info("negative cache: 11 failed resolutions, 2 DID host requests")
+
+        # Documents expire after the TTL
+        DID_DOCUMENT_CACHE.ttl = 0.3
+        DID_DOCUMENT_CACHE.clear()
+        await DID_DOCUMENT_CACHE.resolve(did)
+        await DID_DOCUMENT_CACHE.resolve(did)
+        await asyncio.sleep(0.3)
+        await DID_DOCUMENT_CACHE.resolve(did)
+        assert host.hits["/user/alice/did.json"] == 4, host.hits
+        DID_DOCUMENT_CACHE.ttl = 300
+        logger.info("ttl: expired document resolved again")
+
+        # Rotated keys: the stale cached document fails once, then is re-resolved
+        DID_DOCUMENT_CACHE.min_refresh_interval = 0.3
+        DID_DOCUMENT_CACHE.clear()
+        await DID_DOCUMENT_CACHE.resolve(did)
+        await asyncio.sleep(0.3)
+        hits_before = host.total_hits
+        rotated_did, rotated_header = host.create_agent("alice")
+        assert rotated_did == did
+        assert await generate_did_auth_token(rotated_header(), SERVICE_DOMAIN)
+        assert host.total_hits == hits_before + 1, host.hits
+        assert DID_DOCUMENT_CACHE.refreshes == 1, DID_DOCUMENT_CACHE.stats()
+        assert await generate_did_auth_token(rotated_header(), SERVICE_DOMAIN)
+        assert host.total_hits == hits_before + 1, host.hits
+        logger.info("rotation: new keys accepted after one re-resolution")
+
+        # Forged signatures (the old keys) cannot make the cache hammer the DID host
+        hits_before = host.total_hits
+        for _ in range(100):
+            await expect_forbidden(auth_header())
+        assert host.total_hits == hits_before, host.hits
+
+        # ... nor replace the document when the DID host fails
+        await asyncio.sleep(0.3)
+        rotated_document = host.documents.pop("/user/alice/did.json")
+        for _ in range(100):
+            await expect_forbidden(auth_header())
+        assert host.total_hits == hits_before + 1, host.hits
+        assert DID_DOCUMENT_CACHE.refresh_failures == 1, DID_DOCUMENT_CACHE.stats()
+        assert await generate_did_auth_token(rotated_header(), SERVICE_DOMAIN)
+        host.documents["/user/alice/did.json"] = rotated_document
+        logger.info(
+            "forged: 200 bad signatures, 1 DID host request, "
+            "cached document kept when the host failed"
+        )
+
+        # The cache is bounded
+        DID_DOCUMENT_CACHE.max_size = 5
+        dids = [host.create_agent(f"agent{i}")[0] for i in range(10)]
+        for agent_did in dids:
+            await DID_DOCUMENT_CACHE.resolve(agent_did)
+        assert len(DID_DOCUMENT_CACHE) == 5, DID_DOCUMENT_CACHE.stats()
+        assert dids[-1] in DID_DOCUMENT_CACHE and dids[0] not in DID_DOCUMENT_CACHE
+        logger.info(f"bounded: {DID_DOCUMENT_CACHE.stats()}")
+    finally:
+        await host.stop()
+    logger.info("All DID document cache tests passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
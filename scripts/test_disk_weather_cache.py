@@ -0,0 +1,147 @@
+"""
+Checks that the SQLite weather cache is shared across worker processes.
+
+Each worker is a separate Python process using the mock weather provider and
+the same disk cache file. The first worker fetches every city from the
+provider; the following workers, like uvicorn workers started later or after
+a restart, must answer from the disk cache without calling the provider.
+Finally the sweep must remove rows expired beyond the retention period, and
+a write lock held by another worker must not stall the event loop.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import sqlite3
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+CITIES = ["北京市", "上海市", "广州市", "深圳市", "杭州市"]
+
+
+def run_worker(db_path: str, results) -> None:
+    """Query every city in a fresh process and report provider calls"""
+    os.environ["WEATHER_PROVIDER"] = "mock"
+    os.environ["MOCK_WEATHER_LATENCY_SECONDS"] = "0"
+    os.environ["WEATHER_DISK_CACHE_ENABLED"] = "true"
+    os.environ["WEATHER_DISK_CACHE_PATH"] = db_path
+
+    from api_router.weather import weather_info_router
+    from weather_query import query
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    async def query_all():
+        states = []
+        for city in CITIES:
+            result = await query(city)
+            states.append(result.headers.get("X-Weather-Cache"))
+        return states
+
+    states = asyncio.run(query_all())
+    results.put((weather_info_router.WEATHER_PROVIDER.stats()["requests"], states))
+
+
+def start_worker(db_path: str):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_worker, args=(db_path, results))
+    process.start()
+    provider_calls, states = results.get(timeout=60)
+    process.join()
+    assert process.exitcode == 0, f"worker exited with {process.exitcode}"
+    return provider_calls, states
+
+
+async def check_sweep(db_path: str) -> None:
+    from api_router.weather.disk_weather_cache import DiskWeatherCache
+
+    # Pretend a day has passed: every row is past expiry plus retention
+    disk_cache = DiskWeatherCache(
+        db_path, retention=60, sweep_interval=0.05, clock=lambda: 2**40
+    )
+    assert await disk_cache.count() == len(CITIES)
+    disk_cache.start()
+    await asyncio.sleep(0.2)
+    assert disk_cache.swept == len(CITIES), disk_cache.stats()
+    assert await disk_cache.count() == 0 and disk_cache.stats()["size"] == 0
+    await disk_cache.stop()
+
+
+async def check_lock_wait(db_path: str) -> None:
+    """Another worker holds the write lock: the write waits, the loop does not"""
+    from api_router.weather.disk_weather_cache import DiskWeatherCache
+    from api_router.weather.weather_cache import CacheEntry
+
+    disk_cache = DiskWeatherCache(
+        db_path, retention=60, sweep_interval=600, busy_timeout=1.0
+    )
+    locker = sqlite3.connect(db_path, isolation_level=None)
+    locker.execute("BEGIN IMMEDIATE")
+
+    ticks = []
+
+    async def heartbeat():
+        while True:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.ensure_future(heartbeat())
+    now = time.time()
+    entry = CacheEntry(
+        body=b"{}", fetched_at=now, expires_at=now + 60, report_time=None
+    )
+    start = time.perf_counter()
+    await disk_cache.set(("110000", "all"), entry)
+    waited = time.perf_counter() - start
+    ticker.cancel()
+    locker.execute("ROLLBACK")
+    locker.close()
+    await disk_cache.stop()
+
+    worst_gap = max(b - a for a, b in zip(ticks, ticks[1:]))
+    logger.info(
+        f"lock wait: write waited {waited * 1000:.0f} ms for the lock, "
+        f"worst event loop gap {worst_gap * 1000:.1f} ms"
+    )
+    assert waited >= 0.9 and disk_cache.errors == 1, disk_cache.stats()
+    assert worst_gap < 0.1, "the event loop stalled on the database lock"
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "weather_cache.sqlite3")
+
+        provider_calls, states = start_worker(db_path)
+        logger.info(f"first worker: {provider_calls} provider calls, {states}")
+        assert provider_calls == len(CITIES)
+
+        for worker in range(2, 4):
+            provider_calls, states = start_worker(db_path)
+            logger.info(f"worker {worker}: {provider_calls} provider calls, {states}")
+            assert provider_calls == 0, "worker did not use the shared disk cache"
+            assert states == ["fresh"] * len(CITIES)
+
+        asyncio.run(check_sweep(db_path))
+        logger.info("sweep removed every expired row")
+        asyncio.run(check_lock_wait(db_path))
+
+    logger.info("All disk weather cache tests passed")
+
+
+if __name__ == "__main__":
+    main()
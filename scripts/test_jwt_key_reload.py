@@ -0,0 +1,169 @@
+"""
+Checks parsed JWT keys and their hot reload, and benchmarks token signing.
+
+- Compares RS256 sign/verify per token with the PEM read and parsed on every
+  call (previous behavior) and with the key objects parsed once
+- Rotates the key files of a JWTKeyStore: no file access between checks, a
+  half-written rotation (public key only) keeps the old pair, and the new
+  pair is swapped in once both files match
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+from config import JWT_PRIVATE_KEY_PATH, JWT_PUBLIC_KEY_PATH
+from api_router.jwt_config import JWTKeyStore, get_jwt_private_key, get_jwt_public_key
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.CRITICAL)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ROUNDS = 50
+PAYLOAD = {"sub": "did:wba:localhost:user:alice", "exp": int(time.time()) + 300}
+
+
+def read_pem(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+def bench(name: str, fn) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    per_call = (time.perf_counter() - start) / ROUNDS * 1000
+    logger.info(f"{name:<28} {per_call:8.3f} ms per token")
+    return per_call
+
+
+def benchmark() -> None:
+    token = jwt.encode(PAYLOAD, get_jwt_private_key(), algorithm="RS256")
+
+    pem_sign = bench(
+        "sign, PEM read per call",
+        lambda: jwt.encode(PAYLOAD, read_pem(JWT_PRIVATE_KEY_PATH), algorithm="RS256"),
+    )
+    key_sign = bench(
+        "sign, parsed key",
+        lambda: jwt.encode(PAYLOAD, get_jwt_private_key(), algorithm="RS256"),
+    )
+    pem_verify = bench(
+        "verify, PEM read per call",
+        lambda: jwt.decode(token, read_pem(JWT_PUBLIC_KEY_PATH), algorithms=["RS256"]),
+    )
+    key_verify = bench(
+        "verify, parsed key",
+        lambda: jwt.decode(token, get_jwt_public_key(), algorithms=["RS256"]),
+    )
+    logger.info(
+        f"speedup: sign {pem_sign / key_sign:.1f}x, verify {pem_verify / key_verify:.1f}x"
+    )
+
+
+def write_key_pair(directory: str, mtime: float, public_only: bool = False):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_path = os.path.join(directory, "public_key.pem")
+    with open(public_path, "wb") as f:
+        f.write(
+            key.public_key().public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+        )
+    os.utime(public_path, (mtime, mtime))
+    if public_only:
+        return key
+    private_path = os.path.join(directory, "private_key.pem")
+    with open(private_path, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+    os.utime(private_path, (mtime, mtime))
+    return key
+
+
+def test_rotation() -> None:
+    directory = tempfile.mkdtemp(prefix="jwt_keys_")
+    try:
+        shutil.copy(JWT_PRIVATE_KEY_PATH, os.path.join(directory, "private_key.pem"))
+        shutil.copy(JWT_PUBLIC_KEY_PATH, os.path.join(directory, "public_key.pem"))
+        now = [0.0]
+        store = JWTKeyStore(
+            os.path.join(directory, "private_key.pem"),
+            os.path.join(directory, "public_key.pem"),
+            check_interval=10,
+            clock=lambda: now[0],
+        )
+        old_keys = store.keys()
+        old_token = jwt.encode(PAYLOAD, old_keys.private_key, algorithm="RS256")
+
+        # Between checks, key access touches no file at all
+        with mock.patch("os.stat", wraps=os.stat) as stat, mock.patch(
+            "builtins.open", wraps=open
+        ) as opened:
+            for _ in range(10000):
+                store.keys()
+            assert stat.call_count == 0 and opened.call_count == 0
+        logger.info("rotation: 10000 key accesses without file I/O")
+
+        # Rotation caught halfway: the public key no longer matches, keep the old pair
+        write_key_pair(directory, time.time() + 100, public_only=True)
+        now[0] += 10
+        assert store.keys() is old_keys
+        assert store.reload_failures == 1, store.stats()
+
+        # Both files rotated: the new pair is swapped in on the next check
+        new_key = write_key_pair(directory, time.time() + 200)
+        now[0] += 10
+        new_keys = store.keys()
+        assert new_keys is not old_keys, store.stats()
+        assert store.reloads == 2, store.stats()
+        token = jwt.encode(PAYLOAD, new_keys.private_key, algorithm="RS256")
+        jwt.decode(token, new_key.public_key(), algorithms=["RS256"])
+        jwt.decode(token, new_keys.public_key, algorithms=["RS256"])
+        try:
+            jwt.decode(old_token, new_keys.public_key, algorithms=["RS256"])
+            raise AssertionError("token of the old key verified with the new key")
+        except jwt.InvalidSignatureError:
+            pass
+
+        # Unchanged files are not parsed again
+        now[0] += 10
+        assert store.keys() is new_keys
+        assert store.reloads == 2, store.stats()
+        logger.info(
+            f"rotation: half-written rotation ignored, new pair loaded, {store.stats()}"
+        )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    benchmark()
+    test_rotation()
+    logger.info("All JWT key tests passed")
@@ -0,0 +1,135 @@
+"""
+Queueing test for the AMAP token-bucket rate limiter.
+
+Checks that:
+- queued foreground requests get tokens before queued background work
+- a full wait queue rejects new callers, and a caller waiting past max_wait
+  gets RateLimitExceeded
+- callers that timed out or were cancelled no longer count toward max_queue
+"""
+
+import sys
+import time
+import asyncio
+import logging
+from pathlib import Path
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+from utils.rate_limiter import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_FOREGROUND,
+    RateLimitExceeded,
+    TokenBucketRateLimiter,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+async def expect_exceeded(limiter: TokenBucketRateLimiter, **kwargs) -> float:
+    """Acquire a token, expecting RateLimitExceeded; returns the seconds waited"""
+    start = time.perf_counter()
+    try:
+        await limiter.acquire(**kwargs)
+        raise AssertionError(f"token granted: {limiter.stats()}")
+    except RateLimitExceeded:
+        return time.perf_counter() - start
+
+
+async def test_priority() -> None:
+    """Foreground callers queued after background ones are served first"""
+    limiter = TokenBucketRateLimiter(rate=50, burst=1, max_queue=10, max_wait=5)
+    assert limiter.try_acquire()
+    order = []
+
+    async def acquire(name: str, priority: int) -> None:
+        await limiter.acquire(priority)
+        order.append(name)
+
+    tasks = [
+        asyncio.ensure_future(acquire(f"background{i}", PRIORITY_BACKGROUND))
+        for i in range(3)
+    ]
+    await asyncio.sleep(0)
+    tasks += [
+        asyncio.ensure_future(acquire(f"foreground{i}", PRIORITY_FOREGROUND))
+        for i in range(3)
+    ]
+    await asyncio.gather(*tasks)
+    assert order == [
+        "foreground0",
+        "foreground1",
+        "foreground2",
+        "background0",
+        "background1",
+        "background2",
+    ], order
+    stats = limiter.stats()
+    assert stats["granted_foreground"] == 3 and stats["granted_background"] == 4
+    logger.info(f"priority: grant order {order}")
+
+
+async def test_queue_full_and_timeout() -> None:
+    """A full queue rejects at once; a queued caller gives up after max_wait"""
+    limiter = TokenBucketRateLimiter(rate=1, burst=1, max_queue=2, max_wait=0.2)
+    assert limiter.try_acquire()
+    waiters = [asyncio.ensure_future(expect_exceeded(limiter)) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert limiter.stats()["queue_depth"] == 2
+
+    waited = await expect_exceeded(limiter)
+    assert waited < 0.05 and limiter.rejected == 1, limiter.stats()
+    logger.info(f"queue full: rejected after {waited * 1000:.1f} ms")
+
+    waited = min(await asyncio.gather(*waiters))
+    stats = limiter.stats()
+    assert waited >= 0.2 and stats["timed_out"] == 2, stats
+    assert stats["queue_depth"] == 0 and stats["granted"] == 1, stats
+    logger.info(f"timeout: queued callers gave up after {waited * 1000:.0f} ms")
+
+
+async def test_stale_waiters() -> None:
+    """Timed-out and cancelled callers free their place in the queue"""
+    limiter = TokenBucketRateLimiter(rate=0.5, burst=1, max_queue=2, max_wait=0.1)
+    assert limiter.try_acquire()
+
+    # The dispatcher sleeps for the next token while both callers time out
+    await asyncio.gather(expect_exceeded(limiter), expect_exceeded(limiter))
+    assert limiter.timed_out == 2
+
+    # Cancel a caller, then fill the queue again: only a third caller is refused
+    limiter.max_wait = 5
+    cancelled = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    queued = [asyncio.ensure_future(limiter.acquire()) for _ in range(2)]
+    await asyncio.sleep(0)
+    stats = limiter.stats()
+    assert stats["queue_depth"] == 2 and stats["rejected"] == 0, stats
+    await expect_exceeded(limiter)
+    assert limiter.rejected == 1
+
+    for task in queued:
+        task.cancel()
+    await asyncio.gather(*queued, return_exceptions=True)
+    logger.info(f"stale waiters: freed queue places, {limiter.stats()}")
+
+
+async def main():
+    await test_priority()
+    await test_queue_full_and_timeout()
+    await test_stale_waiters()
+    logger.info("All rate limiter tests passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
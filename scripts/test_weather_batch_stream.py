@@ -0,0 +1,183 @@
+"""
+Streaming test for the NDJSON batch weather endpoint.
+
+Runs /api/weather_info/batch/stream against a local fake AMAP server and
+checks that:
+- lines arrive in completion order (bad names, then cached cities, then
+  upstream fetches), each tagged with its index in the request
+- duplicate cities share one upstream fetch and at most
+  WEATHER_BATCH_CONCURRENCY fetches run at once
+- fetches not yet started are dropped when the client disconnects, also
+  when cities are repeated
+- a key rejected by AMAP is quarantined and the item retried with another key
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(CURRENT_DIR))
+
+from fake_amap_server import FakeAmapServer
+from weather_query import query
+
+# Point the weather router at the fake server with two keys before it reads the config
+FAKE_AMAP_PORT = int(os.environ.get("FAKE_AMAP_PORT", "18084"))
+os.environ["AMAP_WEATHER_API_URL"] = (
+    f"http://127.0.0.1:{FAKE_AMAP_PORT}/v3/weather/weatherInfo"
+)
+os.environ["AMAP_API_KEYS"] = "bad-key,good-key"
+os.environ["AMAP_HEDGE_ENABLED"] = "false"
+os.environ["AMAP_RATE_LIMIT_QPS"] = "0"
+
+from api_router.weather import weather_info_router
+from api_router.weather.weather_info_router import WeatherBatchRequest
+from utils.http_client import close_http_session
+
+# Configure logging (keep the handler's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.CRITICAL)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+LATENCY = 0.2
+
+
+async def stream(city_names: List[str]) -> List[Tuple[float, Dict[str, Any]]]:
+    """Read every streamed line with the seconds it took to arrive"""
+    response = await weather_info_router.stream_weather_info_batch(
+        WeatherBatchRequest(cityNames=city_names)
+    )
+    assert response.media_type == "application/x-ndjson", response
+    start = time.perf_counter()
+    lines = []
+    async for line in response.body_iterator:
+        lines.append((time.perf_counter() - start, json.loads(line)))
+    return lines
+
+
+async def adcode_hits(server: FakeAmapServer, city_names: List[str]) -> int:
+    """Get the upstream requests made for the given cities"""
+    adcodes = {
+        await weather_info_router.get_city_adcode(city_name) for city_name in city_names
+    }
+    return sum(server.hits[adcode] for adcode in adcodes)
+
+
+async def test_order_and_dedup(server: FakeAmapServer) -> None:
+    """Lines come in completion order, tagged with indexes; duplicates fetch once"""
+    await query("杭州市")
+    server.hits.clear()
+
+    city_names = ["北京市", "x", "上海市", "北京市", "杭州市"]
+    lines = await stream(city_names)
+    items = [item for _, item in lines]
+    assert [item["index"] for item in items[:2]] == [1, 4], items
+    assert items[0]["infocode"] == "10003", items[0]
+    assert lines[1][0] < LATENCY / 2, "cached city waited for the upstream"
+    assert sorted(item["index"] for item in items) == list(range(len(city_names)))
+    for item in items:
+        assert item["cityName"] == city_names[item["index"]], item
+    beijing = [item for item in items if item["cityName"] == "北京市"]
+    assert beijing[0]["forecasts"] == beijing[1]["forecasts"]
+    assert server.hits["110000"] == 1 and server.total_hits == 2, dict(server.hits)
+    logger.info(
+        f"order: indexes {[item['index'] for item in items]}, "
+        f"first upstream line after {lines[2][0] * 1000:.0f} ms"
+    )
+
+
+async def test_concurrency_cap(server: FakeAmapServer) -> None:
+    """No more than WEATHER_BATCH_CONCURRENCY fetches reach the upstream at once"""
+    weather_info_router.WEATHER_BATCH_CONCURRENCY = 3
+    city_names = ["广州市", "深圳市", "南京市", "成都市", "武汉市", "西安市"]
+    server.max_in_flight = 0
+    lines = await stream(city_names)
+    assert all(item["status"] == "1" for _, item in lines), lines
+    assert server.max_in_flight == 3, server.max_in_flight
+    assert lines[-1][0] >= 2 * LATENCY, "fetches were not limited"
+    logger.info(
+        f"concurrency: {len(city_names)} cities, at most "
+        f"{server.max_in_flight} upstream requests at once"
+    )
+
+
+async def test_disconnect(server: FakeAmapServer) -> None:
+    """Fetches waiting for a concurrency slot are cancelled on disconnect"""
+    weather_info_router.WEATHER_BATCH_CONCURRENCY = 1
+    for city_names in (
+        ["天津市", "重庆市", "苏州市", "长沙市", "郑州市"],
+        # Every city twice: duplicates must share the one cancellable fetch
+        ["沈阳市", "济南市", "昆明市"] * 2,
+    ):
+        response = await weather_info_router.stream_weather_info_batch(
+            WeatherBatchRequest(cityNames=city_names)
+        )
+        first = json.loads(await response.body_iterator.__anext__())
+        await response.body_iterator.aclose()
+
+        # The fetch already in flight finishes and fills the cache for later
+        # requests; the ones still waiting must never reach the upstream
+        await asyncio.sleep(3 * LATENCY)
+        hits = await adcode_hits(server, city_names)
+        assert first["cityName"] == city_names[0] and hits <= 2, dict(server.hits)
+        assert weather_info_router.UPSTREAM_FLIGHTS.in_flight() == 0
+        logger.info(
+            f"disconnect: {hits} of {len(set(city_names))} cities fetched "
+            f"for {len(city_names)} names"
+        )
+
+
+async def test_key_quarantine(server: FakeAmapServer) -> None:
+    """A rejected key is quarantined and the item is served with the other key"""
+    weather_info_router.WEATHER_BATCH_CONCURRENCY = 3
+    server.key_infocodes["bad-key"] = "10001"
+    server.key_hits.clear()
+    city_names = ["青岛市", "厦门市", "大连市", "宁波市"]
+    lines = await stream(city_names)
+    assert all(item["status"] == "1" for _, item in lines), lines
+    assert server.key_hits["good-key"] == len(city_names), dict(server.key_hits)
+    keys = weather_info_router.WEATHER_PROVIDER.stats()["keys"]
+    assert keys["available"] == 1 and keys["keys"][0]["quarantined"], keys
+    logger.info(
+        f"quarantine: bad key tried {server.key_hits['bad-key']} times, "
+        f"every item retried with the good key"
+    )
+
+    # With every key quarantined the items fail with a quota error
+    server.key_infocodes["good-key"] = "10003"
+    lines = await stream(["合肥市", "福州市"])
+    for _, item in lines:
+        assert item["status"] == "0" and item["infocode"] == "10004", item
+    keys = weather_info_router.WEATHER_PROVIDER.stats()["keys"]
+    assert keys["available"] == 0, keys
+    logger.info("quarantine: no key left, items answered with a quota error")
+
+
+async def main():
+    server = await FakeAmapServer(port=FAKE_AMAP_PORT, latency=LATENCY).start()
+    try:
+        await test_order_and_dedup(server)
+        await test_concurrency_cap(server)
+        await test_disconnect(server)
+        await test_key_quarantine(server)
+        logger.info("All batch stream tests passed")
+    finally:
+        await close_http_session()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""
+Checks degraded mode against a local fake AMAP server.
+
+Caches a city, makes its entry days old and takes the upstream down, then
+checks that:
+- the last known weather is served whatever its age, marked stale with an
+  Age header, "stale"/"age" body fields and a weak ETag, in every format
+- cities never fetched still get an error payload
+- the circuit opens after consecutive failures and degraded responses stop
+  reaching the upstream, then recovers once the upstream is back
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(CURRENT_DIR))
+
+from fastapi import Response
+from fake_amap_server import FakeAmapServer
+from weather_query import query, query_error
+
+# Point the weather router at the fake server before it reads the config
+FAKE_AMAP_PORT = int(os.environ.get("FAKE_AMAP_PORT", "18083"))
+os.environ["AMAP_WEATHER_API_URL"] = (
+    f"http://127.0.0.1:{FAKE_AMAP_PORT}/v3/weather/weatherInfo"
+)
+os.environ["AMAP_HEDGE_ENABLED"] = "false"
+
+from api_router.weather import weather_info_router
+from api_router.weather.weather_info_router import WeatherBatchRequest
+from utils.circuit_breaker import STATE_CLOSED, STATE_OPEN
+from utils.http_client import close_http_session
+
+# Configure logging (keep the handler's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.CRITICAL)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+TWO_DAYS = 2 * 86400
+
+
+def check_degraded(response: Response) -> Dict[str, Any]:
+    """A degraded response must be marked stale in its headers and body"""
+    assert response.headers["X-Weather-Cache"] == "stale"
+    assert response.headers["ETag"].startswith("W/")
+    assert int(response.headers["Age"]) >= TWO_DAYS
+    data = json.loads(response.body)
+    assert data["stale"] is True and data["age"] >= TWO_DAYS, data
+    assert data["status"] == "1", data
+    return data
+
+
+async def main():
+    breaker = weather_info_router.AMAP_CIRCUIT_BREAKER
+    breaker.recovery_timeout = 0.5
+    cache = weather_info_router.WEATHER_CACHE
+    server = FakeAmapServer(port=FAKE_AMAP_PORT)
+    await server.start()
+    try:
+        # Cache Beijing forecasts and live conditions while AMAP is healthy
+        fresh = await query("北京市", mode="both")
+        assert fresh.headers["X-Weather-Cache"] == "revalidated"
+        assert "Age" not in fresh.headers
+        assert "stale" not in json.loads(fresh.body)
+        etag = fresh.headers["ETag"]
+
+        # Make the entries two days old, far beyond the stale grace
+        for key in list(cache._entries):
+            entry = cache.peek(key)
+            entry.fetched_at -= TWO_DAYS
+            entry.expires_at = entry.fetched_at + 3600
+
+        # AMAP answers with errors: last known weather, any age, no user-visible error
+        server.status_code = 500
+        check_degraded(await query("北京市"))
+        data = check_degraded(await query("北京市", mode="both"))
+        assert data["lives"] and data["forecasts"]
+        data = check_degraded(await query("北京市", response_format="compact"))
+        assert data["forecasts"][0]["fields"][0] == "date"
+        not_modified = await query("北京市", mode="both", if_none_match=etag)
+        assert not_modified.status_code == 304
+        logger.info("degraded: HTTP errors, days-old weather served marked stale")
+
+        # Cities never fetched still fail
+        error = await query_error("上海市")
+        assert error["status"] == "0" and error["infocode"] == "10002", error
+
+        # AMAP unreachable: connection errors fall back the same way
+        await server.stop()
+        breaker.record_success()
+        check_degraded(await query("北京市"))
+        error = await query_error("广州市")
+        assert error["status"] == "0" and error["infocode"] == "10001", error
+        logger.info("degraded: connection errors, days-old weather served marked stale")
+
+        # Consecutive failures open the circuit: degraded answers without upstream calls
+        for _ in range(breaker.failure_threshold):
+            await query("北京市")
+        assert breaker.state == STATE_OPEN, breaker.stats()
+        await server.start()
+        server.status_code = 500
+        hits_before = server.total_hits
+        for _ in range(50):
+            check_degraded(await query("北京市", mode="both"))
+        batch = await weather_info_router.get_weather_info_batch(
+            WeatherBatchRequest(cityNames=["北京市", "上海市"])
+        )
+        assert batch["results"][0]["stale"] is True, batch["results"][0]
+        assert batch["results"][1]["status"] == "0", batch["results"][1]
+        assert server.total_hits == hits_before, "open circuit reached the upstream"
+        logger.info(
+            f"degraded: circuit open, 50 requests served without upstream calls, "
+            f"{weather_info_router.DEGRADED_STATS}"
+        )
+
+        # AMAP recovers: the next probe closes the circuit and fresh data is served
+        server.status_code = 200
+        await asyncio.sleep(breaker.recovery_timeout)
+        recovered = await query("北京市")
+        assert recovered.headers["X-Weather-Cache"] == "revalidated"
+        assert breaker.state == STATE_CLOSED, breaker.stats()
+        assert "stale" not in json.loads(recovered.body)
+        assert cache.peek(("110000", "all")).fetched_at > time.time() - 60
+        logger.info("degraded: upstream recovered, fresh weather served again")
+    finally:
+        await close_http_session()
+        await server.stop()
+    logger.info("All degraded mode tests passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Checks hot-city prefetching against the in-process mock provider.
+
+Sends a skewed query mix through the weather_info_router handler, expires
+every cache entry, and runs prefetch cycles: only the hot cities must be
+refetched, at most the cycle budget per cycle, and hot cities must then be
+served fresh without another upstream call.
+"""
+
+import os
+import sys
+import asyncio
+import logging
+from pathlib import Path
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+# Enable prefetch with a small per-cycle budget before the router loads
+os.environ["WEATHER_PROVIDER"] = "mock"
+os.environ["MOCK_WEATHER_LATENCY_SECONDS"] = "0.01"
+os.environ["WEATHER_PREFETCH_ENABLED"] = "true"
+os.environ["WEATHER_PREFETCH_MIN_SCORE"] = "5"
+os.environ["AMAP_RATE_LIMIT_QPS"] = "5"
+os.environ["WEATHER_PREFETCH_INTERVAL_SECONDS"] = "6"
+os.environ["WEATHER_PREFETCH_QUOTA_SHARE"] = "0.1"
+# The mock reports at the top of the hour: keep fetched entries fresh for an
+# hour so they are not within the prefetch lead time late in the hour
+os.environ["WEATHER_CACHE_MIN_TTL_SECONDS"] = "3600"
+os.environ["WEATHER_LIVE_CACHE_MIN_TTL_SECONDS"] = "3600"
+
+from api_router.weather import weather_info_router
+from weather_query import query
+
+# Configure logging (keep the handler's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+HOT_CITIES = {
+    "北京市": "110000",
+    "上海市": "310000",
+    "广州市": "440100",
+    "深圳市": "440300",
+    "杭州市": "330100",
+}
+COLD_CITIES = ["南京市", "成都市", "武汉市"]
+
+
+async def main():
+    prefetcher = weather_info_router.WEATHER_PREFETCHER
+    provider = weather_info_router.WEATHER_PROVIDER
+    cache = weather_info_router.WEATHER_CACHE
+    # 5 QPS * 6s interval * 10% share
+    assert prefetcher.cycle_budget == 3, prefetcher.stats()
+
+    for _ in range(10):
+        for city in HOT_CITIES:
+            await query(city)
+    for city in COLD_CITIES:
+        await query(city)
+    assert provider.requests == len(HOT_CITIES) + len(COLD_CITIES)
+
+    # Nothing is due while every entry is fresh
+    assert await prefetcher.due() == []
+
+    # Expire everything: only the hot cities are due, hottest first
+    for key in list(cache._entries):
+        cache.peek(key).expires_at = 0
+    due = await prefetcher.due()
+    assert sorted(adcode for adcode, _ in due) == sorted(HOT_CITIES.values()), due
+
+    requests_before = provider.requests
+    assert await prefetcher.run_once() == 3
+    assert provider.requests - requests_before == 3, "cycle budget exceeded"
+    assert await prefetcher.run_once() == 2
+    assert await prefetcher.due() == []
+    logger.info(f"prefetch: refreshed 5 hot cities in 2 cycles, {prefetcher.stats()}")
+
+    # Hot cities are now served fresh without touching the provider
+    requests_before = provider.requests
+    for city in HOT_CITIES:
+        response = await query(city)
+        assert response.headers["X-Weather-Cache"] == "fresh"
+    assert provider.requests == requests_before
+    logger.info("prefetch: hot cities served fresh from cache")
+
+    # The lifespan task runs cycles on its own
+    prefetcher.interval = 0.05
+    for key in list(cache._entries):
+        cache.peek(key).expires_at = 0
+    prefetcher.start()
+    await asyncio.sleep(0.5)
+    await prefetcher.stop()
+    assert await prefetcher.due() == [], prefetcher.stats()
+    logger.info("prefetch: background task refreshed expired hot cities")
+
+    logger.info("All prefetch tests passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
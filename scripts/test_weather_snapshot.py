@@ -0,0 +1,130 @@
+"""
+Checks the weather cache snapshot against the in-process mock provider.
+
+Fills the cache through the weather_info_router handler, saves a snapshot,
+clears the cache and loads it back: restored cities must be served without
+another upstream call, entries expired beyond the max stale time and corrupt
+lines must be skipped. Also times saving and loading a full-size cache.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+
+# Get current script directory
+CURRENT_DIR = Path(__file__).parent
+# Get project root directory (parent of current directory)
+BASE_DIR = CURRENT_DIR.parent
+sys.path.append(str(BASE_DIR))
+
+SNAPSHOT_DIR = tempfile.mkdtemp(prefix="weather_snapshot_")
+
+# Enable snapshots with a temporary file before the router loads
+os.environ["WEATHER_PROVIDER"] = "mock"
+os.environ["MOCK_WEATHER_LATENCY_SECONDS"] = "0"
+os.environ["WEATHER_SNAPSHOT_ENABLED"] = "true"
+os.environ["WEATHER_SNAPSHOT_PATH"] = os.path.join(SNAPSHOT_DIR, "snapshot.jsonl")
+os.environ["WEATHER_SNAPSHOT_MAX_STALE_SECONDS"] = "3600"
+
+from fastapi import Response
+from api_router.weather import weather_info_router
+from api_router.weather.weather_cache import CacheEntry
+import weather_query
+
+# Configure logging (keep the handler's per-request logs quiet)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logging.getLogger().setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CITIES = ["北京市", "上海市", "广州市", "深圳市", "杭州市"]
+
+
+async def query(city_name: str) -> Response:
+    return await weather_query.query(city_name, mode="both")
+
+
+async def main():
+    snapshot = weather_info_router.WEATHER_CACHE_SNAPSHOT
+    provider = weather_info_router.WEATHER_PROVIDER
+    cache = weather_info_router.WEATHER_CACHE
+
+    # Nothing to load on the first start
+    assert snapshot.load() == 0
+
+    bodies = {}
+    for city in CITIES:
+        bodies[city] = (await query(city)).body
+    assert len(cache) == 2 * len(CITIES)
+    assert await snapshot.save() == len(cache)
+
+    # A restarted worker restores every entry and serves them from cache
+    cache.clear()
+    assert snapshot.load() == 2 * len(CITIES), snapshot.stats()
+    requests_before = provider.requests
+    for city in CITIES:
+        response = await query(city)
+        assert response.headers["X-Weather-Cache"] == "fresh"
+        assert response.body == bodies[city]
+    assert provider.requests == requests_before
+    logger.info(f"snapshot: restored {len(cache)} entries, served without upstream")
+
+    # Entries expired beyond max stale are dropped, corrupt lines are skipped
+    old_key = next(iter(cache._entries))
+    cache.peek(old_key).expires_at = time.time() - 7200
+    await snapshot.save()
+    with open(snapshot.path, "a", encoding="utf-8") as f:
+        f.write("{not json\n")
+        f.write('{"key": ["1", "all"]}\n')
+    cache.clear()
+    assert snapshot.load() == 2 * len(CITIES) - 1
+    assert cache.peek(old_key) is None
+    logger.info("snapshot: skipped too old and invalid entries")
+
+    # Full-size cache: 4096 forecast-sized entries
+    body = cache.peek(next(iter(cache._entries))).body
+    cache.clear()
+    now = time.time()
+    for i in range(cache.max_size):
+        cache.put(
+            (f"{i:06d}", "all"),
+            CacheEntry(
+                body=body,
+                fetched_at=now,
+                expires_at=now + 3600,
+                report_time=None,
+                content_type="application/json;charset=UTF-8",
+            ),
+        )
+    await snapshot.save()
+    size_kb = os.path.getsize(snapshot.path) / 1024
+    cache.clear()
+    snapshot.load()
+    assert len(cache) == cache.max_size
+    logger.info(
+        f"snapshot: {cache.max_size} entries ({size_kb:.0f} KiB) saved in "
+        f"{snapshot.last_save_ms:.1f} ms, loaded in {snapshot.load_ms:.1f} ms"
+    )
+
+    # The periodic task saves on its own and stop() writes a final snapshot
+    cache.clear()
+    snapshot.interval = 0.05
+    saves_before = snapshot.saves
+    snapshot.start()
+    await asyncio.sleep(0.2)
+    await snapshot.stop()
+    assert snapshot.saves >= saves_before + 2, snapshot.stats()
+    assert not [name for name in os.listdir(SNAPSHOT_DIR) if name.endswith(".tmp")]
+    logger.info("snapshot: periodic and final saves written atomically")
+
+    logger.info("All snapshot tests passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
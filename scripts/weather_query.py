@@ -0,0 +1,69 @@
+"""
+Calls the weather_info route handler directly, as the load and test scripts do.
+
+Scripts set their environment before the router reads the config, so the
+router is imported on first call. Parameters left out take the defaults
+declared on the route's Query/Header parameters, so adding a parameter to
+the route needs no change here or in the scripts. Keyword arguments use the
+handler's Python names (response_format, if_none_match).
+"""
+
+import json
+import inspect
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from fastapi import Response
+from pydantic.fields import FieldInfo
+
+
+@lru_cache(maxsize=None)
+def route_defaults(handler: Callable) -> Dict[str, Any]:
+    """Get the declared default of every optional parameter of a route handler"""
+    defaults = {}
+    for name, parameter in inspect.signature(handler).parameters.items():
+        declared = parameter.default
+        if isinstance(declared, FieldInfo) and not declared.is_required():
+            defaults[name] = declared.default
+    return defaults
+
+
+async def get_weather(city_name: str, **params) -> Union[Response, Dict[str, Any]]:
+    """
+    Call the weather handler for a city
+
+    Args:
+        city_name: cityName query parameter
+        **params: Other parameters to set, by handler argument name
+
+    Returns:
+        The raw Response for weather data, or the error payload dict
+    """
+    from api_router.weather import weather_info_router
+
+    handler = weather_info_router.get_weather_info
+    return await handler(**{**route_defaults(handler), "cityName": city_name, **params})
+
+
+async def query(city_name: str, **params) -> Response:
+    """Call the weather handler, expecting weather data"""
+    result = await get_weather(city_name, **params)
+    assert isinstance(result, Response), result
+    return result
+
+
+async def query_error(city_name: str, **params) -> Dict[str, Any]:
+    """Call the weather handler, expecting an error payload"""
+    result = await get_weather(city_name, **params)
+    assert isinstance(result, dict), result
+    return result
+
+
+async def query_weather(
+    city_name: str, **params
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Call the weather handler and decode its raw response with its cache state"""
+    result = await get_weather(city_name, **params)
+    if isinstance(result, Response):
+        return json.loads(result.body), result.headers.get("X-Weather-Cache")
+    return result, None
@@ -0,0 +1,147 @@
+"""
+Circuit breaker for upstream calls.
+
+After `failure_threshold` consecutive failures the circuit opens and calls
+fail fast for `recovery_timeout` seconds. It then lets a limited number of
+probe calls through (half-open): a successful probe closes the circuit, a
+failed one opens it again.
+"""
+
+import time
+import logging
+from typing import Any, Callable, Dict
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker.
+
+    Args:
+        name: Name used in logs
+        failure_threshold: Consecutive failures that open the circuit
+        recovery_timeout: Seconds the circuit stays open before probing
+        half_open_max_calls: Probe calls allowed at once while half-open
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        recovery_timeout: float,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once recovery elapsed"""
+        if (
+            self._state == STATE_OPEN
+            and self._clock() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = STATE_HALF_OPEN
+            self._half_open_calls = 0
+            logging.info(f"Circuit {self.name} half-open, probing upstream")
+        return self._state
+
+    def is_open(self) -> bool:
+        """Whether calls are currently being rejected without probing"""
+        return self.state == STATE_OPEN
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may go upstream, reserving a probe slot if half-open
+
+        Returns:
+            bool: True if the call may proceed
+        """
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        if (
+            state == STATE_HALF_OPEN
+            and self._half_open_calls < self.half_open_max_calls
+        ):
+            self._half_open_calls += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def check(self) -> None:
+        """
+        Reserve a call or fail fast
+
+        Raises:
+            CircuitOpenError: When the circuit is open
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(f"circuit {self.name} is open")
+
+    def release(self) -> None:
+        """Give back a probe slot reserved by a call that ended without a result"""
+        if self._state == STATE_HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        """Record a successful call, closing a half-open circuit"""
+        self.successes += 1
+        self._consecutive_failures = 0
+        if self._state != STATE_CLOSED:
+            logging.info(f"Circuit {self.name} closed, upstream recovered")
+            self._state = STATE_CLOSED
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit when the threshold is hit"""
+        self.failures += 1
+        self._consecutive_failures += 1
+        if self._state == STATE_HALF_OPEN or (
+            self._state == STATE_CLOSED
+            and self._consecutive_failures >= self.failure_threshold
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self._state = STATE_OPEN
+        self._opened_at = self._clock()
+        self.times_opened += 1
+        logging.warning(
+            f"Circuit {self.name} opened after {self._consecutive_failures} "
+            f"consecutive failures, failing fast for {self.recovery_timeout}s"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get breaker state and counters
+
+        Returns:
+            Dict[str, Any]: State, consecutive failures and call counts
+        """
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
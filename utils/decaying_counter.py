@@ -0,0 +1,121 @@
+"""
+Exponentially decaying frequency counter.
+
+Every hit adds 1 to a key's score and scores halve every `half_life`
+seconds, so the ranking follows recent popularity instead of all-time
+totals. Scores are decayed lazily when a key is touched or read.
+"""
+
+import time
+import heapq
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+
+class DecayingCounter:
+    """
+    Per-key hit counter with exponential decay and a bounded key set.
+
+    Args:
+        half_life: Seconds after which a score has halved
+        max_keys: Keys tracked at most; the lowest scores are dropped beyond it
+    """
+
+    def __init__(
+        self,
+        half_life: float,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self._clock = clock
+        # key -> [score, time the score was last decayed]
+        self._scores: Dict[Hashable, List[float]] = {}
+        self.hits = 0
+        self.dropped = 0
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def record(self, key: Hashable, weight: float = 1.0) -> None:
+        """Add weight to the score of key"""
+        now = self._clock()
+        self.hits += 1
+        item = self._scores.get(key)
+        if item is None:
+            if len(self._scores) >= self.max_keys:
+                self._drop_lowest(now)
+            self._scores[key] = [weight, now]
+            return
+        item[0] = self._decayed(item[0], item[1], now) + weight
+        item[1] = now
+
+    def _drop_lowest(self, now: float) -> None:
+        # Drop the lowest tenth at once so inserts stay cheap on a full counter
+        count = max(1, self.max_keys // 10)
+        for key, _ in self._ranked(now, smallest=count):
+            del self._scores[key]
+        self.dropped += count
+
+    def _ranked(self, now: float, smallest: int = 0, largest: int = 0):
+        scored = (
+            (key, self._decayed(score, updated_at, now))
+            for key, (score, updated_at) in self._scores.items()
+        )
+        if smallest:
+            return heapq.nsmallest(smallest, scored, key=lambda item: item[1])
+        return heapq.nlargest(largest, scored, key=lambda item: item[1])
+
+    def score(self, key: Hashable) -> float:
+        """Get the current (decayed) score of key"""
+        item = self._scores.get(key)
+        if item is None:
+            return 0.0
+        return self._decayed(item[0], item[1], self._clock())
+
+    def top(self, n: int) -> List[Tuple[Hashable, float]]:
+        """
+        Get the n keys with the highest current score
+
+        Args:
+            n: Number of keys
+
+        Returns:
+            List[Tuple[Hashable, float]]: (key, score) pairs, highest first
+        """
+        return self._ranked(self._clock(), largest=n)
+
+    def prune(self, min_score: float) -> int:
+        """
+        Forget keys whose score decayed below min_score
+
+        Returns:
+            int: Number of keys removed
+        """
+        now = self._clock()
+        cold = [
+            key
+            for key, (score, updated_at) in self._scores.items()
+            if self._decayed(score, updated_at, now) < min_score
+        ]
+        for key in cold:
+            del self._scores[key]
+        return len(cold)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get counter statistics
+
+        Returns:
+            Dict[str, Any]: Tracked keys, recorded hits and dropped keys
+        """
+        return {
+            "keys": len(self._scores),
+            "max_keys": self.max_keys,
+            "half_life": self.half_life,
+            "hits": self.hits,
+            "dropped": self.dropped,
+        }
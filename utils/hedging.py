@@ -0,0 +1,154 @@
+"""
+Hedged requests for tail-latency reduction.
+
+A second attempt is started when the first one has not completed after a
+delay derived from recent latencies (p95 by default); whichever attempt
+succeeds first wins and the other is cancelled.
+
+The latency of a call is measured from the start of its first attempt to its
+end, whichever attempt won and whether it failed. Recording successful
+attempts only would drop the slow primaries a hedge cut short, letting the
+p95 drift down and the hedge rate climb.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent call latencies.
+
+    Args:
+        window: Number of samples kept
+        min_samples: Samples needed before percentiles are trusted
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Get a latency percentile
+
+        Args:
+            fraction: Percentile as a fraction, e.g. 0.95
+
+        Returns:
+            The latency in seconds, or None with too few samples
+        """
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return ordered[index]
+
+
+class Hedger:
+    """
+    Run calls with an optional hedge attempt.
+
+    Args:
+        enabled: Whether hedge attempts are sent at all
+        default_delay: Hedge delay used until enough latencies are recorded
+        min_delay: Lower bound of the hedge delay
+        percentile: Latency percentile used as the hedge delay
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        default_delay: float,
+        min_delay: float,
+        percentile: float = 0.95,
+    ):
+        self.enabled = enabled
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.percentile = percentile
+        self.latencies = LatencyTracker()
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> float:
+        """Get the delay after which a hedge attempt is sent"""
+        observed = self.latencies.percentile(self.percentile)
+        if observed is None:
+            return self.default_delay
+        return max(self.min_delay, observed)
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        can_hedge: Callable[[], bool] = lambda: True,
+    ) -> T:
+        """
+        Run fn, sending a second attempt if the first is slower than the delay
+
+        Args:
+            fn: Zero-argument coroutine function performing one attempt
+            can_hedge: Checked before sending the hedge (e.g. rate limit budget)
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            Exception: The error of the last attempt when every attempt failed
+        """
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        primary = asyncio.ensure_future(fn())
+        attempts = {primary}
+        try:
+            if not self.enabled:
+                return await primary
+
+            done, _ = await asyncio.wait(attempts, timeout=self.hedge_delay())
+            if not done and can_hedge():
+                self.hedges_sent += 1
+                attempts.add(asyncio.ensure_future(fn()))
+
+            error: Optional[BaseException] = None
+            while attempts:
+                done, attempts = await asyncio.wait(
+                    attempts, return_when=asyncio.FIRST_COMPLETED
+                )
+                winners = [attempt for attempt in done if attempt.exception() is None]
+                if winners:
+                    if winners[0] is not primary:
+                        self.hedge_wins += 1
+                        logging.info("Hedged request finished first")
+                    return winners[0].result()
+                error = next(iter(done)).exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+            self.latencies.record(loop.time() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hedging counters
+
+        Returns:
+            Dict[str, Any]: Calls, hedges sent/won and the current hedge delay
+        """
+        p95 = self.latencies.percentile(0.95)
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedges_sent": self.hedges_sent,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay": round(self.hedge_delay(), 4),
+            "latency_p95": round(p95, 4) if p95 is not None else None,
+        }
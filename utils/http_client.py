@@ -0,0 +1,84 @@
+"""
+Shared aiohttp client session for upstream HTTP calls.
+
+One session (and therefore one keep-alive connection pool) is created per
+worker in the application lifespan and reused by every upstream caller, so
+requests do not pay DNS, TCP and TLS setup each time.
+"""
+
+import logging
+from typing import Optional
+
+import aiohttp
+
+from config import (
+    UPSTREAM_HTTP_POOL_SIZE,
+    UPSTREAM_HTTP_POOL_PER_HOST,
+    UPSTREAM_HTTP_DNS_CACHE_TTL,
+    UPSTREAM_HTTP_KEEPALIVE_TIMEOUT,
+    UPSTREAM_HTTP_CONNECT_TIMEOUT,
+    UPSTREAM_HTTP_READ_TIMEOUT,
+)
+
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def _create_http_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=UPSTREAM_HTTP_POOL_SIZE,
+        limit_per_host=UPSTREAM_HTTP_POOL_PER_HOST,
+        ttl_dns_cache=UPSTREAM_HTTP_DNS_CACHE_TTL,
+        use_dns_cache=True,
+        keepalive_timeout=UPSTREAM_HTTP_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        connect=UPSTREAM_HTTP_CONNECT_TIMEOUT,
+        sock_read=UPSTREAM_HTTP_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def init_http_session() -> aiohttp.ClientSession:
+    """
+    Create the shared client session, called from the application lifespan
+
+    Returns:
+        aiohttp.ClientSession: The shared session
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = _create_http_session()
+        logging.info(
+            f"Created upstream HTTP session: pool={UPSTREAM_HTTP_POOL_SIZE}, "
+            f"per_host={UPSTREAM_HTTP_POOL_PER_HOST}, "
+            f"dns_ttl={UPSTREAM_HTTP_DNS_CACHE_TTL}s, "
+            f"connect_timeout={UPSTREAM_HTTP_CONNECT_TIMEOUT}s, "
+            f"read_timeout={UPSTREAM_HTTP_READ_TIMEOUT}s"
+        )
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Close the shared client session and its connection pool"""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+        logging.info("Closed upstream HTTP session")
+    _http_session = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Get the shared client session
+
+    The session is normally created by the application lifespan. It is
+    created lazily here when the routers are used without it (e.g. scripts).
+
+    Returns:
+        aiohttp.ClientSession: The shared session
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = _create_http_session()
+    return _http_session
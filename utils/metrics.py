@@ -0,0 +1,39 @@
+"""
+Registry of in-process metrics sources.
+
+Components that keep counters (caches, limiters, ...) register a callable
+returning a JSON-serializable dict; the metrics endpoint collects them all.
+"""
+
+import logging
+from typing import Any, Callable, Dict
+
+_metrics_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_metrics_source(name: str, source: Callable[[], Dict[str, Any]]) -> None:
+    """
+    Register a metrics source
+
+    Args:
+        name: Section name in the collected metrics
+        source: Callable returning the current counters as a dict
+    """
+    _metrics_sources[name] = source
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """
+    Collect the current value of every registered metrics source
+
+    Returns:
+        Dict[str, Any]: Metrics keyed by source name
+    """
+    metrics = {}
+    for name, source in _metrics_sources.items():
+        try:
+            metrics[name] = source()
+        except Exception as e:
+            logging.error(f"Error collecting metrics from {name}: {e}")
+            metrics[name] = {"error": str(e)}
+    return metrics
@@ -0,0 +1,205 @@
+"""
+Async token-bucket rate limiter with priority queueing.
+
+Callers that cannot get a token immediately wait in a bounded priority
+queue; foreground requests are served before background work. When the
+queue is full, or a caller waits too long, RateLimitExceeded is raised
+instead of piling up more waiters.
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Lower value is served first
+PRIORITY_FOREGROUND = 0
+PRIORITY_BACKGROUND = 1
+
+# Daily quotas are reset at midnight Beijing time, like AMAP's
+QUOTA_TIMEZONE = timezone(timedelta(hours=8))
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a token cannot be granted within the queue/wait bounds"""
+
+
+class TokenBucketRateLimiter:
+    """
+    Process-wide token bucket refilled at `rate` tokens per second.
+
+    Args:
+        rate: Sustained requests per second; 0 or less disables limiting
+        burst: Bucket capacity, i.e. requests allowed back to back
+        max_queue: Maximum number of callers waiting for a token
+        max_wait: Maximum seconds a caller waits for a token
+        daily_quota: Requests allowed per day, only used for reporting (0: unknown)
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_queue: int,
+        max_wait: float,
+        daily_quota: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.daily_quota = daily_quota
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._last_refill = clock()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.granted = 0
+        self.granted_by_priority: Dict[int, int] = {}
+        self.rejected = 0
+        self.timed_out = 0
+        self._quota_day = self._today()
+        self.granted_today = 0
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._last_refill) * self.rate
+        )
+        self._last_refill = now
+
+    def _grant(self, priority: int) -> None:
+        self.granted += 1
+        self.granted_by_priority[priority] = (
+            self.granted_by_priority.get(priority, 0) + 1
+        )
+        self._roll_quota_day()
+        self.granted_today += 1
+
+    def _roll_quota_day(self) -> None:
+        today = self._today()
+        if today != self._quota_day:
+            self._quota_day = today
+            self.granted_today = 0
+
+    def _queue_depth(self) -> int:
+        """Drop callers that timed out or were cancelled, and count the rest"""
+        if any(waiter.done() for _, _, waiter in self._waiters):
+            self._waiters = [item for item in self._waiters if not item[2].done()]
+            heapq.heapify(self._waiters)
+        return len(self._waiters)
+
+    def try_acquire(self, priority: int = PRIORITY_BACKGROUND) -> bool:
+        """
+        Take a token only if one is available right now
+
+        Args:
+            priority: Priority the grant is accounted under
+
+        Returns:
+            bool: Whether a token was taken
+        """
+        if self.rate <= 0:
+            self._grant(priority)
+            return True
+        self._refill()
+        if self._queue_depth() or self._tokens < 1:
+            return False
+        self._tokens -= 1
+        self._grant(priority)
+        return True
+
+    async def acquire(self, priority: int = PRIORITY_FOREGROUND) -> None:
+        """
+        Wait for a token
+
+        Args:
+            priority: PRIORITY_FOREGROUND or PRIORITY_BACKGROUND
+
+        Raises:
+            RateLimitExceeded: When the wait queue is full or max_wait elapses
+        """
+        if self.rate <= 0:
+            self._grant(priority)
+            return
+
+        self._refill()
+        queue_depth = self._queue_depth()
+        if not queue_depth and self._tokens >= 1:
+            self._tokens -= 1
+            self._grant(priority)
+            return
+
+        if queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise RateLimitExceeded(
+                f"rate limit wait queue is full ({self.max_queue} waiting)"
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise RateLimitExceeded(
+                f"no rate limit token available within {self.max_wait}s"
+            )
+
+    async def _dispatch(self) -> None:
+        """Hand out tokens to queued callers, highest priority first"""
+        while self._waiters:
+            # Skip callers that timed out or were cancelled
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                break
+
+            self._refill()
+            if self._tokens >= 1:
+                priority, _, waiter = heapq.heappop(self._waiters)
+                self._tokens -= 1
+                self._grant(priority)
+                waiter.set_result(None)
+            else:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get limiter and quota counters
+
+        Returns:
+            Dict[str, Any]: Configuration, queue depth and grant/reject counts
+        """
+        if self.rate > 0:
+            self._refill()
+        self._roll_quota_day()
+        stats = {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "queue_depth": self._queue_depth(),
+            "max_queue": self.max_queue,
+            "granted": self.granted,
+            "granted_foreground": self.granted_by_priority.get(PRIORITY_FOREGROUND, 0),
+            "granted_background": self.granted_by_priority.get(PRIORITY_BACKGROUND, 0),
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "quota_day": self._quota_day,
+            "granted_today": self.granted_today,
+        }
+        if self.daily_quota > 0:
+            stats["daily_quota"] = self.daily_quota
+            stats["remaining_today"] = max(0, self.daily_quota - self.granted_today)
+        return stats